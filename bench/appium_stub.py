@@ -0,0 +1,138 @@
+"""Stand-in for the Appium server's HTTP API.
+
+Answers GET /status, POST /session and DELETE /session/<id> the way Appium
+2 does, over HTTP/1.1 keep-alive. Run it like the appium command line
+(``python bench/appium_stub.py --address 127.0.0.1 --port 4723``) to take
+its place via $APPIUM_INSTALLER_APPIUM; it then waits $APPIUM_STUB_STARTUP
+seconds (default 1.0) before listening, to model Node loading Appium and
+its drivers. New sessions take $APPIUM_STUB_SESSION_SECONDS (default 0.05).
+
+/status also reports how many TCP connections the stub has accepted, so a
+benchmark can tell whether its client kept its connection alive.
+"""
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_VERSION = "2.5.1-stub"
+
+class AppiumStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Node's HTTP server disables Nagle too; without it every reply's body waits on a delayed ACK.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _reply(self, code, value):
+        body = json.dumps({"value": value}).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, code, error, message):
+        self._reply(code, {"error": error, "message": message, "stacktrace": ""})
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length).decode("utf-8")) if length else {}
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/status":
+            self._reply(200, {
+                "ready": True,
+                "message": "The server is ready to accept new connections",
+                "build": {"version": STUB_VERSION},
+                "stub": {"connections": self.server.connections, "sessions": len(self.server.sessions)},
+            })
+        else:
+            self._error(404, "unknown command", f"The requested resource could not be found: {self.path}")
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/session":
+            self._error(404, "unknown command", f"The requested resource could not be found: {self.path}")
+            return
+        try:
+            capabilities = self._read_json()["capabilities"]["alwaysMatch"]
+        except (ValueError, KeyError, TypeError):
+            self._error(400, "invalid argument", "W3C capabilities are required")
+            return
+        if capabilities.get("platformName", "").lower() != "android":
+            self._error(500, "session not created", "Could not find a driver for platformName")
+            return
+        time.sleep(self.server.session_seconds)
+        session_id = str(uuid.uuid4())
+        with self.server.lock:
+            self.server.sessions.add(session_id)
+        self._reply(200, {"sessionId": session_id, "capabilities": capabilities})
+
+    def do_DELETE(self):
+        parts = self.path.strip("/").split("/")
+        if len(parts) != 2 or parts[0] != "session":
+            self._error(404, "unknown command", f"The requested resource could not be found: {self.path}")
+            return
+        with self.server.lock:
+            known = parts[1] in self.server.sessions
+            self.server.sessions.discard(parts[1])
+        if not known:
+            self._error(404, "invalid session id", "A session is either terminated or not started")
+            return
+        time.sleep(self.server.delete_seconds)
+        self._reply(200, None)
+
+class AppiumStub(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0, session_seconds=0.05, delete_seconds=0.01, verbose=False):
+        super().__init__((host, port), AppiumStubHandler)
+        self.session_seconds = session_seconds
+        self.delete_seconds = delete_seconds
+        self.verbose = verbose
+        self.connections = 0
+        self.sessions = set()
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+def main():
+    # Only the appium options the installer passes; anything else is ignored like extra server args.
+    parser = argparse.ArgumentParser(description="Appium HTTP API stand-in")
+    parser.add_argument("--address", "-a", default="0.0.0.0")
+    parser.add_argument("--port", "-p", type=int, default=4723)
+    args, _ = parser.parse_known_args()
+
+    time.sleep(float(os.environ.get("APPIUM_STUB_STARTUP", "1.0")))
+    server = AppiumStub(args.address, args.port,
+                        session_seconds=float(os.environ.get("APPIUM_STUB_SESSION_SECONDS", "0.05")), verbose=True)
+    print(f"[Appium] Appium REST http interface listener started on http://{args.address}:{server.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
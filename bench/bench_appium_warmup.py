@@ -0,0 +1,64 @@
+import argparse
+import os
+import socket
+import sys
+import tempfile
+
+from cmd.warmup import AppiumServer, WarmupStage
+
+STUB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "appium_stub.py")
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def quiet(message, color="black"):
+    pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Appium warm-up and session latency against the Appium stand-in.")
+    parser.add_argument("--startup", type=float, default=1.0, help="Seconds the stub takes before it listens")
+    parser.add_argument("--session-seconds", type=float, default=0.05, help="Seconds the stub takes per new session")
+    parser.add_argument("--sessions", type=int, default=50)
+    args = parser.parse_args()
+
+    os.environ["APPIUM_STUB_STARTUP"] = str(args.startup)
+    os.environ["APPIUM_STUB_SESSION_SECONDS"] = str(args.session_seconds)
+    failures = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        port = free_port()
+        server = AppiumServer([sys.executable, STUB], quiet, port=port, log_path=os.path.join(temp_dir, "appium.log"))
+        cold = WarmupStage(server, quiet).run(sessions=args.sessions)
+        # A second run must find the warm server instead of starting another one.
+        warm_server = AppiumServer([sys.executable, STUB], quiet, port=port, log_path=os.path.join(temp_dir, "appium.log"))
+        warm = WarmupStage(warm_server, quiet).run(sessions=args.sessions)
+        accepted = warm_server.status()["stub"]["connections"]
+        server.stop()
+
+    print(f"{'run':>5} {'ready s':>8} {'polls':>6} {'create p50':>11} {'create p95':>11} {'delete p50':>11} {'conns':>6}")
+    for name, report in (("cold", cold), ("warm", warm)):
+        data = report.to_dict()
+        create, delete = data["sessions"]["create"] or {}, data["sessions"]["delete"] or {}
+        print(f"{name:>5} {data['time_to_ready_s'] or 0:>8.3f} {data['status_polls']:>6} "
+              f"{create.get('p50_ms', 0):>9.1f}ms {create.get('p95_ms', 0):>9.1f}ms "
+              f"{delete.get('p50_ms', 0):>9.1f}ms {data['connections']:>6}")
+
+    if not cold.ready or cold.reused:
+        failures.append("first run did not start the server")
+    if not warm.reused:
+        failures.append("second run started another server instead of reusing the warm one")
+    for name, report in (("cold", cold), ("warm", warm)):
+        if report.session_failures or len(report.create_seconds) != args.sessions:
+            failures.append(f"{name}: sessions failed: {report.session_failures}")
+        if report.connections != 1:
+            failures.append(f"{name}: opened {report.connections} connections, expected one kept alive")
+    if accepted != 2:
+        failures.append(f"the stub accepted {accepted} connections for two clients")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""CommandRunner against shell scripts that stand in for slow installers.
+
+Three stand-ins, written to a temporary directory as sh scripts:
+
+- ``slow_output.sh`` prints a line every ``--interval`` seconds, then exits;
+  every line must reach the log callback before the command finishes.
+- ``never_exits.sh`` loops forever; the per-command deadline must stop it
+  close to ``--timeout``.
+- ``forks_child.sh`` starts a long sleep in the background and waits for
+  it; cancelling the run must kill the child too, not just the script.
+  The same script is also stopped by the deadline.
+
+POSIX only: the stand-ins are sh scripts.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from cmd.process import COMMAND_CANCELLED, COMMAND_TIMEOUT, CommandRunner
+
+SCRIPTS = {
+    "slow_output.sh": 'for i in $(seq 1 "$1"); do echo "line $i"; sleep "$2"; done\n',
+    "never_exits.sh": "while :; do sleep 1; done\n",
+    "forks_child.sh": 'sleep 1000 &\necho $! > "$1"\necho "child $!"\nwait\n',
+}
+
+def write_scripts(directory):
+    paths = {}
+    for name, body in SCRIPTS.items():
+        path = os.path.join(directory, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("#!/bin/sh\n" + body)
+        os.chmod(path, 0o755)
+        paths[name] = path
+    return paths
+
+def process_alive(pid):
+    # A killed child re-parented to an init that does not reap leaves a zombie; that counts as dead.
+    try:
+        with open(f"/proc/{pid}/stat", "r", encoding="utf-8") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except OSError:
+        pass
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def wait_dead(pid, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while process_alive(pid) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return not process_alive(pid)
+
+def read_pid(path, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            time.sleep(0.01)
+    return None
+
+def check_streaming(script, lines, interval):
+    arrivals = []
+    runner = CommandRunner(lambda line, stream: arrivals.append((time.monotonic(), line)))
+    started = time.monotonic()
+    result = runner.run([script, str(lines), str(interval)], shell=False, timeout=30)
+    finished = time.monotonic()
+    failures = []
+    if result.returncode != 0:
+        failures.append(f"slow output exited with {result.returncode}")
+    if [line for _, line in arrivals] != [f"line {index}" for index in range(1, lines + 1)]:
+        failures.append(f"slow output: got lines {[line for _, line in arrivals]}")
+    elif finished - arrivals[0][0] < (lines - 1) * interval * 0.8:
+        failures.append(f"slow output: the first line arrived {arrivals[0][0] - started:.2f}s in, "
+                        f"only {finished - arrivals[0][0]:.2f}s before the command finished")
+    first = arrivals[0][0] - started if arrivals else float("nan")
+    return finished - started, f"first line after {first:.2f}s", failures
+
+def check_deadline(script, timeout, args=()):
+    started = time.monotonic()
+    result = CommandRunner().run([script, *args], shell=False, timeout=timeout)
+    elapsed = time.monotonic() - started
+    failures = []
+    if not result.timed_out or result.returncode != COMMAND_TIMEOUT:
+        failures.append(f"{os.path.basename(script)}: expected a timeout, got exit code {result.returncode}")
+    if elapsed > timeout + 1.0:
+        failures.append(f"{os.path.basename(script)}: the {timeout}s deadline fired after {elapsed:.2f}s")
+    return elapsed, f"exit {result.returncode}", failures
+
+def check_child_killed(script, pid_file, cancel_after=None, timeout=None):
+    if os.path.exists(pid_file):
+        os.remove(pid_file)
+    cancel_event = threading.Event()
+    if cancel_after is not None:
+        threading.Timer(cancel_after, cancel_event.set).start()
+    started = time.monotonic()
+    result = CommandRunner(cancel_event=cancel_event).run([script, pid_file], shell=False, timeout=timeout)
+    elapsed = time.monotonic() - started
+    how = "cancel" if cancel_after is not None else "deadline"
+    expected = COMMAND_CANCELLED if cancel_after is not None else COMMAND_TIMEOUT
+    failures = []
+    if result.returncode != expected:
+        failures.append(f"forked child, {how}: expected exit code {expected}, got {result.returncode}")
+    child = read_pid(pid_file)
+    if child is None:
+        failures.append(f"forked child, {how}: the script never reported its child")
+    elif not wait_dead(child):
+        failures.append(f"forked child, {how}: child {child} is still running")
+        try:
+            os.kill(child, 9)
+        except OSError:
+            pass
+    return elapsed, f"exit {result.returncode}, child {'gone' if child and not process_alive(child) else 'alive'}", failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Check CommandRunner's streaming, deadlines and cancellation.")
+    parser.add_argument("--lines", type=int, default=5)
+    parser.add_argument("--interval", type=float, default=0.3, help="Seconds between the slow script's lines")
+    parser.add_argument("--timeout", type=float, default=1.0, help="Per-command deadline in seconds")
+    args = parser.parse_args()
+    if os.name == "nt":
+        print("The stand-ins are sh scripts; run this on Linux or macOS.")
+        sys.exit(0)
+
+    failures = []
+    print(f"{'case':>22} {'seconds':>8}  result")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        scripts = write_scripts(temp_dir)
+        pid_file = os.path.join(temp_dir, "child.pid")
+        cases = [
+            ("streamed output", lambda: check_streaming(scripts["slow_output.sh"], args.lines, args.interval)),
+            ("deadline", lambda: check_deadline(scripts["never_exits.sh"], args.timeout)),
+            ("forked child, cancel", lambda: check_child_killed(scripts["forks_child.sh"], pid_file,
+                                                                cancel_after=args.timeout / 2)),
+            ("forked child, deadline", lambda: check_child_killed(scripts["forks_child.sh"], pid_file,
+                                                                  timeout=args.timeout)),
+        ]
+        for name, case in cases:
+            elapsed, summary, case_failures = case()
+            print(f"{name:>22} {elapsed:>8.2f}  {summary}")
+            failures += case_failures
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from bench.fake_adb_server import FakeAdbServer
+from cmd.adb import AdbClient
+from cmd.devices import AdbCommandLine, DeviceStage, ServerApks
+from cmd.installers import BaseInstaller
+
+FAKE_ADB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_adb.py")
+SERVER_VERSION = "7.0.1"
+
+def make_rack(state_dir, count):
+    """Fake devices: most need the server, one is booting, one is unauthorized, one is up to date."""
+    devices = {}
+    for index in range(count):
+        serial = f"FAKE{index:04d}"
+        devices[serial] = {"state": "device", "model": "Pixel_7", "boot_completed": "1", "sdk": "33"}
+        if os.path.exists(os.path.join(state_dir, f"{serial}.packages.json")):
+            os.remove(os.path.join(state_dir, f"{serial}.packages.json"))
+    devices["FAKE0000"]["boot_completed"] = ""
+    devices["FAKE0001"]["state"] = "unauthorized"
+    with open(os.path.join(state_dir, "FAKE0002.packages.json"), "w", encoding="utf-8") as f:
+        json.dump({"io.appium.uiautomator2.server": SERVER_VERSION, "io.appium.uiautomator2.server.test": "1.0"}, f)
+    with open(os.path.join(state_dir, "devices.json"), "w", encoding="utf-8") as f:
+        json.dump(devices, f)
+
+def make_apks(home):
+    apk_dir = os.path.join(home, "node_modules", "appium-uiautomator2-server", "apks")
+    os.makedirs(apk_dir)
+    with open(os.path.join(os.path.dirname(apk_dir), "package.json"), "w", encoding="utf-8") as f:
+        json.dump({"name": "appium-uiautomator2-server", "version": SERVER_VERSION}, f)
+    for name in (f"appium-uiautomator2-server-v{SERVER_VERSION}.apk", "appium-uiautomator2-server-debug-androidTest.apk"):
+        open(os.path.join(apk_dir, name), "wb").close()
+    return ServerApks.find(home)
+
+def run_stage(adb, apks, max_workers):
+    stage = DeviceStage(adb, lambda message, color="black": None, apks, max_workers=max_workers)
+    started = time.perf_counter()
+    reports = stage.run()
+    return time.perf_counter() - started, reports
+
+def main():
+    parser = argparse.ArgumentParser(description="Device readiness stage against a rack of fake adb devices.")
+    parser.add_argument("--devices", type=int, default=16)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--latency", type=float, default=0.03, help="Seconds each fake adb call takes")
+    parser.add_argument("--install-seconds", type=float, default=0.2)
+    parser.add_argument("--transports", nargs="+", choices=["cli", "socket"], default=["cli", "socket"],
+                        help="adb processes per call, or the host protocol against a fake adb server")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.environ["FAKE_ADB_STATE"] = temp_dir
+        os.environ["FAKE_ADB_LATENCY"] = str(args.latency)
+        os.environ["FAKE_ADB_INSTALL_SECONDS"] = str(args.install_seconds)
+        apks = make_apks(os.path.join(temp_dir, "appium-home"))
+        command_line = AdbCommandLine([sys.executable, FAKE_ADB], BaseInstaller(lambda *a: None).run_command)
+        server = FakeAdbServer().start()
+        transports = {"cli": command_line, "socket": AdbClient(port=server.port, fallback=command_line)}
+
+        failures = []
+        print(f"{'transport':>9} {'workers':>7} {'cold s':>8} {'warm s':>8}")
+        for transport in args.transports:
+            for workers in args.workers:
+                adb = transports[transport]
+                make_rack(temp_dir, args.devices)
+                cold, reports = run_stage(adb, apks, workers)
+                warm, rerun = run_stage(adb, apks, workers)
+                print(f"{transport:>9} {workers:>7} {cold:>8.2f} {warm:>8.2f}")
+                failures += check_reports(f"{transport}, {workers} workers", args.devices, reports, rerun)
+
+        if "socket" in args.transports:
+            failures += check_tracking(transports["socket"], temp_dir)
+        server.stop()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+def check_reports(name, count, reports, rerun):
+    failures = []
+    statuses = {report.serial: report.status for report in rerun}
+    expected_ready = count - 2
+    if sum(status == "ready" for status in statuses.values()) != expected_ready:
+        failures.append(f"{name}: expected {expected_ready} ready devices, got {statuses}")
+    if statuses.get("FAKE0000") != "not-ready" or statuses.get("FAKE0001") != "offline":
+        failures.append(f"{name}: booting/unauthorized devices misreported: {statuses}")
+    if any(report.installed for report in rerun):
+        failures.append(f"{name}: second run installed again")
+    if any(report.installed for report in reports if report.serial == "FAKE0002"):
+        failures.append(f"{name}: up-to-date device was reinstalled")
+    return failures
+
+def check_tracking(client, state_dir):
+    # Plug in one more device and expect the track-devices feed (what `devices --watch` prints) to report it.
+    stop = threading.Event()
+    timer = threading.Timer(2, stop.set)
+    timer.start()
+    seen = []
+    for devices in client.track_devices(stop):
+        seen = [device["serial"] for device in devices]
+        if "HOTPLUG" in seen:
+            break
+        with open(os.path.join(state_dir, "devices.json"), "r", encoding="utf-8") as f:
+            rack = json.load(f)
+        rack["HOTPLUG"] = {"state": "device", "model": "Pixel_8", "boot_completed": "1", "sdk": "34"}
+        with open(os.path.join(state_dir, "devices.json"), "w", encoding="utf-8") as f:
+            json.dump(rack, f)
+    timer.cancel()
+    if "HOTPLUG" not in seen:
+        return [f"track-devices feed did not report the new device (saw {seen})"]
+    print(f"track-devices: hot-plugged device reported, {len(seen)} devices")
+    return []
+
+if __name__ == "__main__":
+    main()
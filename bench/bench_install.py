@@ -0,0 +1,404 @@
+"""End-to-end install and verify runs on a simulated machine, checked against a stored baseline.
+
+Every run is ``main.py install`` / ``main.py verify`` in a subprocess
+whose PATH holds only the stand-ins from bench/fake_tools.py (msiexec,
+setx, and the node/npm/java/appium they "install") and whose home,
+LOCALAPPDATA and Program Files are temporary directories. Node.js and
+Adoptium metadata, the MSIs and the platform-tools zip come from a local
+origin throttled per connection; adb is bench/fake_adb.py plus the fake
+adb server. What setx writes is applied to the next run's environment, as
+a new process on Windows would see it.
+
+Scenarios, in order on one machine: ``cold`` (nothing installed, empty
+caches), ``verify``, ``rerun`` (everything up to date) and ``cached``
+(the installs removed, the download cache kept). For each one the wall
+time, the time of every step or probe, the installer's peak RSS and
+the bytes served by the origin are recorded.
+
+On Windows the shims are .cmd files, which ``java -version`` (run without
+a shell) cannot start, so the Java probe fails there.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+
+from bench import fake_adb, fake_tools
+from bench.bench_zip_extract import synthetic_payload
+from bench.fake_adb_server import FakeAdbServer
+from bench.range_server import ArtifactServer
+from bench.release_server import adoptium_documents, node_documents
+from cmd.scheduler import DONE
+from cmd.state import UP_TO_DATE
+from cmd.verify import OK
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Results depend on the machine, so the baseline lives with the installer's own per-machine data.
+DEFAULT_BASELINE = os.path.join(os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache"),
+                                "appium-auto-installer", "bench", "install_baseline.json")
+
+NODE_VERSION = "20.12.0"
+JDK_VERSION = "17.0.11+9"
+SCENARIOS = ("cold", "verify", "rerun", "cached")
+
+# Variables that would let the installer find the real machine's runtimes.
+ISOLATED_VARIABLES = (
+    "JAVA_HOME", "JDK_HOME", "JRE_HOME", "NVM_HOME", "NVM_SYMLINK", "NVM_DIR", "FNM_DIR", "VOLTA_HOME",
+    "ANDROID_HOME", "ANDROID_SDK_ROOT", "APPIUM_HOME", "APPIUM_INSTALLER_MIRROR", "APPIUM_INSTALLER_SEGMENTS",
+    "APPIUM_INSTALLER_APPIUM", "Path",
+)
+
+# Slack on top of the relative tolerance, so that noise in short metrics is not a regression.
+SLACK = {"elapsed_s": 0.5, "peak_rss_mb": 8.0, "bytes": 0}
+
+def platform_tools_zip(size_mb, entries=60, seed=2):
+    rng = random.Random(seed)
+    names = ["adb.exe", "AdbWinApi.dll", "AdbWinUsbApi.dll", "fastboot.exe", "etc1tool.exe", "sqlite3.exe"]
+    names += [f"lib64/lib{index:02d}.so" for index in range(entries - len(names))]
+    weights = [1 / (index + 1) ** 1.5 for index in range(len(names))]
+    total = size_mb * 1024 * 1024
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zip_ref:
+        for name, weight in zip(names, weights):
+            size = max(1024, int(total * weight / sum(weights)))
+            zip_ref.writestr(f"platform-tools/{name}", synthetic_payload(rng, size))
+    return buffer.getvalue()
+
+def build_origin(args):
+    """Node.js dist, the Adoptium API and dl.google.com on one throttled server."""
+    rng = random.Random(1)
+    node_name = f"node-v{NODE_VERSION}-x64.msi"
+    jdk_name = f"OpenJDK17U-jdk_x64_windows_hotspot_{JDK_VERSION.replace('+', '_')}.msi"
+    node_msi = fake_tools.fake_msi("node", int(args.node_mb * 1024 * 1024), rng)
+    jdk_msi = fake_tools.fake_msi("jdk", int(args.jdk_mb * 1024 * 1024), rng)
+    artifacts = {
+        f"/dist/v{NODE_VERSION}/{node_name}": node_msi,
+        f"/adoptium/{jdk_name}": jdk_msi,
+        "/android/platform-tools-latest-windows.zip": platform_tools_zip(args.platform_tools_mb),
+    }
+    server = ArtifactServer(artifacts, int(args.per_connection_mbps * 1024 * 1024) or None)
+    documents = node_documents([NODE_VERSION], checksums={NODE_VERSION: hashlib.sha256(node_msi).hexdigest()})
+    documents.update(adoptium_documents(17, JDK_VERSION, base_url=server.base_url + "/adoptium",
+                                        checksum=hashlib.sha256(jdk_msi).hexdigest()))
+    for path, body in documents.items():
+        artifacts[path] = (json.dumps(body) if not isinstance(body, str) else body).encode("utf-8")
+    return server.start()
+
+class Machine:
+    """A Windows machine as far as the installer can tell, in a temporary directory."""
+
+    def __init__(self, root, origin, adb_port):
+        self.root = root
+        self.origin = origin
+        self.adb_port = adb_port
+        self.home = os.path.join(root, "home")
+        self.local_app_data = os.path.join(self.home, "AppData", "Local")
+        self.tools_bin = os.path.join(root, "tools")
+        self.fake_state = os.path.join(root, "fake-tools")
+        self.trace_dir = os.path.join(root, "traces")
+        # What setx /M has written so far.
+        self.variables = {}
+        self.path_additions = []
+        for directory in (self.local_app_data, os.path.join(self.home, "AppData", "Roaming"),
+                          os.path.join(root, "Program Files")):
+            os.makedirs(directory, exist_ok=True)
+        for tool in ("msiexec", "setx"):
+            fake_tools.write_shim(self.tools_bin, tool, tool)
+        fake_tools.write_shim(self.tools_bin, "adb", script=fake_tools.FAKE_ADB)
+
+    @property
+    def appium_home(self):
+        return os.path.join(self.home, ".appium")
+
+    def env(self):
+        env = {name: value for name, value in os.environ.items() if name not in ISOLATED_VARIABLES}
+        path = [self.tools_bin, fake_tools.bin_dir(self.fake_state)] + self.path_additions
+        if os.name == "nt":
+            path.append(os.path.join(os.environ.get("SystemRoot", r"C:\Windows"), "System32"))
+        program_files = os.path.join(self.root, "Program Files")
+        env.update({
+            "PATH": os.pathsep.join(path),
+            "HOME": self.home,
+            "USERPROFILE": self.home,
+            "LOCALAPPDATA": self.local_app_data,
+            "APPDATA": os.path.join(self.home, "AppData", "Roaming"),
+            "ProgramFiles": program_files,
+            "ProgramW6432": program_files,
+            "ProgramFiles(x86)": program_files,
+            "PROCESSOR_ARCHITECTURE": "AMD64",
+            "APPIUM_HOME": self.appium_home,
+            "APPIUM_INSTALLER_NODE_DIST": self.origin.base_url + "/dist",
+            "APPIUM_INSTALLER_ADOPTIUM_API": self.origin.base_url,
+            "APPIUM_INSTALLER_PLATFORM_TOOLS_URL": self.origin.base_url + "/android/platform-tools-latest-windows.zip",
+            "APPIUM_INSTALLER_ADB": os.path.join(self.tools_bin, "adb"),
+            "ANDROID_ADB_SERVER_PORT": str(self.adb_port),
+            "FAKE_TOOLS_STATE": self.fake_state,
+            "PYTHONPATH": ROOT,
+            "PYTHONUNBUFFERED": "1",
+        })
+        if os.name != "nt":
+            # The Node.js installer extends "Path", which only Windows treats as PATH.
+            env["Path"] = env["PATH"]
+        env.update(self.variables)
+        return env
+
+    def apply_setx(self):
+        try:
+            with open(os.path.join(self.fake_state, "environment.json"), "r", encoding="utf-8") as f:
+                written = json.load(f)
+        except OSError:
+            return
+        for name, value in written.items():
+            if name.upper() == "PATH":
+                for directory in value.split(";"):
+                    if directory and directory != "%PATH%" and directory not in self.path_additions:
+                        self.path_additions.append(directory)
+            else:
+                self.variables[name] = value
+
+    def uninstall(self):
+        """Remove everything installed, keep the download, metadata and npm caches."""
+        for path in (fake_tools.bin_dir(self.fake_state), self.appium_home,
+                     os.path.join(self.home, "android-platform-tools")):
+            shutil.rmtree(path, ignore_errors=True)
+        for name in ("environment.json", "installed.json"):
+            path = os.path.join(self.fake_state, name)
+            if os.path.exists(path):
+                os.remove(path)
+        data_dir = os.path.join(self.local_app_data, "appium-auto-installer")
+        for name in ("state.json", "verify-cache.json", "runtimes.json"):
+            path = os.path.join(data_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+        self.variables, self.path_additions = {}, []
+
+class PeakRss:
+    """Peak resident memory of one process, in MB, or None where it cannot be read.
+
+    A forked child's ru_maxrss starts at the size of this process, so on
+    Linux the child's own high-water mark (VmHWM) is sampled instead, every
+    20 ms until it exits. On Windows it is PeakWorkingSetSize.
+    """
+
+    def __init__(self, process):
+        self.process = process
+        self.peak_mb = None
+        self._thread = None
+        if os.path.exists(f"/proc/{process.pid}/status"):
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+
+    def _sample(self):
+        path = f"/proc/{self.process.pid}/status"
+        while self.process.poll() is None:
+            try:
+                with open(path, "r", encoding="ascii") as f:
+                    for line in f:
+                        if line.startswith("VmHWM:"):
+                            self.peak_mb = max(self.peak_mb or 0, int(line.split()[1]) / 1024)
+            except (OSError, ValueError):
+                pass
+            time.sleep(0.02)
+
+    def wait(self):
+        code = self.process.wait()
+        if self._thread is not None:
+            self._thread.join()
+        elif os.name == "nt":
+            self.peak_mb = windows_peak_working_set(self.process)
+        return code
+
+def windows_peak_working_set(process):
+    import ctypes
+    from ctypes import wintypes
+
+    class Counters(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+            (name, ctypes.c_size_t) for name in (
+                "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+
+    counters = Counters(cb=ctypes.sizeof(Counters))
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(int(process._handle), ctypes.byref(counters), counters.cb):
+        return None
+    return counters.PeakWorkingSetSize / (1024 * 1024)
+
+def run_cli(machine, argv, log):
+    before = machine.origin.bytes_sent
+    started = time.perf_counter()
+    with open(log, "ab") as stderr:
+        process = subprocess.Popen([sys.executable, os.path.join(ROOT, "main.py")] + argv, cwd=machine.root,
+                                   env=machine.env(), stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=stderr)
+        peak_rss = PeakRss(process)
+        output = process.stdout.read()
+        process.stdout.close()
+        code = peak_rss.wait()
+    elapsed = time.perf_counter() - started
+    machine.apply_setx()
+    try:
+        payload = json.loads(output.decode("utf-8"))
+    except ValueError:
+        payload = {}
+    return payload, {
+        "exit_code": code,
+        "elapsed_s": elapsed,
+        "peak_rss_mb": peak_rss.peak_mb,
+        "bytes": machine.origin.bytes_sent - before,
+    }
+
+def span_times(payload, category, key=None):
+    """Seconds per step (``attrs[key]``) or probe (span name) from the run's timing summary."""
+    summary_path = (payload.get("trace") or {}).get("summary")
+    if not summary_path:
+        return {}
+    with open(summary_path, "r", encoding="utf-8") as f:
+        spans = json.load(f)["spans"]
+    return {
+        (span["attrs"].get(key) if key else span["name"]): span["duration_ms"] / 1000
+        for span in spans if span["category"] == category
+    }
+
+def run_scenarios(machine, log):
+    """Run every scenario on ``machine``; returns ({scenario: metrics}, [problem, ...])."""
+    install = ["install", "--quiet", "--trace-dir", machine.trace_dir]
+    results, problems = {}, []
+    for scenario in SCENARIOS:
+        if scenario == "cached":
+            machine.uninstall()
+        argv = ["--no-cache", "verify", "--quiet", "--trace-dir", machine.trace_dir] if scenario == "verify" else install
+        payload, metrics = run_cli(machine, argv, log)
+        with open(os.path.join(machine.root, f"{scenario}.json"), "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2)
+        if scenario == "verify":
+            metrics["steps"] = span_times(payload, "probe")
+            failed = [result["name"] for result in payload.get("results", []) if result["status"] != OK]
+        else:
+            metrics["steps"] = span_times(payload, "step", "step")
+            failed = [step["name"] for step in payload.get("steps", []) if step["status"] != DONE]
+        results[scenario] = metrics
+        if metrics["exit_code"] != 0 or failed:
+            problems.append(f"{scenario}: exit code {metrics['exit_code']}, not done: {failed or '-'}")
+        ran_again = [entry["step"] for entry in payload.get("plan", []) if entry["action"] != UP_TO_DATE]
+        if scenario == "rerun" and ran_again:
+            problems.append(f"rerun: steps ran again: {ran_again}")
+        if scenario in ("rerun", "cached") and metrics["bytes"]:
+            problems.append(f"{scenario}: {metrics['bytes']} bytes downloaded, expected none")
+    return results, problems
+
+def median_results(runs):
+    merged = {}
+    for scenario in SCENARIOS:
+        samples = [run[scenario] for run in runs]
+        merged[scenario] = {
+            metric: statistics.median(sample[metric] for sample in samples)
+            for metric in ("elapsed_s", "peak_rss_mb", "bytes") if all(sample[metric] is not None for sample in samples)
+        }
+        steps = sorted({name for sample in samples for name in sample["steps"]})
+        merged[scenario]["steps"] = {
+            name: statistics.median(sample["steps"].get(name, 0.0) for sample in samples) for name in steps
+        }
+    return merged
+
+def regressions(results, baseline, tolerance):
+    """(scenario, metric, baseline, current) for every metric past the baseline by more than the tolerance."""
+    found = []
+    for scenario, metrics in results.items():
+        base = baseline.get(scenario, {})
+        pairs = [(metric, base.get(metric), metrics.get(metric), SLACK[metric]) for metric in SLACK]
+        pairs += [(f"step {name}", base.get("steps", {}).get(name), seconds, SLACK["elapsed_s"])
+                  for name, seconds in metrics["steps"].items()]
+        for metric, before, now, slack in pairs:
+            if before is not None and now is not None and now > before * (1 + tolerance) + slack:
+                found.append((scenario, metric, before, now))
+    return found
+
+def print_results(results):
+    print(f"{'scenario':>8} {'seconds':>8} {'peak MB':>8} {'MB sent':>8}  slowest steps")
+    for scenario, metrics in results.items():
+        slowest = sorted(metrics["steps"].items(), key=lambda item: -item[1])[:3]
+        steps = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in slowest)
+        peak = metrics.get("peak_rss_mb")
+        print(f"{scenario:>8} {metrics['elapsed_s']:>8.2f} {peak if peak is None else f'{peak:.1f}':>8} "
+              f"{metrics['bytes'] / (1024 * 1024):>8.1f}  {steps}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Install and verify end to end against local stand-ins; "
+                                                 "fails when a result is worse than the stored baseline.")
+    parser.add_argument("--repeat", type=int, default=1, help="Fresh machines to run; the median is compared")
+    parser.add_argument("--node-mb", type=float, default=8)
+    parser.add_argument("--jdk-mb", type=float, default=32)
+    parser.add_argument("--platform-tools-mb", type=float, default=6)
+    parser.add_argument("--per-connection-mbps", type=float, default=16.0,
+                        help="Origin throttle per connection in MB/s (0 disables throttling)")
+    parser.add_argument("--msiexec-seconds", type=float, default=1.0)
+    parser.add_argument("--npm-seconds", type=float, default=0.5, help="npm start-up; each package adds a fifth of it")
+    parser.add_argument("--devices", type=int, default=2, help="Fake Android devices attached")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown (0.25 = 25%%)")
+    parser.add_argument("--keep", action="store_true", help="Keep the machines' directories and logs")
+    args = parser.parse_args()
+
+    origin = build_origin(args)
+    work_dir = tempfile.mkdtemp(prefix="bench-install-")
+    adb_state = os.path.join(work_dir, "adb")
+    os.makedirs(adb_state)
+    # The fake adb server runs in this process and the fake adb in the installer's children.
+    os.environ["FAKE_ADB_STATE"] = adb_state
+    serials = [f"FAKE{index:04d}" for index in range(args.devices)]
+    with open(os.path.join(adb_state, "devices.json"), "w", encoding="utf-8") as f:
+        json.dump({serial: {"state": "device", "model": "Pixel_7", "boot_completed": "1", "sdk": "34"}
+                   for serial in serials}, f)
+    for serial in serials:
+        # Ready devices: the uiautomator2 server is already on them.
+        fake_adb.save_packages(serial, {"io.appium.uiautomator2.server": "7.0.0",
+                                        "io.appium.uiautomator2.server.test": "1.0"})
+    adb_server = FakeAdbServer().start()
+
+    runs, problems = [], []
+    try:
+        for index in range(args.repeat):
+            machine = Machine(os.path.join(work_dir, f"machine{index}"), origin, adb_server.port)
+            fake_tools.write_config(machine.fake_state, latency={
+                "msiexec": args.msiexec_seconds, "npm": args.npm_seconds, "npm_package": args.npm_seconds / 5})
+            log = os.path.join(machine.root, "installer.log")
+            results, run_problems = run_scenarios(machine, log)
+            runs.append(results)
+            problems += [f"run {index + 1}: {problem} (log: {log})" for problem in run_problems]
+    finally:
+        adb_server.stop()
+        origin.shutdown()
+        if not args.keep and not problems:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = median_results(runs)
+    print_results(results)
+    for problem in problems:
+        print(f"FAIL: {problem}")
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        if not problems:
+            os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+            with open(args.baseline, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+            print(f"Baseline saved to {args.baseline}")
+    else:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        for scenario, metric, before, now in regressions(results, baseline, args.tolerance):
+            problems.append(metric)
+            print(f"FAIL: {scenario} {metric}: {now:.2f}, baseline {before:.2f}")
+    sys.exit(1 if problems else 0)
+
+if __name__ == "__main__":
+    main()
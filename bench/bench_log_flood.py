@@ -0,0 +1,133 @@
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from cmd.logpipe import LogPipeline
+
+class HeadlessText:
+    """Minimal stand-in for tkinter.Text, used when no display is available."""
+
+    def __init__(self):
+        self.lines = []
+        self.inserts = 0
+
+    def config(self, **kwargs):
+        pass
+
+    def insert(self, index, *args):
+        self.inserts += 1
+        for text in args[0::2]:
+            self.lines.extend(text.splitlines())
+
+    def index(self, index):
+        return f"{len(self.lines) + 1}.0"
+
+    def delete(self, start, end):
+        if end == "end":
+            self.lines = []
+        else:
+            del self.lines[:int(end.split(".")[0]) - 1]
+
+    def see(self, index):
+        pass
+
+class HeadlessRoot:
+    def __init__(self):
+        self.pending = []
+
+    def after(self, delay_ms, callback):
+        self.pending.append((time.perf_counter() + delay_ms / 1000, callback))
+
+    def update(self):
+        pass
+
+    def run_until(self, predicate):
+        while not predicate():
+            due, callback = self.pending.pop(0)
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            callback()
+
+def make_widgets(headless):
+    if not headless:
+        try:
+            import tkinter as tk
+            from tkinter import scrolledtext
+            root = tk.Tk()
+            root.withdraw()
+            widget = scrolledtext.ScrolledText(root)
+            return root, widget, False
+        except Exception as e:
+            print(f"No Tk display available ({e}); using the headless text stand-in.")
+    return HeadlessRoot(), HeadlessText(), True
+
+def pump(root, headless, predicate):
+    if headless:
+        root.run_until(predicate)
+        return
+    while not predicate():
+        root.update()
+        time.sleep(0.001)
+
+def flood(write, lines):
+    for i in range(lines):
+        write(f"npm http fetch GET 200 https://registry.npmjs.org/package-{i} 12ms", "black")
+
+def bench_per_line(lines, headless):
+    # The old write_log: toggle state, insert, scroll and update for every line.
+    root, widget, headless = make_widgets(headless)
+    started = time.perf_counter()
+    for i in range(lines):
+        widget.config(state="normal")
+        widget.insert("end", f"npm http fetch GET 200 https://registry.npmjs.org/package-{i} 12ms\n", "black")
+        widget.see("end")
+        widget.config(state="disabled")
+        root.update()
+    elapsed = time.perf_counter() - started
+    # The worker is blocked for the whole run.
+    return elapsed, elapsed
+
+def bench_pipeline(lines, headless, max_lines):
+    root, widget, headless = make_widgets(headless)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pipeline = LogPipeline(root, widget, max_lines=max_lines, log_path=os.path.join(temp_dir, "flood.log"))
+        pipeline.start()
+        done = threading.Event()
+        worker_time = []
+
+        def produce():
+            flood(pipeline.write, lines)
+            worker_time.append(time.perf_counter() - started)
+            pipeline.post(done.set)
+
+        started = time.perf_counter()
+        worker = threading.Thread(target=produce)
+        worker.start()
+        pump(root, headless, done.is_set)
+        elapsed = time.perf_counter() - started
+        worker.join()
+        pipeline.stop()
+    return elapsed, worker_time[0]
+
+def main():
+    parser = argparse.ArgumentParser(description="Log throughput under a synthetic line flood.")
+    parser.add_argument("--lines", type=int, default=100_000)
+    parser.add_argument("--max-lines", type=int, default=5000)
+    parser.add_argument("--headless", action="store_true", help="Use the in-memory widget stand-in")
+    parser.add_argument("--skip-per-line", action="store_true", help="Skip the slow per-line baseline")
+    args = parser.parse_args()
+
+    results = []
+    if not args.skip_per_line:
+        results.append(("per-line", bench_per_line(args.lines, args.headless)))
+    results.append(("pipeline", bench_pipeline(args.lines, args.headless, args.max_lines)))
+
+    print(f"{'mode':>10} {'seconds':>8} {'lines/s':>10} {'worker s':>9}")
+    for mode, (elapsed, worker_elapsed) in results:
+        print(f"{mode:>10} {elapsed:>8.2f} {args.lines / elapsed:>10.0f} {worker_elapsed:>9.2f}")
+
+if __name__ == "__main__":
+    main()
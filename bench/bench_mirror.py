@@ -0,0 +1,147 @@
+"""Several installers fetching through one LAN mirror at once, all on localhost.
+
+Each client is a BaseInstaller with its own download cache, pointed at a
+MirrorServer on 127.0.0.1 that serves a cache seeded with the artifact.
+Three rounds run with every client at the same time:
+
+- ``mirror``: the mirror has the artifact; clients fetch it in byte ranges
+  and the origin must see no request.
+- ``resume``: every client has half a mirror transfer on disk and must
+  finish it with an ``If-Range`` request for the rest.
+- ``poisoned``: the mirror's copy is another file; every client must notice
+  the hash mismatch and download from the origin instead.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.range_server import ArtifactServer
+from cmd.cache import DownloadCache
+from cmd.installers import BaseInstaller
+from cmd.mirror import MirrorHandler, MirrorServer
+
+ARTIFACT_PATH = "/android/platform-tools-latest-windows.zip"
+
+class RecordingHandler(MirrorHandler):
+    """Records the Range header of every GET the mirror answers."""
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.ranges.append(self.headers.get("Range"))
+        super().do_GET()
+
+def start_mirror(cache):
+    server = MirrorServer("127.0.0.1", 0, cache=cache)
+    server.RequestHandlerClass = RecordingHandler
+    server.lock = threading.Lock()
+    server.ranges = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def seed(cache, url, data):
+    path = cache.partial_path(url)
+    with open(path, "wb") as f:
+        f.write(data)
+    cache.commit(url, path)
+
+def run_clients(root, mirror, url, sha256, count, segments, prepare=None):
+    """Fetch ``url`` with ``count`` installers at once; return (seconds, [(path, sha256 or None), ...])."""
+    clients = []
+    for index in range(count):
+        installer = BaseInstaller(lambda message, color=None: None,
+                                  cache=DownloadCache(os.path.join(root, f"client-{index}")), mirror=mirror.url)
+        installer.download_segments = segments
+        if prepare:
+            prepare(installer)
+        clients.append(installer)
+
+    def fetch(installer):
+        path = installer.fetch_artifact(url, sha256)
+        if path is None:
+            return None, None
+        with open(path, "rb") as f:
+            return path, hashlib.sha256(f.read()).hexdigest()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        results = list(pool.map(fetch, clients))
+    return time.perf_counter() - started, results
+
+def half_transfer(url, data, sha256):
+    """Leave half of a mirror transfer in the client's cache, as an interrupted run would."""
+    def prepare(installer):
+        partial = installer.cache.partial_path(url) + ".mirror"
+        with open(partial, "wb") as f:
+            f.write(data[:len(data) // 2])
+        with open(partial + ".validator", "w", encoding="utf-8") as f:
+            f.write(f'"{sha256}"')
+    return prepare
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch through a localhost LAN mirror with several clients at once.")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--size-mb", type=int, default=16)
+    parser.add_argument("--segments", type=int, default=4, help="Byte-range connections per client")
+    parser.add_argument("--per-connection-mbps", type=float, default=32.0,
+                        help="Origin throttle per connection in MB/s (0 disables throttling)")
+    args = parser.parse_args()
+    os.environ.pop("APPIUM_INSTALLER_SEGMENTS", None)
+
+    good = os.urandom(args.size_mb * 1024 * 1024)
+    bad = os.urandom(len(good))
+    good_sha = hashlib.sha256(good).hexdigest()
+    origin = ArtifactServer({ARTIFACT_PATH: good}, int(args.per_connection_mbps * 1024 * 1024) or None).start()
+    url = origin.base_url + ARTIFACT_PATH
+
+    failures = []
+    print(f"{'round':>8} {'clients':>7} {'seconds':>8} {'origin GETs':>11} {'mirror GETs':>11} {'ranged':>6}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        rounds = [
+            ("mirror", good, None),
+            ("resume", good, half_transfer(url, good, good_sha)),
+            ("poisoned", bad, None),
+        ]
+        for name, served, prepare in rounds:
+            mirror_cache = DownloadCache(os.path.join(temp_dir, name, "mirror"))
+            seed(mirror_cache, url, served)
+            mirror = start_mirror(mirror_cache)
+            origin_before = origin.requests
+            elapsed, results = run_clients(os.path.join(temp_dir, name), mirror, url, good_sha,
+                                           args.clients, args.segments, prepare)
+            mirror.shutdown()
+            mirror.server_close()
+
+            origin_requests = origin.requests - origin_before
+            ranged = [header for header in mirror.ranges if header]
+            print(f"{name:>8} {args.clients:>7} {elapsed:>8.2f} {origin_requests:>11} "
+                  f"{len(mirror.ranges):>11} {len(ranged):>6}")
+
+            wrong = sum(1 for path, sha256 in results if sha256 != good_sha)
+            if wrong:
+                failures.append(f"{name}: {wrong} of {args.clients} clients did not end up with the expected file")
+            if name == "poisoned":
+                if origin_requests < args.clients:
+                    failures.append(f"{name}: only {origin_requests} origin requests for {args.clients} clients")
+                if mirror.ranges:
+                    failures.append(f"{name}: clients downloaded a mismatched file from the mirror")
+            elif origin_requests:
+                failures.append(f"{name}: the origin saw {origin_requests} requests")
+            if name == "resume":
+                offset = f"bytes={len(good) // 2}-"
+                if [header for header in mirror.ranges if header != offset]:
+                    failures.append(f"{name}: expected only '{offset}' requests, got {sorted(set(map(str, mirror.ranges)))}")
+            elif name == "mirror" and args.segments > 1 and len(ranged) < args.clients * 2:
+                failures.append(f"{name}: only {len(ranged)} range requests reached the mirror")
+
+    origin.shutdown()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
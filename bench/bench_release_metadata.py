@@ -0,0 +1,72 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from bench.release_server import ReleaseServer, adoptium_documents, node_documents
+from cmd.downloader import get_downloader
+from cmd.releases import JAVA, NODE, MetadataCache, ReleaseResolver
+
+def run_phase(name, server, directory, ttl, arch="x64"):
+    before = dict(server.statuses)
+    cache = MetadataCache(directory, ttl=ttl)
+    resolver = ReleaseResolver(cache)
+    started = time.perf_counter()
+    node, java = resolver.resolve_all([(NODE, 20, arch), (JAVA, 17, arch)])
+    elapsed = time.perf_counter() - started
+    sent = {code: count - before.get(code, 0) for code, count in server.statuses.items() if count > before.get(code, 0)}
+    print(f"{name:>10} {elapsed:>8.3f} {sent.get(200, 0):>5} {sent.get(304, 0):>5} "
+          f"{cache.requests['stale']:>6} {node.version if node else '-':>9} {java.version if java else '-':>10}")
+    return node, java, sent, cache
+
+def main():
+    parser = argparse.ArgumentParser(description="Release metadata lookups against a local nodejs.org/Adoptium stand-in.")
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds per request to the stand-in origin")
+    args = parser.parse_args()
+
+    documents = node_documents(["21.6.1", "20.12.0", "20.11.1", "18.19.1"])
+    documents.update(adoptium_documents(17, "17.0.11+9"))
+    server = ReleaseServer(documents, latency=args.latency).start()
+    os.environ["APPIUM_INSTALLER_NODE_DIST"] = server.base_url + "/dist"
+    os.environ["APPIUM_INSTALLER_ADOPTIUM_API"] = server.base_url
+
+    failures = []
+    print(f"{'phase':>10} {'seconds':>8} {'200':>5} {'304':>5} {'stale':>6} {'node':>9} {'jdk':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        node, java, sent, _ = run_phase("cold", server, directory, ttl=3600)
+        if (node.version, java.version) != ("20.12.0", "17.0.11+9") or not node.sha256 or not java.sha256:
+            failures.append(f"cold: resolved {node.to_dict()} / {java.to_dict()}")
+        # Node (index then checksums) and the JDK are looked up at the same time.
+        if sent.get(200) != 3:
+            failures.append(f"cold: expected 3 downloads, got {sent}")
+
+        node, java, sent, _ = run_phase("within ttl", server, directory, ttl=3600)
+        if sent:
+            failures.append(f"within ttl: expected no requests, got {sent}")
+
+        node, java, sent, _ = run_phase("expired", server, directory, ttl=0)
+        # Checksums of a published release never change, so they are not revalidated.
+        if sent != {304: 2}:
+            failures.append(f"expired: expected two 304s, got {sent}")
+
+        documents = node_documents(["21.6.2", "20.12.1", "20.12.0", "20.11.1"])
+        for path, body in documents.items():
+            server.publish(path, body)
+        node, java, sent, _ = run_phase("published", server, directory, ttl=0)
+        if node.version != "20.12.1" or sent.get(200) != 2 or sent.get(304) != 1:
+            failures.append(f"published: expected 20.12.1 from two downloads and a 304, got {node.version} {sent}")
+
+        server.stop()
+        # Drop kept-alive connections too, or their handler threads would keep answering.
+        get_downloader().pool.clear()
+        node, java, sent, cache = run_phase("offline", server, directory, ttl=0)
+        if node is None or java is None or cache.requests["stale"] != 2:
+            failures.append("offline: the last responses were not reused")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
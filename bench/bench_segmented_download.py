@@ -0,0 +1,38 @@
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+
+from bench.range_server import ArtifactServer
+from cmd.downloader import Downloader
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare single-stream and segmented downloads.")
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--per-connection-mbps", type=float, default=16.0,
+                        help="Throttle per connection in MB/s (0 disables throttling)")
+    parser.add_argument("--segments", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    data = os.urandom(args.size_mb * 1024 * 1024)
+    expected = hashlib.sha256(data).hexdigest()
+    server = ArtifactServer({"/jdk.msi": data}, int(args.per_connection_mbps * 1024 * 1024) or None).start()
+    url = server.base_url + "/jdk.msi"
+
+    print(f"{'segments':>8} {'seconds':>8} {'MB/s':>8}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for segments in args.segments:
+            destination = os.path.join(temp_dir, f"jdk-{segments}.msi")
+            downloader = Downloader()
+            started = time.perf_counter()
+            size, sha256 = downloader.download(url, destination, segments=segments, expected_sha256=expected)
+            elapsed = time.perf_counter() - started
+            assert size == len(data) and sha256 == expected
+            print(f"{segments:>8} {elapsed:>8.2f} {size / elapsed / (1024 * 1024):>8.1f}")
+            os.remove(destination)
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
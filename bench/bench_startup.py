@@ -0,0 +1,116 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GUI_MODULES = ("tkinter", "_tkinter", "customtkinter")
+
+def parse_importtime(stderr):
+    """Return {module: cumulative_us} from ``-X importtime`` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_part, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules[name.strip()] = int(cumulative_us)
+    return modules
+
+def isolated_env(temp_dir):
+    # An empty PATH makes every probe fail immediately, so the run measures startup.
+    env = dict(os.environ)
+    env["PATH"] = os.path.join(temp_dir, "bin")
+    env["LOCALAPPDATA"] = os.path.join(temp_dir, "appdata")
+    os.makedirs(env["PATH"])
+    os.makedirs(env["LOCALAPPDATA"])
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+def time_to_first_line(cmd, env):
+    started = time.perf_counter()
+    process = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    first_line = process.stderr.readline()
+    first_work = time.perf_counter() - started
+    process.communicate()
+    return first_work, time.perf_counter() - started, first_line.strip()
+
+def headless(runs):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        return _headless(runs, isolated_env(temp_dir))
+
+def _headless(runs, env):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "main.py", "verify", "--quiet", "--no-cache"],
+        cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+    modules = parse_importtime(result.stderr)
+    leaked = [name for name in GUI_MODULES if name in modules]
+
+    first_work = []
+    total = []
+    for _ in range(runs):
+        first, whole, _ = time_to_first_line([sys.executable, "main.py", "verify", "--no-cache"], env)
+        first_work.append(first)
+        total.append(whole)
+    return min(first_work), min(total), modules, leaked
+
+def gui_imports(runs):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        return _gui_imports(runs, isolated_env(temp_dir))
+
+def _gui_imports(runs, env):
+    timings = []
+    modules = {}
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import cmd.app"],
+            cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        )
+        if result.returncode != 0:
+            return None, result.stderr.strip().splitlines()[-1]
+        timings.append(time.perf_counter() - started)
+        modules = parse_importtime(result.stderr)
+    return min(timings), modules
+
+def top_modules(modules, count=8):
+    roots = {name: us for name, us in modules.items() if "." not in name}
+    return sorted(roots.items(), key=lambda item: item[1], reverse=True)[:count]
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time of the headless and GUI entry points.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-headless-ms", type=float, default=1000.0,
+                        help="Fail if the headless run takes longer than this to start its first probe")
+    parser.add_argument("--max-gui-import-ms", type=float, default=2500.0,
+                        help="Fail if importing the GUI module takes longer than this")
+    args = parser.parse_args()
+    failures = []
+
+    first_work, total, modules, leaked = headless(args.runs)
+    print(f"headless: first probe output after {first_work * 1000:.0f} ms, full verify {total * 1000:.0f} ms")
+    for name, us in top_modules(modules):
+        print(f"    {name:<24} {us / 1000:>8.1f} ms")
+    if leaked:
+        failures.append(f"headless mode imported GUI modules: {', '.join(leaked)}")
+    if first_work * 1000 > args.max_headless_ms:
+        failures.append(f"headless time to first probe {first_work * 1000:.0f} ms > {args.max_headless_ms:.0f} ms")
+
+    gui_time, gui_modules = gui_imports(args.runs)
+    if gui_time is None:
+        print(f"gui: skipped ({gui_modules})")
+    else:
+        print(f"gui: importing cmd.app took {gui_time * 1000:.0f} ms")
+        for name, us in top_modules(gui_modules):
+            print(f"    {name:<24} {us / 1000:>8.1f} ms")
+        if gui_time * 1000 > args.max_gui_import_ms:
+            failures.append(f"GUI import {gui_time * 1000:.0f} ms > {args.max_gui_import_ms:.0f} ms")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+from cmd.ziptree import ZipTreeSync, file_crc32
+
+def synthetic_payload(rng, size):
+    # Compresses about 2:1 like the real executables: repeats deflate can find, but not many.
+    tokens = [rng.randbytes(16) for _ in range(2048)]
+    return b"".join(rng.choice(tokens) for _ in range(size // 16 + 1))[:size]
+
+def build_archive(path, entries, size_mb, seed=1):
+    """A zip shaped like platform-tools: a few large binaries and many small files."""
+    rng = random.Random(seed)
+    weights = [1 / (index + 1) ** 1.5 for index in range(entries)]
+    total = size_mb * 1024 * 1024
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zip_ref:
+        for index, weight in enumerate(weights):
+            size = max(1024, int(total * weight / sum(weights)))
+            folder = "platform-tools/lib64/" if index % 5 == 4 else "platform-tools/"
+            zip_ref.writestr(f"{folder}file{index:03d}.bin", synthetic_payload(rng, size))
+
+def timed(function):
+    started = time.perf_counter()
+    function()
+    return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description="zipfile.extractall against parallel, CRC-checked extraction.")
+    parser.add_argument("--entries", type=int, default=30)
+    parser.add_argument("--size-mb", type=int, default=32, help="Uncompressed size of the archive")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3, help="Best of N runs")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        zip_path = os.path.join(temp_dir, "platform-tools.zip")
+        build_archive(zip_path, args.entries, args.size_mb)
+        with zipfile.ZipFile(zip_path) as zip_ref:
+            infos = [info for info in zip_ref.infolist() if not info.is_dir()]
+        print(f"{len(infos)} entries, {sum(i.file_size for i in infos) / 2 ** 20:.1f} MB "
+              f"-> {os.path.getsize(zip_path) / 2 ** 20:.1f} MB compressed")
+
+        def extractall():
+            target = os.path.join(temp_dir, "extractall")
+            shutil.rmtree(target, ignore_errors=True)
+            with zipfile.ZipFile(zip_path) as zip_ref:
+                zip_ref.extractall(target)
+
+        print(f"{'method':>12} {'seconds':>8} {'MB/s':>8}")
+        baseline = min(timed(extractall) for _ in range(args.repeat))
+        size_mb = sum(i.file_size for i in infos) / 2 ** 20
+        print(f"{'extractall':>12} {baseline:>8.3f} {size_mb / baseline:>8.1f}")
+
+        for workers in args.workers:
+            target = os.path.join(temp_dir, f"sync-{workers}")
+
+            def parallel():
+                shutil.rmtree(target, ignore_errors=True)
+                sync = ZipTreeSync(zip_path, "platform-tools", target, max_workers=workers)
+                with zipfile.ZipFile(zip_path) as zip_ref:
+                    entries = sync.entries(zip_ref)
+                    sync.extract_entries(zip_ref, entries, list(entries), target)
+
+            elapsed = min(timed(parallel) for _ in range(args.repeat))
+            print(f"{f'{workers} workers':>12} {elapsed:>8.3f} {size_mb / elapsed:>8.1f}")
+            for info in infos:
+                path = os.path.join(target, info.filename[len("platform-tools/"):])
+                if file_crc32(path) != info.CRC:
+                    failures.append(f"{workers} workers: {info.filename} does not match the archive")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
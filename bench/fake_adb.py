@@ -0,0 +1,118 @@
+"""Stand-in for the adb command line, driven by files in $FAKE_ADB_STATE.
+
+``devices.json`` maps each serial to {"state", "model", "boot_completed",
+"sdk"}; ``<serial>.packages.json`` maps installed package names to their
+versionName and is updated by ``install``. Every call sleeps for
+$FAKE_ADB_LATENCY seconds (default 0.03) to model the cost of starting adb,
+and installs take $FAKE_ADB_INSTALL_SECONDS longer.
+
+Only the commands the device stage sends are understood.
+"""
+import json
+import os
+import re
+import sys
+import time
+
+SERVER_APK = re.compile(r"appium-uiautomator2-server-v(.+)\.apk$")
+TEST_APK = re.compile(r"appium-uiautomator2-server-debug-androidTest\.apk$")
+
+def state_dir():
+    return os.environ["FAKE_ADB_STATE"]
+
+def load_devices():
+    with open(os.path.join(state_dir(), "devices.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def packages_path(serial):
+    return os.path.join(state_dir(), f"{serial}.packages.json")
+
+def load_packages(serial):
+    try:
+        with open(packages_path(serial), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except OSError:
+        return {}
+
+def save_packages(serial, packages):
+    tmp_path = packages_path(serial) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(packages, f)
+    os.replace(tmp_path, packages_path(serial))
+
+def devices_text(long=True):
+    lines = []
+    for name, device in load_devices().items():
+        extra = f" product:fake model:{device.get('model', 'Fake')} transport_id:1" if long else ""
+        lines.append(f"{name}\t{device.get('state', 'device')}{extra}\n")
+    return "".join(lines)
+
+def shell(serial, script):
+    """Return (output, exit status) of the few shell commands the device stage sends."""
+    device = load_devices()[serial]
+    packages = load_packages(serial)
+    output = []
+    for command in (part.strip() for part in script.split(";")):
+        words = command.split()
+        if not words:
+            continue
+        if words[0] == "echo":
+            output.append(" ".join(words[1:]))
+        elif words[0] == "getprop":
+            key = {"sys.boot_completed": "boot_completed", "ro.build.version.sdk": "sdk"}.get(words[1])
+            output.append(device.get(key, "") if key else "")
+        elif words[:2] == ["dumpsys", "package"]:
+            if words[2] in packages:
+                output.append(f"    versionCode=1 minSdk=21 targetSdk=33\n    versionName={packages[words[2]]}")
+        elif words[:2] == ["pm", "path"]:
+            if words[2] in packages:
+                output.append(f"package:/data/app/{words[2]}/base.apk")
+        else:
+            output.append(f"/system/bin/sh: {words[0]}: not found")
+            return "\n".join(output) + "\n", 127
+    return "\n".join(output) + "\n", 0
+
+def install(serial, apk):
+    time.sleep(float(os.environ.get("FAKE_ADB_INSTALL_SECONDS", "0.2")))
+    name = os.path.basename(apk)
+    packages = load_packages(serial)
+    server = SERVER_APK.search(name)
+    if server:
+        packages["io.appium.uiautomator2.server"] = server.group(1)
+    elif TEST_APK.search(name):
+        packages["io.appium.uiautomator2.server.test"] = "1.0"
+    else:
+        return "Failure [INSTALL_FAILED_INVALID_APK]\n", 1
+    save_packages(serial, packages)
+    return "Performing Streamed Install\nSuccess\n", 0
+
+def main(argv):
+    time.sleep(float(os.environ.get("FAKE_ADB_LATENCY", "0.03")))
+    serial = None
+    if argv[:1] == ["-s"]:
+        serial, argv = argv[1], argv[2:]
+    command = argv[0] if argv else "help"
+
+    if command == "start-server":
+        return 0
+    if command == "version":
+        print("Android Debug Bridge version 1.0.41 (fake)")
+        return 0
+    if command == "devices":
+        print("List of devices attached")
+        print(devices_text(long="-l" in argv))
+        return 0
+
+    devices = load_devices()
+    if serial is None or serial not in devices:
+        print(f"adb: device '{serial}' not found", file=sys.stderr)
+        return 1
+    if command in ("shell", "install"):
+        output, code = shell(serial, " ".join(argv[1:])) if command == "shell" else install(serial, argv[-1])
+        sys.stdout.write(output)
+        return code
+    print(f"fake adb: unsupported command {command}", file=sys.stderr)
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,102 @@
+"""Stand-in for the adb server (host protocol on TCP), backed by the same
+$FAKE_ADB_STATE files as bench/fake_adb.py.
+
+Implements host:version, host:devices(-l), host:track-devices(-l),
+host:transport:<serial> followed by shell:<command>, and closes one-shot
+services after replying like the real server does.
+"""
+import socketserver
+import threading
+import time
+
+from bench import fake_adb
+
+ADB_SERVER_VERSION = 41
+
+def _block(text):
+    payload = text.encode("utf-8")
+    return b"%04x" % len(payload) + payload
+
+class FakeAdbHandler(socketserver.BaseRequestHandler):
+    def _read_request(self):
+        length = self._recv_exact(4)
+        return self._recv_exact(int(length, 16)).decode("utf-8") if length else None
+
+    def _recv_exact(self, size):
+        data = b""
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def _fail(self, message):
+        self.request.sendall(b"FAIL" + _block(message))
+
+    def handle(self):
+        self.server.connections += 1
+        request = self._read_request()
+        if request is None:
+            return
+        if request == "host:version":
+            self.request.sendall(b"OKAY" + _block(f"{ADB_SERVER_VERSION:04x}"))
+        elif request in ("host:devices", "host:devices-l"):
+            self.request.sendall(b"OKAY" + _block(fake_adb.devices_text(long=request.endswith("-l"))))
+        elif request in ("host:track-devices", "host:track-devices-l"):
+            self._track(long=request.endswith("-l"))
+        elif request.startswith("host:transport:"):
+            self._transport(request[len("host:transport:"):])
+        else:
+            self._fail(f"unknown host service '{request}'")
+
+    def _track(self, long):
+        self.request.sendall(b"OKAY")
+        last = None
+        while not self.server.stopping.is_set():
+            text = fake_adb.devices_text(long)
+            if text != last:
+                try:
+                    self.request.sendall(_block(text))
+                except OSError:
+                    return
+                last = text
+            time.sleep(0.05)
+
+    def _transport(self, serial):
+        if serial not in fake_adb.load_devices():
+            self._fail(f"device '{serial}' not found")
+            return
+        self.request.sendall(b"OKAY")
+        service = self._read_request()
+        if service is None or not service.startswith("shell:"):
+            self._fail(f"unsupported service '{service}'")
+            return
+        self.request.sendall(b"OKAY")
+        if self.server.shell_latency:
+            time.sleep(self.server.shell_latency)
+        output, code = fake_adb.shell(serial, service[len("shell:"):])
+        self.request.sendall(output.encode("utf-8"))
+
+class FakeAdbServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port=0, shell_latency=0.0):
+        super().__init__(("127.0.0.1", port), FakeAdbHandler)
+        self.shell_latency = shell_latency
+        self.connections = 0
+        self.stopping = threading.Event()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,222 @@
+"""Stand-ins for msiexec, setx, npm, node, java and appium, driven by $FAKE_TOOLS_STATE.
+
+``config.json`` in that directory sets ``latency`` (seconds per call, by
+tool; npm also takes ``npm_package`` per package installed), ``versions``
+(what node, java and appium report), ``npm_output_lines`` (progress lines
+npm prints per package) and ``fail`` (tools that exit non-zero). Installs
+leave shims in ``bin/``, which the caller keeps on PATH, and setx appends
+to ``environment.json`` so the next run can see the "machine" variables.
+
+Run as ``python fake_tools.py <tool> args...``; ``write_shim`` makes the
+command-line wrappers for a tool.
+"""
+import json
+import os
+import re
+import stat
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_ADB = os.path.join(ROOT, "bench", "fake_adb.py")
+
+DEFAULT_CONFIG = {
+    "latency": {"msiexec": 1.0, "setx": 0.05, "npm": 0.5, "npm_package": 0.2, "node": 0.05, "java": 0.1, "appium": 0.3},
+    "versions": {"node": "20.12.0", "java": "17.0.11", "appium": "2.5.1"},
+    "npm_output_lines": 20,
+    "fail": [],
+}
+
+# msiexec exit code for a fatal error during installation.
+MSI_FATAL = 1603
+MSI_MAGIC = b"FAKEMSI "
+
+def fake_msi(product, size, rng):
+    """``size`` bytes the fake msiexec installs as ``product`` ("node" or "jdk")."""
+    header = MSI_MAGIC + product.encode("ascii") + b"\n"
+    return header + rng.randbytes(size - len(header))
+
+def state_dir():
+    return os.environ["FAKE_TOOLS_STATE"]
+
+def bin_dir(state=None):
+    return os.path.join(state or state_dir(), "bin")
+
+def load_config():
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    try:
+        with open(os.path.join(state_dir(), "config.json"), "r", encoding="utf-8") as f:
+            custom = json.load(f)
+    except OSError:
+        return config
+    for key, value in custom.items():
+        if isinstance(value, dict):
+            config[key].update(value)
+        else:
+            config[key] = value
+    return config
+
+def write_config(directory, **overrides):
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    for key, value in overrides.items():
+        if isinstance(value, dict):
+            config[key].update(value)
+        else:
+            config[key] = value
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "config.json"), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+def write_shim(directory, name, tool=None, script=None):
+    """Put ``name`` on PATH as ``python <script> [tool]``: a .cmd file on Windows, a sh script elsewhere."""
+    script = script or os.path.abspath(__file__)
+    os.makedirs(directory, exist_ok=True)
+    if os.name == "nt":
+        path = os.path.join(directory, f"{name}.cmd")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f'@"{sys.executable}" "{script}" {tool or ""} %*\r\n')
+        return path
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f'#!/bin/sh\nexec "{sys.executable}" "{script}" {tool or ""} "$@"\n')
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
+
+def update_json(name, update):
+    path = os.path.join(state_dir(), name)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except OSError:
+        data = {}
+    update(data)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+def msiexec(argv, config):
+    if "/i" not in argv[:-1]:
+        print("fake msiexec: only /i is supported", file=sys.stderr)
+        return 1
+    package = argv[argv.index("/i") + 1]
+    try:
+        size = os.path.getsize(package)
+    except OSError:
+        size = 0
+    if not size:
+        print(f"This installation package could not be opened: {package}", file=sys.stderr)
+        return MSI_FATAL
+    # The download cache names files by hash, so the product comes from the header fake_msi() wrote.
+    with open(package, "rb") as f:
+        header = f.read(len(MSI_MAGIC) + 64)
+    if not header.startswith(MSI_MAGIC):
+        print(f"This installation package could not be opened: {package}", file=sys.stderr)
+        return MSI_FATAL
+    product = header[len(MSI_MAGIC):].split(b"\n", 1)[0].decode("ascii")
+    if product == "node":
+        write_shim(bin_dir(), "node", "node")
+        write_shim(bin_dir(), "npm", "npm")
+    elif product == "jdk":
+        write_shim(bin_dir(), "java", "java")
+    update_json("installed.json", lambda installed: installed.update({product: size}))
+    return 0
+
+def setx(argv, config):
+    if len(argv) < 2:
+        print("ERROR: Invalid syntax.", file=sys.stderr)
+        return 1
+    name, value = argv[0], argv[1]
+    update_json("environment.json", lambda environment: environment.update({name: value}))
+    print("SUCCESS: Specified value was saved.")
+    return 0
+
+PACKAGE_SPEC = re.compile(r"^(@?[^@]+)(?:@(.+))?$")
+
+def npm(argv, config):
+    if argv[:1] == ["--version"]:
+        print("10.5.0")
+        return 0
+    if argv[:1] != ["install"]:
+        print(f"fake npm: unsupported command {' '.join(argv)}", file=sys.stderr)
+        return 1
+    args = argv[1:]
+    prefix = None
+    if "--prefix" in args:
+        prefix = args[args.index("--prefix") + 1]
+    packages = [arg for index, arg in enumerate(args)
+                if not arg.startswith("-") and (index == 0 or args[index - 1] != "--prefix")]
+    for package in packages:
+        time.sleep(config["latency"]["npm_package"])
+        for line in range(config["npm_output_lines"]):
+            print(f"npm http fetch GET 200 https://registry.npmjs.org/{package} {line}ms (cache miss)")
+        sys.stdout.flush()
+        name, version = PACKAGE_SPEC.match(package).groups()
+        if "-g" in args:
+            if name == "appium":
+                write_shim(bin_dir(), "appium", "appium")
+            continue
+        module = os.path.join(prefix or os.getcwd(), "node_modules", *name.split("/"))
+        os.makedirs(module, exist_ok=True)
+        with open(os.path.join(module, "package.json"), "w", encoding="utf-8") as f:
+            json.dump({"name": name, "version": version or "1.0.0"}, f)
+    print(f"added {len(packages)} packages in {config['latency']['npm']}s")
+    return 0
+
+def node(argv, config):
+    print(f"v{config['versions']['node']}")
+    return 0
+
+def java(argv, config):
+    version = config["versions"]["java"]
+    print(f'openjdk version "{version}" 2024-04-16\nOpenJDK Runtime Environment Temurin-{version}+9 (build {version}+9)',
+          file=sys.stderr)
+    return 0
+
+def write_manifest(home):
+    """What Appium writes to extensions.yaml when it finds npm-installed extensions in APPIUM_HOME."""
+    sys.path.insert(0, ROOT)
+    from cmd.extensions import DRIVER, KNOWN_PACKAGES
+
+    sections = {"drivers": [], "plugins": []}
+    for (kind, name), package in sorted(KNOWN_PACKAGES.items()):
+        module = os.path.join(home, "node_modules", *package.split("/"))
+        try:
+            with open(os.path.join(module, "package.json"), "r", encoding="utf-8") as f:
+                version = json.load(f)["version"]
+        except (OSError, ValueError, KeyError):
+            continue
+        sections["drivers" if kind == DRIVER else "plugins"].append(
+            f"  {name}:\n    version: {version}\n    pkgName: '{package}'\n    installPath: '{module}'\n")
+    path = os.path.join(home, "node_modules", ".cache", "appium", "extensions.yaml")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for section, entries in sections.items():
+            f.write(f"{section}:\n" + "".join(entries) if entries else f"{section}: {{}}\n")
+        f.write("schemaRev: 4\n")
+    return sections
+
+def appium(argv, config):
+    if argv[:1] == ["--version"]:
+        print(config["versions"]["appium"])
+        return 0
+    if argv[:3] == ["driver", "list", "--installed"]:
+        home = os.environ.get("APPIUM_HOME") or os.path.join(os.path.expanduser("~"), ".appium")
+        for entry in write_manifest(home)["drivers"]:
+            print(f"- {entry.split(':')[0].strip()} [installed (npm)]", file=sys.stderr)
+        return 0
+    print(f"fake appium: unsupported command {' '.join(argv)}", file=sys.stderr)
+    return 1
+
+TOOLS = {"msiexec": msiexec, "setx": setx, "npm": npm, "node": node, "java": java, "appium": appium}
+
+def main(argv):
+    tool, argv = argv[0], argv[1:]
+    config = load_config()
+    time.sleep(config["latency"].get(tool, 0))
+    if tool in config["fail"]:
+        print(f"fake {tool}: failing as configured", file=sys.stderr)
+        return MSI_FATAL if tool == "msiexec" else 1
+    return TOOLS[tool](argv, config)
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,96 @@
+import hashlib
+import http.server
+import threading
+import time
+
+class ArtifactHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _artifact(self):
+        return self.server.artifacts.get(self.path.split("?", 1)[0])
+
+    def _etag(self, data):
+        # Hashed once per artifact; segmented downloads send many requests for the same one.
+        key = id(data)
+        if key not in self.server.etags:
+            self.server.etags[key] = f'"{hashlib.sha256(data).hexdigest()[:16]}"'
+        return self.server.etags[key]
+
+    def _send_headers(self, body_length, status, content_range=None, etag=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(body_length))
+        if etag:
+            self.send_header("ETag", etag)
+        if self.server.support_ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        if content_range:
+            self.send_header("Content-Range", content_range)
+        self.end_headers()
+
+    def do_HEAD(self):
+        data = self._artifact()
+        if data is None:
+            self.send_error(404)
+            return
+        self._send_headers(len(data), 200, etag=self._etag(data))
+
+    def do_GET(self):
+        data = self._artifact()
+        if data is None:
+            self.send_error(404)
+            return
+        self.server.requests += 1
+
+        start, end = 0, len(data) - 1
+        etag = self._etag(data)
+        header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if header and self.server.support_ranges and if_range in (None, etag):
+            first, _, last = header.split("=", 1)[1].partition("-")
+            start = int(first)
+            end = min(int(last), end) if last else end
+            self._send_headers(end - start + 1, 206, f"bytes {start}-{end}/{len(data)}", etag)
+        else:
+            self._send_headers(len(data), 200, etag=etag)
+
+        self._write_throttled(memoryview(data)[start:end + 1])
+
+    def _write_throttled(self, body):
+        # Each connection is capped independently, like a per-stream proxy limit.
+        rate = self.server.bytes_per_second
+        chunk = 64 * 1024
+        started = time.perf_counter()
+        for offset in range(0, len(body), chunk):
+            self.wfile.write(body[offset:offset + chunk])
+            self.server.bytes_sent += min(chunk, len(body) - offset)
+            if rate:
+                expected = (offset + chunk) / rate
+                delay = expected - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+
+class ArtifactServer(http.server.ThreadingHTTPServer):
+    """Local stand-in for the download origins, with per-connection throttling."""
+
+    daemon_threads = True
+
+    def __init__(self, artifacts, bytes_per_second=None, support_ranges=True):
+        super().__init__(("127.0.0.1", 0), ArtifactHandler)
+        self.artifacts = artifacts
+        self.bytes_per_second = bytes_per_second
+        self.support_ranges = support_ranges
+        self.requests = 0
+        self.bytes_sent = 0
+        self.etags = {}
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
@@ -0,0 +1,115 @@
+"""Stand-in for nodejs.org/dist and the Adoptium API, with ETag and Last-Modified.
+
+Documents are served by path (the query string is ignored) and answer
+If-None-Match / If-Modified-Since with 304 until ``publish`` replaces them.
+Every request waits ``latency`` seconds, like a round trip to the real origin,
+and its status is counted in ``statuses``.
+"""
+import collections
+import email.utils
+import hashlib
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class ReleaseHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, code, headers=(), body=b""):
+        self.send_response(code)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server.lock:
+            self.server.statuses[code] += 1
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        path = urllib.parse.urlsplit(self.path).path
+        document = self.server.documents.get(path)
+        if document is None:
+            self._send(404)
+            return
+        body, etag, modified = document
+        last_modified = email.utils.formatdate(modified, usegmt=True)
+        headers = [("ETag", etag), ("Last-Modified", last_modified)]
+        if_none_match = self.headers.get("If-None-Match")
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_none_match is not None:
+            not_modified = if_none_match == etag
+        elif if_modified_since is not None:
+            since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+            not_modified = int(modified) <= since
+        else:
+            not_modified = False
+        if not_modified:
+            self._send(304, headers)
+        else:
+            self._send(200, headers + [("Content-Type", "application/json")], body)
+
+class ReleaseServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, documents=None, latency=0.0):
+        super().__init__(("127.0.0.1", 0), ReleaseHandler)
+        self.latency = latency
+        self.documents = {}
+        self.statuses = collections.Counter()
+        self.lock = threading.Lock()
+        for path, body in (documents or {}).items():
+            self.publish(path, body)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def publish(self, path, body):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8") if not isinstance(body, str) else body.encode("utf-8")
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        # Last-Modified has one-second resolution; make each publish strictly newer.
+        previous = max((document[2] for document in self.documents.values()), default=time.time() - 60)
+        self.documents[path] = (body, etag, max(int(time.time()), int(previous) + 1))
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+def node_documents(versions, arch="x64", checksums=None):
+    """index.json (newest first) and one SHASUMS256.txt per version; ``checksums`` maps
+    a version to the real SHA-256 of its MSI when one is served."""
+    documents = {"/dist/index.json": [
+        {"version": f"v{version}", "files": [f"win-{arch}-msi", f"win-{arch}-zip"], "lts": "Iron"}
+        for version in versions
+    ]}
+    for version in versions:
+        filename = f"node-v{version}-{arch}.msi"
+        sha256 = (checksums or {}).get(version) or hashlib.sha256(filename.encode("utf-8")).hexdigest()
+        documents[f"/dist/v{version}/SHASUMS256.txt"] = f"{sha256}  {filename}\n{'0' * 64}  node-v{version}.tar.gz\n"
+    return documents
+
+def adoptium_documents(feature, version, arch="x64", base_url="https://example.invalid", checksum=None):
+    file_version = version.replace("+", "_")
+    name = f"OpenJDK{feature}U-jdk_{arch}_windows_hotspot_{file_version}.msi"
+    return {f"/v3/assets/latest/{feature}/hotspot": [{
+        "binary": {
+            "image_type": "jdk",
+            "os": "windows",
+            "installer": {"name": name, "link": f"{base_url}/{name}",
+                          "checksum": checksum or hashlib.sha256(name.encode("utf-8")).hexdigest()},
+        },
+        "release_name": f"jdk-{version}",
+        "version": {"semver": version},
+    }]}
@@ -0,0 +1,143 @@
+import os
+import select
+import socket
+import time
+
+from cmd.devices import parse_devices
+from cmd.process import COMMAND_TIMEOUT
+
+DEFAULT_PORT = 5037
+
+def adb_server_port():
+    # The same variable adb.exe reads.
+    try:
+        return int(os.environ.get("ANDROID_ADB_SERVER_PORT", DEFAULT_PORT))
+    except ValueError:
+        return DEFAULT_PORT
+
+class AdbError(Exception):
+    pass
+
+def _recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise AdbError("adb server closed the connection")
+        data.extend(chunk)
+    return bytes(data)
+
+def _send_request(sock, request):
+    payload = request.encode("utf-8")
+    sock.sendall(b"%04x" % len(payload) + payload)
+
+def _read_status(sock):
+    status = _recv_exact(sock, 4)
+    if status == b"OKAY":
+        return
+    if status == b"FAIL":
+        raise AdbError(_read_block(sock))
+    raise AdbError(f"unexpected adb server reply {status!r}")
+
+def _read_block(sock):
+    return _recv_exact(sock, int(_recv_exact(sock, 4), 16)).decode("utf-8", "replace")
+
+class AdbClient:
+    """Client for the adb server's host protocol on 127.0.0.1:5037.
+
+    This is the protocol adb.exe uses to talk to its own server: each query
+    is one TCP round trip instead of one adb process. The server closes
+    one-shot services after replying, so the connection that stays open is
+    the ``host:track-devices`` feed behind ``track_devices()``. Installing APKs (the sync protocol) is left to
+    the adb command line given as ``fallback``.
+    """
+
+    def __init__(self, host="127.0.0.1", port=None, timeout=10, fallback=None):
+        self.host = host
+        self.port = port or adb_server_port()
+        self.timeout = timeout
+        self.fallback = fallback
+
+    def _connect(self, timeout=None):
+        sock = socket.create_connection((self.host, self.port), timeout=timeout or self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _query(self, request):
+        with self._connect() as sock:
+            _send_request(sock, request)
+            _read_status(sock)
+            return _read_block(sock)
+
+    def available(self):
+        try:
+            self.version()
+            return True
+        except (OSError, AdbError):
+            return False
+
+    def start_server(self, timeout=30):
+        if self.available():
+            return True
+        if self.fallback is None or not self.fallback.start_server(timeout):
+            return False
+        return self.available()
+
+    def version(self):
+        return int(self._query("host:version"), 16)
+
+    def devices(self, timeout=None):
+        return parse_devices(self._query("host:devices-l"))
+
+    def _open_tracking(self):
+        # The -l variant (with models) needs platform-tools 30 or later.
+        for request in ("host:track-devices-l", "host:track-devices"):
+            sock = self._connect()
+            try:
+                _send_request(sock, request)
+                _read_status(sock)
+                return sock
+            except AdbError:
+                sock.close()
+                if request == "host:track-devices":
+                    raise
+
+    def track_devices(self, stop_event=None):
+        """Yield the full device list now and again every time it changes."""
+        with self._open_tracking() as sock:
+            sock.settimeout(None)
+            while stop_event is None or not stop_event.is_set():
+                readable, _, _ = select.select([sock], [], [], 0.5)
+                if readable:
+                    yield parse_devices(_read_block(sock))
+
+    def shell(self, serial, script, timeout=30):
+        # Same (stdout, stderr, returncode) shape as run_command, so callers don't care
+        # which transport they got. The legacy shell service merges stderr into stdout.
+        deadline = time.monotonic() + timeout
+        try:
+            with self._connect(timeout) as sock:
+                _send_request(sock, f"host:transport:{serial}")
+                _read_status(sock)
+                _send_request(sock, f"shell:{script}")
+                _read_status(sock)
+                chunks = []
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise socket.timeout()
+                    sock.settimeout(remaining)
+                    chunk = sock.recv(65536)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+            return b"".join(chunks).decode("utf-8", "replace"), "", 0
+        except socket.timeout:
+            return "", f"Timed out after {timeout}s\n", COMMAND_TIMEOUT
+        except (OSError, AdbError) as e:
+            return "", str(e), 1
+
+    def install(self, serial, apk, grant_permissions=False, timeout=180):
+        if self.fallback is None:
+            return "", "installing needs the adb command line", 1
+        return self.fallback.install(serial, apk, grant_permissions, timeout)
@@ -1,28 +1,32 @@
 import tkinter as tk
 from tkinter import scrolledtext, messagebox
 import customtkinter as ctk
-import os
-import ctypes
+import sqlite3
 import threading
-from cmd.installers import NodeInstaller, JavaInstaller, PlatformToolsInstaller, AppiumInstaller
+from cmd.history import ProgressEstimator, format_eta, step_history
+from cmd.logpipe import LogPipeline
+from cmd.scheduler import InstallScheduler
+from cmd.state import RUN, Reconciler
+from cmd.tracing import tracer
+from cmd.verify import VerifyCache, run_probes
+from cmd.workflow import INSTALL_STEPS, Installers, build_desired_state, build_install_steps, build_verify_probes, is_admin
 
 class AppiumSetupApp:
-    def __init__(self, root):
+    def __init__(self, root, use_verify_cache=True, bundle_dir=None, mirror=None):
         self.root = root
+        self.bundle_dir = bundle_dir
+        self.mirror = mirror
+        self.verify_cache = VerifyCache() if use_verify_cache else None
+        self.cancel_event = threading.Event()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         self.root.title("APPIUM WINDOWS AUTO INSTALLER")
         self.root.geometry("525x700")
         
-        self.install_steps = [
-            "Checking administrator rights",
-            "Installing Node.js",
-            "Installing Appium",
-            "Downloading Android Platform Tools",
-            "Setting up Android environment variables",
-            "Installing Java JDK",
-            "Setting up Appium Driver"
-        ]
+        self.install_steps = list(INSTALL_STEPS)
         
         self.total_steps = len(self.install_steps)
+        self.progress_percent = 0
+        self.estimator = None
         self.setup_ui()
         
     def setup_ui(self):
@@ -150,6 +154,9 @@ class AppiumSetupApp:
         
         self.setup_log_colors()
         
+        self.log_pipeline = LogPipeline(self.root, self.log_text)
+        self.log_pipeline.start()
+        
     def setup_log_colors(self):
         self.log_text.tag_configure("black", foreground="#AAAAAA")
         self.log_text.tag_configure("red", foreground="#FF3333")
@@ -160,36 +167,73 @@ class AppiumSetupApp:
         self.log_text.tag_configure("darkgreen", foreground="#006600")
         
     def write_log(self, message, color="black"):
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, message + "\n", color)
-        self.log_text.see(tk.END)
-        self.log_text.config(state=tk.DISABLED)
-        self.root.update()
+        # Safe from any thread; lines reach the widget in batches on the Tk thread.
+        self.log_pipeline.write(message, color)
+        
+    def set_progress(self, fraction, text):
+        def apply():
+            self.progress_bar.set(fraction)
+            self.progress_label.configure(text=text)
+        self.log_pipeline.post(apply)
         
     def update_progress(self, step, status):
-        percent = (step / self.total_steps) * 100
-        self.progress_bar.set(percent / 100)
-        self.progress_label.configure(text=f"{int(percent)}%")
+        if self.estimator is not None:
+            fraction = self.estimator.snapshot()[0]
+            text = self.estimator.describe()
+        else:
+            fraction = step / self.total_steps
+            text = f"{int(fraction * 100)}%"
+        self.progress_percent = int(fraction * 100)
+        self.set_progress(fraction, text)
         self.write_log(f"[{step}/{self.total_steps}] {status}", "blue")
+        
+    def update_download_progress(self, url, done, total, step=None):
+        name = url.rsplit("/", 1)[-1]
+        if self.estimator is not None:
+            self.estimator.download_progress(url, done, total, step)
+            fraction, eta = self.estimator.snapshot()
+            self.progress_percent = int(fraction * 100)
+            prefix = f"{self.progress_percent}% - {format_eta(eta)} left - "
+            self.log_pipeline.post(lambda: self.progress_bar.set(fraction))
+        else:
+            prefix = f"{self.progress_percent}% - "
+        if total:
+            text = f"{prefix}{name[:24]} {done * 100 // total}%"
+        else:
+            text = f"{prefix}{name[:24]} {done // (1024 * 1024)} MB"
+        self.log_pipeline.post(lambda: self.progress_label.configure(text=text))
             
     def is_admin(self):
-        try:
-            return ctypes.windll.shell32.IsUserAnAdmin() != 0
-        except:
-            return False
+        return is_admin()
             
+    def on_close(self):
+        # Kill any running npm/msiexec process trees before the window goes away.
+        self.cancel_event.set()
+        self.log_pipeline.stop()
+        self.root.destroy()
+        
     def start_installation(self):
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.delete(1.0, tk.END)
-        self.log_text.config(state=tk.DISABLED)
+        self.log_pipeline.clear()
+        self.cancel_event.clear()
         
         self.write_log("Starting installation process...", "darkgreen")
-        threading.Thread(target=self.install_components, daemon=True).start()
+        threading.Thread(target=self.run_traced, args=("install", self.install_components), daemon=True).start()
+        
+    def run_traced(self, name, function):
+        tracer.reset(name)
+        try:
+            function()
+        finally:
+            try:
+                summary_path, trace_path = tracer.export()
+                self.write_log(f"Timing trace saved to {trace_path}", "blue")
+            except OSError as e:
+                self.write_log(f"Could not save timing trace: {str(e)}", "red")
         
     def install_components(self):
+        self.estimator = None
         try:
-            step = 1
-            self.update_progress(step, self.install_steps[0])
+            self.update_progress(1, self.install_steps[0])
             
             if not self.is_admin():
                 self.write_log("Not running as Administrator. Some steps may fail.", "red")
@@ -201,50 +245,53 @@ class AppiumSetupApp:
             else:
                 self.write_log("Running with administrative privileges.", "green")
             
-            node_installer = NodeInstaller(self.write_log)
-            java_installer = JavaInstaller(self.write_log)
-            platform_tools_installer = PlatformToolsInstaller(self.write_log)
-            appium_installer = AppiumInstaller(self.write_log)
+            bundle = None
+            if self.bundle_dir:
+                from cmd.bundle import Bundle, verify_bundle
+                bundle = Bundle(self.bundle_dir)
             
-            step += 1
-            self.update_progress(step, self.install_steps[1])
-            self.write_log("\nChecking for Node.js...", "darkblue")
-            if not node_installer.install():
-                return
-                
-            step += 1
-            self.update_progress(step, self.install_steps[2])
-            self.write_log("\nChecking for Appium...", "darkblue")
-            if not appium_installer.install():
-                return
-                
-            step += 1
-            self.update_progress(step, self.install_steps[3])
-            self.write_log("\nDownloading Android Platform Tools...", "darkblue")
-            platform_tools_path = platform_tools_installer.install()
-            if not platform_tools_path:
-                return
-                
-            step += 1
-            self.update_progress(step, self.install_steps[4])
-            self.write_log("\nSetting up Android environment variables...", "darkblue")
-            if not platform_tools_installer.setup_environment_variables():
-                return
-                
-            step += 1
-            self.update_progress(step, self.install_steps[5])
-            self.write_log("\nChecking for Java...", "darkblue")
-            if not java_installer.install():
-                return
-                
-            step += 1
-            self.update_progress(step, self.install_steps[6])
-            self.write_log("\nSetting up Appium Android Driver...", "darkblue")
-            if not appium_installer.install_driver():
+            installers = Installers(
+                self.write_log,
+                progress_function=self.update_download_progress,
+                cancel_event=self.cancel_event,
+                confirm_function=messagebox.askyesno,
+                bundle=bundle,
+                mirror=self.mirror
+            )
+            installers.resolve_releases()
+            reconciler = Reconciler(build_desired_state(installers), self.write_log)
+            steps = build_install_steps(installers, self.write_log, self.install_steps)
+            plan = reconciler.plan(steps)
+            reconciler.log_plan(plan)
+            
+            if bundle is not None and any(entry["action"] == RUN for entry in plan):
+                if not verify_bundle(bundle, self.write_log):
+                    self.write_log("Offline bundle failed verification. Installation cancelled.", "red")
+                    return
+            steps = reconciler.wrap_all(steps)
+            self.estimator = ProgressEstimator(steps, plan, step_history.estimates())
+            
+            def on_step_finished(finished, total, label, status):
+                self.estimator.step_finished(label)
+                # The admin check above counts as the first step.
+                self.update_progress(finished + 1, f"{label}: {status}")
+            
+            scheduler = InstallScheduler(steps, self.write_log, on_step_finished, cancel_event=self.cancel_event,
+                                         start_function=self.estimator.step_started)
+            succeeded = scheduler.run()
+            try:
+                step_history.record_trace(plan, succeeded)
+            except (OSError, sqlite3.Error) as e:
+                self.write_log(f"Could not save step timings: {str(e)}", "red")
+            
+            self.write_log("\nInstallation Summary:", "darkblue")
+            scheduler.report_branches()
+            
+            if not succeeded:
+                self.write_log("\nInstallation finished with errors. Please check the logs for details.", "red")
                 return
             
-            self.progress_bar.set(1)
-            self.progress_label.configure(text="100%")
+            self.set_progress(1, "100%")
             self.write_log("\nInstallation complete!", "green")
             self.write_log("You can now verify the installation by clicking the 'VERIFY INSTALLATION' button.", "blue")
             
@@ -253,48 +300,23 @@ class AppiumSetupApp:
             self.write_log("Installation failed. Please check the logs for details.", "red")
             
     def verify_installation(self):
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.delete(1.0, tk.END)
-        self.log_text.config(state=tk.DISABLED)
+        self.log_pipeline.clear()
         
         self.write_log("Verifying installation...", "darkgreen")
-        threading.Thread(target=self.verify_components, daemon=True).start()
+        threading.Thread(target=self.run_traced, args=("verify", self.verify_components), daemon=True).start()
         
     def verify_components(self):
-        verification_results = []
-        
         try:
-            node_installer = NodeInstaller(self.write_log)
-            java_installer = JavaInstaller(self.write_log)
-            platform_tools_installer = PlatformToolsInstaller(self.write_log)
-            appium_installer = AppiumInstaller(self.write_log)
-            
-            self.write_log("\nChecking Node.js...", "darkblue")
-            node_result = node_installer.verify()
-            verification_results.append(node_result)
-            
-            self.write_log("\nChecking Appium...", "darkblue")
-            appium_result = appium_installer.verify()
-            verification_results.append(appium_result)
-            
-            self.write_log("\nChecking Java...", "darkblue")
-            java_result = java_installer.verify()
-            verification_results.append(java_result)
-            
-            self.write_log("\nChecking Android Platform Tools...", "darkblue")
-            platform_tools_result = platform_tools_installer.verify()
-            verification_results.append(platform_tools_result)
-            
-            self.write_log("\nChecking Appium Android Driver...", "darkblue")
-            driver_result = appium_installer.verify_driver()
-            verification_results.append(driver_result)
+            installers = Installers(self.write_log, confirm_function=messagebox.askyesno)
+            probes = build_verify_probes(installers)
+            self.write_log("\nChecking Node.js, Appium, Java, Android Platform Tools and Appium extensions...", "darkblue")
+            verification_results = run_probes(probes, cache=self.verify_cache)
             
             self.write_log("\nVerification Summary:", "darkblue")
             for result in verification_results:
-                if "❌" in result:
-                    self.write_log(result, "red")
-                else:
-                    self.write_log(result, "green")
+                color = "green" if result.ok else "red"
+                source = "cached" if result.cached else f"{result.elapsed_ms:.0f} ms"
+                self.write_log(f"{result.summary} ({source})", color)
                     
         except Exception as e:
-            self.write_log(f"Error during verification: {str(e)}", "red")
\ No newline at end of file
+            self.write_log(f"Error during verification: {str(e)}", "red")
@@ -0,0 +1,218 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import urllib.parse
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from cmd.extensions import APPIUM_EXTENSIONS
+from cmd.installers import PlatformToolsInstaller, windows_arch
+from cmd.workflow import Installers
+
+MANIFEST_NAME = "manifest.json"
+FORMAT_VERSION = 1
+READ_CHUNK = 1024 * 1024
+
+def copy_with_sha256(source, destination):
+    digest = hashlib.sha256()
+    size = 0
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        for chunk in iter(lambda: src.read(READ_CHUNK), b""):
+            dst.write(chunk)
+            digest.update(chunk)
+            size += len(chunk)
+    return size, digest.hexdigest()
+
+def stream_sha256(path):
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return size, digest.hexdigest()
+
+def platform_tools_revision(zip_path):
+    try:
+        with zipfile.ZipFile(zip_path) as zip_ref:
+            properties = zip_ref.read("platform-tools/source.properties").decode("utf-8", "replace")
+        for line in properties.splitlines():
+            if line.startswith("Pkg.Revision="):
+                return line.split("=", 1)[1].strip()
+    except (KeyError, OSError, zipfile.BadZipFile):
+        pass
+    return None
+
+class Bundle:
+    """Read side of an offline provisioning bundle.
+
+    Every artifact is checked against the manifest's size and SHA-256 the
+    first time it is used (or up front through ``verify_all``), while it is
+    being read; an artifact that fails the check is never handed out.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        with open(os.path.join(self.root, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported bundle format in {self.root}: {self.manifest.get('format')}")
+        self.artifacts = self.manifest["artifacts"]
+        self.npm_cache = os.path.join(self.root, self.manifest["npm_cache"])
+        self._verified = {}
+        self._locks = {name: threading.Lock() for name in self.artifacts}
+
+    def path(self, name):
+        return os.path.join(self.root, self.artifacts[name]["file"])
+
+    def _check(self, name):
+        entry = self.artifacts[name]
+        try:
+            size, sha256 = stream_sha256(self.path(name))
+        except OSError:
+            return False
+        return size == entry["size"] and sha256 == entry["sha256"]
+
+    def verified_path(self, name):
+        if name not in self.artifacts:
+            return None
+        with self._locks[name]:
+            if name not in self._verified:
+                self._verified[name] = self._check(name)
+        return self.path(name) if self._verified[name] else None
+
+    def verify_all(self, max_workers=4):
+        names = list(self.artifacts)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bundle") as pool:
+            results = pool.map(lambda name: self.verified_path(name) is not None, names)
+            return dict(zip(names, results))
+
+    def name_for_url(self, url):
+        for name, entry in self.artifacts.items():
+            if entry.get("url") == url:
+                return name
+        return None
+
+    def path_for_url(self, url):
+        name = self.name_for_url(url)
+        return self.verified_path(name) if name else None
+
+    def npm_env(self):
+        env = dict(os.environ)
+        env["npm_config_cache"] = self.npm_cache
+        env["npm_config_offline"] = "true"
+        env["npm_config_audit"] = "false"
+        env["npm_config_fund"] = "false"
+        return env
+
+    def npm_install_command(self, name):
+        tarball = self.verified_path(name)
+        if tarball is None:
+            return None, None
+        return f'npm install -g "{tarball}"', self.npm_env()
+
+def verify_bundle(bundle, write_log):
+    write_log(f"Verifying offline bundle at {bundle.root}...", "yellow")
+    results = bundle.verify_all()
+    for name, ok in results.items():
+        if ok:
+            write_log(f"    {name}: {bundle.artifacts[name]['file']} OK", "green")
+        else:
+            write_log(f"    {name}: {bundle.artifacts[name]['file']} missing or corrupt", "red")
+    return all(results.values())
+
+class BundleBuilder:
+    def __init__(self, root, write_log, cancel_event=None, arch=None, mirror=None):
+        self.root = os.path.abspath(root)
+        self.write_log = write_log
+        self.arch = arch or windows_arch()
+        self.installers = Installers(write_log, cancel_event=cancel_event, mirror=mirror)
+
+    def _add_download(self, name, installer, url, version, sha256=None):
+        path = installer.fetch_artifact(url, sha256)
+        if not path:
+            raise RuntimeError(f"could not download {url}")
+        filename = urllib.parse.unquote(url.rsplit("/", 1)[-1])
+        destination = os.path.join(self.root, "artifacts", filename)
+        size, sha256 = copy_with_sha256(path, destination)
+        if name == "platform_tools":
+            version = platform_tools_revision(destination) or version
+        self.write_log(f"Added {filename} ({size // (1024 * 1024)} MB)", "green")
+        return {"file": f"artifacts/{filename}", "url": url, "version": version, "size": size, "sha256": sha256}
+
+    def _npm(self, cmd):
+        stdout, stderr, code = self.installers.appium.run_command(
+            cmd, timeout=self.installers.appium.NPM_TIMEOUT, stream=False
+        )
+        if code != 0:
+            raise RuntimeError(f"'{cmd}' failed: {stderr.strip()}")
+        return stdout
+
+    def _add_npm_packages(self, specs):
+        npm_dir = os.path.join(self.root, "npm")
+        npm_cache = os.path.join(self.root, "npm-cache")
+        packed = json.loads(self._npm(
+            f'npm pack {" ".join(specs.values())} --json --pack-destination "{npm_dir}"'
+        ))
+
+        entries = {}
+        for name, info in zip(specs, packed):
+            tarball = os.path.join(npm_dir, info["filename"])
+            size, sha256 = stream_sha256(tarball)
+            entries[name] = {
+                "file": f"npm/{info['filename']}",
+                "package": info["name"],
+                "version": info["version"],
+                "size": size,
+                "sha256": sha256,
+            }
+            self.write_log(f"Packed {info['name']}@{info['version']}", "green")
+
+        # Installing the tarballs into a throwaway prefix pulls every dependency
+        # into the bundle's npm cache, which offline installs then read from.
+        prefix = tempfile.mkdtemp(prefix="appium-bundle-")
+        try:
+            tarballs = " ".join(f'"{os.path.join(self.root, entry["file"])}"' for entry in entries.values())
+            self.write_log("Populating the bundle npm cache...", "yellow")
+            self._npm(f'npm install -g --prefix "{prefix}" --cache "{npm_cache}" --no-audit --no-fund {tarballs}')
+        finally:
+            shutil.rmtree(prefix, ignore_errors=True)
+        return entries
+
+    def build(self, appium_spec="appium", extensions=APPIUM_EXTENSIONS):
+        for directory in ("artifacts", "npm", "npm-cache"):
+            os.makedirs(os.path.join(self.root, directory), exist_ok=True)
+
+        installers = self.installers
+        releases = installers.resolve_releases(self.arch)
+        node, java = releases["node"], releases["java"]
+        downloads = [
+            ("node", installers.node, node["url"], node["version"], node["sha256"]),
+            ("jdk", installers.java, java["url"], java["version"], java["sha256"]),
+            ("platform_tools", installers.platform_tools, PlatformToolsInstaller.DOWNLOAD_URL, "latest", None),
+        ]
+        with ThreadPoolExecutor(max_workers=len(downloads), thread_name_prefix="bundle") as pool:
+            futures = {name: pool.submit(self._add_download, name, installer, url, version, sha256)
+                       for name, installer, url, version, sha256 in downloads}
+            artifacts = {name: future.result() for name, future in futures.items()}
+
+        specs = {"appium": appium_spec}
+        specs.update((extension.name, extension.spec) for extension in extensions)
+        artifacts.update(self._add_npm_packages(specs))
+
+        manifest = {
+            "format": FORMAT_VERSION,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "arch": self.arch,
+            "npm_cache": "npm-cache",
+            "artifacts": artifacts,
+        }
+        tmp_path = os.path.join(self.root, MANIFEST_NAME + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.root, MANIFEST_NAME))
+        return manifest
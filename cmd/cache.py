@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+def default_cache_dir():
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "appium-auto-installer", "downloads")
+
+def url_key(url):
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class DownloadCache:
+    """Content-addressed store for downloaded installer artifacts.
+
+    Blobs live under ``blobs/<sha256>`` and ``index.json`` maps each URL to
+    the blob it produced, so a lookup by URL or by expected hash never
+    touches the network. Files only appear under their final name through
+    ``os.replace``; a crash mid-download leaves only a ``.partial-`` file
+    that the next attempt resumes from.
+    """
+
+    def __init__(self, root=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root or default_cache_dir()
+        self.blob_dir = os.path.join(self.root, "blobs")
+        self.index_path = os.path.join(self.root, "index.json")
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            index.setdefault("urls", {})
+            index.setdefault("blobs", {})
+            return index
+        except (OSError, ValueError):
+            return {"urls": {}, "blobs": {}}
+
+    def _save_index(self, index):
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".index-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(index, f, indent=1)
+            os.replace(tmp_path, self.index_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def blob_path(self, sha256):
+        return os.path.join(self.blob_dir, sha256.lower())
+
+    def lookup(self, url, sha256=None, max_age=None):
+        with self._lock:
+            index = self._load_index()
+            url_entry = index["urls"].get(url_key(url))
+            if sha256 is None:
+                if url_entry is None:
+                    return None
+                # Moving targets such as "-latest" URLs are only trusted for max_age seconds.
+                if max_age is not None and time.time() - url_entry["fetched"] > max_age:
+                    return None
+                sha256 = url_entry["sha256"]
+            sha256 = sha256.lower()
+            path = self.blob_path(sha256)
+            entry = index["blobs"].get(sha256)
+            if entry is None or not os.path.isfile(path) or os.path.getsize(path) != entry["size"]:
+                return None
+            entry["last_used"] = time.time()
+            if url_entry is None or url_entry["sha256"] != sha256:
+                index["urls"][url_key(url)] = {"sha256": sha256, "fetched": time.time()}
+            self._save_index(index)
+            return path
+
+    def commit(self, url, tmp_path, sha256=None, expected_sha256=None):
+        if sha256 is None:
+            sha256 = file_sha256(tmp_path)
+        sha256 = sha256.lower()
+        if expected_sha256 and expected_sha256.lower() != sha256:
+            os.remove(tmp_path)
+            raise ValueError(f"SHA-256 mismatch for {url}: expected {expected_sha256}, got {sha256}")
+
+        with self._lock:
+            path = self.blob_path(sha256)
+            os.replace(tmp_path, path)
+            index = self._load_index()
+            index["blobs"][sha256] = {
+                "size": os.path.getsize(path),
+                "last_used": time.time(),
+                "url": url,
+            }
+            index["urls"][url_key(url)] = {"sha256": sha256, "fetched": time.time()}
+            self._evict(index, keep=sha256)
+            self._save_index(index)
+            return path
+
+    def partial_path(self, url):
+        # Stable per URL so an interrupted download can be resumed by the next run.
+        os.makedirs(self.blob_dir, exist_ok=True)
+        return os.path.join(self.blob_dir, f".partial-{url_key(url)}")
+
+    def fetch(self, url, download, sha256=None, max_age=None):
+        """Return a cached path for ``url``, calling ``download(url, tmp_path)`` on a miss.
+
+        ``download`` returns a falsy value on failure, or either ``True`` or the
+        SHA-256 it computed while writing the file.
+        """
+        path = self.lookup(url, sha256, max_age)
+        if path:
+            return path, True
+
+        tmp_path = self.partial_path(url)
+        result = download(url, tmp_path)
+        if not result:
+            return None, False
+        computed = result if isinstance(result, str) else None
+        return self.commit(url, tmp_path, computed, expected_sha256=sha256), False
+
+    def _evict(self, index, keep=None):
+        blobs = index["blobs"]
+        total = sum(entry["size"] for entry in blobs.values())
+        for sha256, entry in sorted(blobs.items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if sha256 == keep:
+                continue
+            try:
+                os.remove(self.blob_path(sha256))
+            except OSError:
+                pass
+            total -= entry["size"]
+            del blobs[sha256]
+
+        index["urls"] = {key: entry for key, entry in index["urls"].items() if entry["sha256"] in blobs}
+
+download_cache = DownloadCache()
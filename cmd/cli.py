@@ -0,0 +1,436 @@
+import argparse
+import json
+import signal
+import sqlite3
+import sys
+import threading
+import time
+
+from cmd.devices import DEFAULT_MAX_WORKERS
+from cmd.extensions import APPIUM_EXTENSIONS, parse_extension
+from cmd.history import DEFAULT_WINDOW, ProgressEstimator, format_eta, step_history
+from cmd.scheduler import InstallScheduler
+from cmd.state import RUN, UP_TO_DATE, Reconciler
+from cmd.tracing import tracer
+from cmd.verify import VerifyCache, run_probes
+from cmd.workflow import Installers, build_desired_state, build_install_steps, build_verify_probes, is_admin
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_CANCELLED = 130
+
+EXTENSION_HELP = ("Appium driver or plugin as kind:name[=package][@version], e.g. driver:espresso@2.40.0; "
+                  "repeat for each one (default: " + ", ".join(e.name for e in APPIUM_EXTENSIONS) + ")")
+TRACE_HELP = "Where to write the timing summary and Chrome trace (default: the traces folder next to the download cache)"
+
+class ConsoleLog:
+    """write_log replacement for unattended runs: plain lines on stderr."""
+
+    def __init__(self, quiet=False):
+        self.quiet = quiet
+        self._lock = threading.Lock()
+
+    def __call__(self, message, color="black"):
+        if self.quiet and color not in ("red",):
+            return
+        with self._lock:
+            sys.stderr.write(message.lstrip("\n") + "\n")
+            sys.stderr.flush()
+
+def emit(payload):
+    sys.stdout.write(json.dumps(payload, indent=2, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+def export_trace(args, write_log):
+    try:
+        summary_path, trace_path = tracer.export(args.trace_dir)
+    except OSError as e:
+        write_log(f"Could not save timing trace: {str(e)}", "red")
+        return None
+    write_log(f"Timing trace saved to {trace_path}", "blue")
+    return {"summary": summary_path, "chrome": trace_path}
+
+def record_history(plan, succeeded, write_log):
+    try:
+        return step_history.record_trace(plan, succeeded)
+    except (OSError, sqlite3.Error) as e:
+        write_log(f"Could not save step timings: {str(e)}", "red")
+        return None
+
+def install_command(args, write_log, cancel_event):
+    started = time.perf_counter()
+    tracer.reset("install")
+    admin = is_admin()
+    if not admin:
+        write_log("Not running as Administrator. Some steps may fail.", "red")
+        if args.require_admin:
+            emit({"command": "install", "success": False, "admin": False, "error": "administrator rights required"})
+            return EXIT_FAILED
+
+    bundle = None
+    if getattr(args, "bundle", None):
+        from cmd.bundle import Bundle, verify_bundle
+        try:
+            bundle = Bundle(args.bundle)
+        except Exception as e:
+            emit({"command": "install", "success": False, "admin": admin, "error": f"could not read the bundle: {str(e)}"})
+            return EXIT_FAILED
+
+    estimator = None
+
+    def on_download(url, done, total, step=None):
+        if estimator is not None:
+            estimator.download_progress(url, done, total, step)
+
+    installers = Installers(write_log, extensions=args.extension, cancel_event=cancel_event, bundle=bundle,
+                            mirror=getattr(args, "mirror", None), progress_function=on_download)
+    try:
+        releases = installers.resolve_releases()
+    except Exception as e:
+        emit({"command": "install", "success": False, "admin": admin, "error": str(e)})
+        return EXIT_FAILED
+    reconciler = Reconciler(build_desired_state(installers), write_log, force=args.force)
+    steps = build_install_steps(installers, write_log, warm_up=args.warm_up)
+    plan = reconciler.plan(steps)
+    reconciler.log_plan(plan)
+
+    # Hashing the bundle is only worth it when something will be installed from it.
+    if bundle is not None and any(entry["action"] == RUN for entry in plan) and not verify_bundle(bundle, write_log):
+        emit({"command": "install", "success": False, "admin": admin, "error": "offline bundle failed verification"})
+        return EXIT_FAILED
+    steps = reconciler.wrap_all(steps)
+    estimator = ProgressEstimator(steps, plan, step_history.estimates())
+    write_log(f"Estimated time: {format_eta(estimator.snapshot()[1])}", "blue")
+
+    def on_step_finished(finished, total, label, status):
+        estimator.step_finished(label)
+        write_log(f"[{finished}/{total}] {label}: {status} ({estimator.describe()})", "blue")
+
+    scheduler = InstallScheduler(steps, write_log, on_step_finished, cancel_event=cancel_event,
+                                 start_function=estimator.step_started)
+    succeeded = scheduler.run()
+    scheduler.report_branches()
+    run_id = record_history(plan, succeeded, write_log)
+
+    emit({
+        "command": "install",
+        "success": succeeded,
+        "admin": admin,
+        "cancelled": cancel_event.is_set(),
+        "elapsed_s": round(time.perf_counter() - started, 3),
+        "trace": export_trace(args, write_log),
+        "releases": releases,
+        "plan": plan,
+        "history": {"path": step_history.path, "run_id": run_id},
+        "warmup": installers.appium.warmup_report.to_dict() if installers.appium.warmup_report else None,
+        "steps": [
+            {
+                "name": name,
+                "label": step.label,
+                "branch": step.branch,
+                "status": scheduler.status[name],
+                "error": scheduler.errors.get(name),
+            }
+            for name, step in scheduler.steps.items()
+        ],
+    })
+    if cancel_event.is_set():
+        return EXIT_CANCELLED
+    return EXIT_OK if succeeded else EXIT_FAILED
+
+def plan_command(args, write_log, cancel_event):
+    installers = Installers(write_log, extensions=args.extension, cancel_event=cancel_event)
+    try:
+        releases = installers.resolve_releases()
+    except Exception as e:
+        emit({"command": "plan", "error": str(e)})
+        return EXIT_FAILED
+    reconciler = Reconciler(build_desired_state(installers), write_log)
+    plan = reconciler.plan(build_install_steps(installers, write_log))
+    reconciler.log_plan(plan)
+    emit({
+        "command": "plan",
+        "up_to_date": all(entry["action"] == UP_TO_DATE for entry in plan),
+        "state_file": reconciler.state.path,
+        "releases": releases,
+        "steps": plan,
+    })
+    return EXIT_OK
+
+def verify_command(args, write_log, cancel_event):
+    started = time.perf_counter()
+    tracer.reset("verify")
+    installers = Installers(write_log, extensions=args.extension, cancel_event=cancel_event)
+    cache = None if args.no_cache else VerifyCache()
+    results = run_probes(build_verify_probes(installers), cache=cache)
+    succeeded = all(result.ok for result in results)
+
+    emit({
+        "command": "verify",
+        "success": succeeded,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+        "trace": export_trace(args, write_log),
+        "results": [result.to_dict() for result in results],
+    })
+    return EXIT_OK if succeeded else EXIT_FAILED
+
+def watch_devices(installers, write_log, cancel_event):
+    from cmd.adb import AdbClient, AdbError
+
+    client = installers.platform_tools.adb_client()
+    if not isinstance(client, AdbClient):
+        write_log("The adb server is not reachable; cannot watch devices.", "red")
+        return EXIT_FAILED
+    write_log("Watching for device changes (Ctrl+C to stop)...", "blue")
+    try:
+        # One JSON line per change, with the full device list, until cancelled.
+        for devices in client.track_devices(cancel_event):
+            sys.stdout.write(json.dumps({"time": round(time.time(), 3), "devices": devices}) + "\n")
+            sys.stdout.flush()
+    except (OSError, AdbError) as e:
+        write_log(f"Lost the adb server: {str(e)}", "red")
+        return EXIT_FAILED
+    return EXIT_OK
+
+def devices_command(args, write_log, cancel_event):
+    started = time.perf_counter()
+    installers = Installers(write_log, cancel_event=cancel_event)
+    if args.watch:
+        return watch_devices(installers, write_log, cancel_event)
+    stage = installers.platform_tools.device_stage(preinstall=not args.check_only, max_workers=args.max_workers)
+    try:
+        reports = stage.run()
+    except Exception as e:
+        write_log(f"Error checking devices: {str(e)}", "red")
+        emit({"command": "devices", "success": False, "error": str(e)})
+        return EXIT_FAILED
+    succeeded = all(report.ready for report in reports)
+
+    emit({
+        "command": "devices",
+        "success": succeeded,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+        "server_apk_version": stage.apks.version if stage.apks else None,
+        "devices": [report.to_dict() for report in reports],
+    })
+    return EXIT_OK if succeeded else EXIT_FAILED
+
+def runtimes_command(args, write_log, cancel_event):
+    from cmd.installers import JavaInstaller, NodeInstaller
+    from cmd.runtimes import JAVA, NODE, runtime_discovery
+
+    started = time.perf_counter()
+    selection = {
+        JAVA: (JavaInstaller.MIN_JAVA_VERSION, JavaInstaller.JDK_FEATURE),
+        NODE: (NodeInstaller.MIN_NODE_VERSION, NodeInstaller.NODE_LINE),
+    }
+    found = {}
+    for kind, (minimum, preferred) in selection.items():
+        runtimes = runtime_discovery.scan(kind)
+        best = runtime_discovery.best(kind, minimum, preferred)
+        for runtime in runtimes:
+            write_log(("* " if best and runtime.home == best.home else "  ") + runtime.describe(), "black")
+        found[kind] = {
+            "selected": best.home if best else None,
+            "runtimes": [runtime.to_dict() for runtime in runtimes],
+        }
+
+    emit({
+        "command": "runtimes",
+        "elapsed_s": round(time.perf_counter() - started, 3),
+        "cache": runtime_discovery.cache_path,
+        **found,
+    })
+    return EXIT_OK
+
+def report_command(args, write_log, cancel_event):
+    report = step_history.report(args.runs)
+    runs = step_history.runs(args.runs)
+    write_log(f"{'step':<28} {'runs':>4} {'latest':>9} {'median':>9} {'trend':>7} {'MB/s':>6}", "black")
+    for entry in report:
+        trend = f"{entry['trend_pct']:+.0f}%" if entry["trend_pct"] is not None else "-"
+        rate = f"{entry['median_mb_per_s']:.1f}" if entry["median_mb_per_s"] is not None else "-"
+        write_log(f"{entry['label'][:28]:<28} {entry['samples']:>4} {format_eta(entry['latest_s']):>9} "
+                  f"{format_eta(entry['median_s']):>9} {trend:>7} {rate:>6}", "red" if entry["regression"] else "black")
+    regressions = [entry["step"] for entry in report if entry["regression"]]
+    if regressions:
+        write_log(f"Slower than usual in the last run: {', '.join(regressions)}", "red")
+
+    emit({
+        "command": "report",
+        "history": step_history.path,
+        "regressions": regressions,
+        "steps": report,
+        "runs": [
+            {
+                "id": run["id"],
+                "name": run["name"],
+                "started": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(run["started"])),
+                "elapsed_s": round(run["elapsed_s"], 3),
+                "success": bool(run["success"]),
+                "steps_run": sum(step["action"] == RUN for step in run["steps"]),
+                "bytes": sum(step["bytes"] for step in run["steps"]),
+            }
+            for run in runs
+        ],
+    })
+    return EXIT_FAILED if args.fail_on_regression and regressions else EXIT_OK
+
+def capabilities_arg(text):
+    try:
+        capabilities = json.loads(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"not JSON: {str(e)}")
+    if not isinstance(capabilities, dict):
+        raise argparse.ArgumentTypeError("capabilities must be a JSON object")
+    return capabilities
+
+def warmup_command(args, write_log, cancel_event):
+    from cmd.warmup import DEFAULT_CAPABILITIES
+
+    tracer.reset("warmup")
+    installers = Installers(write_log, cancel_event=cancel_event)
+    capabilities = dict(DEFAULT_CAPABILITIES, **(args.capabilities or {}))
+    if args.udid:
+        capabilities["appium:udid"] = args.udid
+    report = installers.appium.warm_up(args.port, args.sessions, capabilities, keep_running=not args.stop)
+    succeeded = report.ready and not report.session_failures
+
+    emit({
+        "command": "warmup",
+        "success": succeeded,
+        "capabilities": capabilities if args.sessions else None,
+        "trace": export_trace(args, write_log),
+        "server": report.to_dict(),
+    })
+    if cancel_event.is_set():
+        return EXIT_CANCELLED
+    return EXIT_OK if succeeded else EXIT_FAILED
+
+def bundle_command(args, write_log, cancel_event):
+    from cmd.bundle import BundleBuilder
+
+    started = time.perf_counter()
+    try:
+        builder = BundleBuilder(args.directory, write_log, cancel_event, args.arch, mirror=getattr(args, "mirror", None))
+        manifest = builder.build(args.appium, args.extension or APPIUM_EXTENSIONS)
+    except Exception as e:
+        write_log(f"Error building bundle: {str(e)}", "red")
+        emit({"command": "bundle", "success": False, "error": str(e)})
+        return EXIT_CANCELLED if cancel_event.is_set() else EXIT_FAILED
+
+    emit({
+        "command": "bundle",
+        "success": True,
+        "directory": args.directory,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+        "manifest": manifest,
+    })
+    return EXIT_OK
+
+def serve_command(args, write_log, cancel_event):
+    from cmd.mirror import MirrorServer
+
+    server = MirrorServer(args.host, args.port, write_log=write_log if args.access_log else None)
+    write_log(f"Serving the download cache at {server.url} (Ctrl+C to stop)", "green")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    cancel_event.wait()
+    server.shutdown()
+    server.server_close()
+    return EXIT_OK
+
+COMMANDS = {
+    "install": install_command,
+    "plan": plan_command,
+    "verify": verify_command,
+    "devices": devices_command,
+    "warmup": warmup_command,
+    "runtimes": runtimes_command,
+    "report": report_command,
+    "bundle": bundle_command,
+    "serve": serve_command,
+}
+
+def extension_arg(spec):
+    try:
+        return parse_extension(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def add_arguments(subparsers):
+    install = subparsers.add_parser("install", help="Install everything without the GUI and print JSON results")
+    install.add_argument("--require-admin", action="store_true", help="Fail instead of continuing without admin rights")
+    install.add_argument("--quiet", action="store_true", help="Only log errors to stderr")
+    install.add_argument("--bundle", default=argparse.SUPPRESS, metavar="DIR",
+                         help="Install only from an offline bundle built with the 'bundle' command")
+    install.add_argument("--extension", action="append", type=extension_arg, metavar="SPEC", help=EXTENSION_HELP)
+    install.add_argument("--force", action="store_true", help="Run every step, even those the state file says are up to date")
+    install.add_argument("--trace-dir", metavar="DIR", help=TRACE_HELP)
+    install.add_argument("--mirror", default=argparse.SUPPRESS, metavar="URL",
+                         help="Peer started with 'serve' to try before the origin (default: $APPIUM_INSTALLER_MIRROR)")
+    install.add_argument("--warm-up", action="store_true",
+                         help="Start the Appium server at the end and leave it running (see the 'warmup' command)")
+
+    plan = subparsers.add_parser("plan", help="Show which install steps would run, without running them")
+    plan.add_argument("--quiet", action="store_true", help="Only log errors to stderr")
+    plan.add_argument("--extension", action="append", type=extension_arg, metavar="SPEC", help=EXTENSION_HELP)
+
+    verify = subparsers.add_parser("verify", help="Verify the installation without the GUI and print JSON results")
+    verify.add_argument("--quiet", action="store_true", help="Only log errors to stderr")
+    verify.add_argument("--extension", action="append", type=extension_arg, metavar="SPEC", help=EXTENSION_HELP)
+    verify.add_argument("--trace-dir", metavar="DIR", help=TRACE_HELP)
+    verify.add_argument("--no-cache", action="store_true", default=argparse.SUPPRESS,
+                        help="Always run fresh verification probes")
+
+    devices = subparsers.add_parser("devices", help="Check every attached Android device and pre-install the uiautomator2 server")
+    devices.add_argument("--check-only", action="store_true", help="Report readiness without installing anything")
+    devices.add_argument("--watch", action="store_true", help="Stream device changes as JSON lines instead")
+    devices.add_argument("--max-workers", type=int, default=DEFAULT_MAX_WORKERS, help="Devices handled at the same time")
+    devices.add_argument("--quiet", action="store_true", help="Only log errors to stderr")
+
+    warmup = subparsers.add_parser("warmup", help="Start the Appium server, time it to ready and leave it running")
+    warmup.add_argument("--port", type=int, default=4723)
+    warmup.add_argument("--sessions", type=int, default=0, metavar="N",
+                        help="Also time N create/delete session round trips and report p50/p95")
+    warmup.add_argument("--udid", help="Device for the benchmark sessions (default: let the driver pick one)")
+    warmup.add_argument("--capabilities", type=capabilities_arg, metavar="JSON",
+                        help="Extra capabilities for the benchmark sessions, as a JSON object")
+    warmup.add_argument("--stop", action="store_true", help="Stop the server afterwards if this command started it")
+    warmup.add_argument("--trace-dir", metavar="DIR", help=TRACE_HELP)
+    warmup.add_argument("--quiet", action="store_true", help="Only log errors to stderr")
+
+    runtimes = subparsers.add_parser("runtimes", help="List the JDKs and Node.js installs found on disk, on PATH or not")
+    runtimes.add_argument("--quiet", action="store_true", help="Only log errors to stderr")
+
+    report = subparsers.add_parser("report", help="Show how long each install step took across recent runs")
+    report.add_argument("--runs", type=int, default=DEFAULT_WINDOW, metavar="N",
+                        help=f"Runs of each step to compare (default: {DEFAULT_WINDOW})")
+    report.add_argument("--fail-on-regression", action="store_true",
+                        help="Exit with 1 when a step's last run was much slower than its median")
+    report.add_argument("--quiet", action="store_true", help="Only log errors to stderr")
+
+    bundle = subparsers.add_parser("bundle", help="Download every artifact into an offline provisioning bundle")
+    bundle.add_argument("directory", help="Directory to write the bundle to")
+    bundle.add_argument("--arch", choices=["x64", "x86"], help="Windows architecture (defaults to this machine's)")
+    bundle.add_argument("--appium", default="appium", help="npm spec for Appium, e.g. appium@2.5.1")
+    bundle.add_argument("--extension", action="append", type=extension_arg, metavar="SPEC", help=EXTENSION_HELP)
+    bundle.add_argument("--mirror", default=argparse.SUPPRESS, metavar="URL",
+                        help="Peer started with 'serve' to try before the origin (default: $APPIUM_INSTALLER_MIRROR)")
+    bundle.add_argument("--quiet", action="store_true", help="Only log errors to stderr")
+
+    serve = subparsers.add_parser("serve", help="Serve this machine's download cache to other installers")
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--access-log", action="store_true", help="Log every request")
+    serve.add_argument("--quiet", action="store_true", help="Only log errors to stderr")
+
+def run(args):
+    write_log = ConsoleLog(quiet=args.quiet)
+    cancel_event = threading.Event()
+
+    def cancel(signum, frame):
+        write_log("Cancelling...", "red")
+        cancel_event.set()
+
+    signal.signal(signal.SIGINT, cancel)
+    return COMMANDS[args.command](args, write_log, cancel_event)
@@ -0,0 +1,252 @@
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from cmd.extensions import DRIVER, Extension, ExtensionManifest
+from cmd.process import COMMAND_TIMEOUT
+from cmd.tracing import tracer
+
+SERVER_PACKAGE = "io.appium.uiautomator2.server"
+TEST_PACKAGE = "io.appium.uiautomator2.server.test"
+SERVER_NPM_PACKAGE = "appium-uiautomator2-server"
+
+READY = "ready"
+NOT_READY = "not-ready"
+OFFLINE = "offline"
+ERROR = "error"
+
+DEFAULT_MAX_WORKERS = 8
+SECTION = "@@"
+VERSION_NAME = re.compile(r"versionName=(\S+)")
+
+# One shell round trip per device; the sections are split on SECTION lines. The
+# trailing echo keeps the exit status 0 when the test package is missing.
+DEVICE_SCRIPT = "; ".join([
+    "getprop sys.boot_completed", f"echo {SECTION}",
+    "getprop ro.build.version.sdk", f"echo {SECTION}",
+    f"dumpsys package {SERVER_PACKAGE} | grep versionName", f"echo {SECTION}",
+    f"pm path {TEST_PACKAGE}", f"echo {SECTION}",
+])
+
+def parse_devices(output):
+    """Parse ``adb devices -l`` into [{"serial", "state", "model", ...}]."""
+    devices = []
+    for line in output.splitlines():
+        line = line.strip()
+        if not line or line.startswith("List of devices") or line.startswith("*"):
+            continue
+        fields = line.split()
+        if len(fields) < 2:
+            continue
+        device = {"serial": fields[0], "state": fields[1]}
+        for field in fields[2:]:
+            key, sep, value = field.partition(":")
+            if sep:
+                device[key] = value
+        devices.append(device)
+    return devices
+
+def parse_device_script(output):
+    sections = [[]]
+    for line in output.splitlines():
+        if line.strip() == SECTION:
+            sections.append([])
+        else:
+            sections[-1].append(line.strip())
+    sections += [[] for _ in range(4 - len(sections))]
+    boot, sdk, server, test = ([line for line in section if line] for section in sections[:4])
+    versions = [match.group(1) for match in map(VERSION_NAME.search, server) if match]
+    return {
+        "boot_completed": bool(boot) and boot[0] == "1",
+        "api_level": int(sdk[0]) if sdk and sdk[0].isdigit() else None,
+        "server_version": versions[0] if versions else None,
+        "test_installed": any(line.startswith("package:") for line in test),
+    }
+
+class ServerApks:
+    """The uiautomator2 server and test APKs shipped inside the installed driver."""
+
+    def __init__(self, server_apk, test_apk, version):
+        self.server_apk = server_apk
+        self.test_apk = test_apk
+        self.version = version
+
+    @classmethod
+    def find(cls, appium_home):
+        manifest = ExtensionManifest(appium_home)
+        driver = Extension(DRIVER, "uiautomator2")
+        entry = manifest.entries[DRIVER].get("uiautomator2") or {}
+        driver_dir = entry.get("installPath") or os.path.dirname(manifest.package_json(driver))
+        # npm nests the server under the driver (global-style) or hoists it into APPIUM_HOME.
+        for server_dir in (
+            os.path.join(driver_dir, "node_modules", SERVER_NPM_PACKAGE),
+            os.path.join(appium_home, "node_modules", SERVER_NPM_PACKAGE),
+        ):
+            try:
+                with open(os.path.join(server_dir, "package.json"), "r", encoding="utf-8") as f:
+                    version = json.load(f)["version"]
+            except (OSError, ValueError, KeyError):
+                continue
+            server_apk = os.path.join(server_dir, "apks", f"appium-uiautomator2-server-v{version}.apk")
+            test_apk = os.path.join(server_dir, "apks", "appium-uiautomator2-server-debug-androidTest.apk")
+            if os.path.isfile(server_apk) and os.path.isfile(test_apk):
+                return cls(server_apk, test_apk, version)
+        return None
+
+class AdbCommandLine:
+    """adb driven through its command line, one process per call."""
+
+    def __init__(self, command, run_command):
+        self.command = list(command)
+        self.run_command = run_command
+
+    def _run(self, args, timeout):
+        return self.run_command(self.command + args, shell=False, timeout=timeout)
+
+    def start_server(self, timeout=30):
+        stdout, stderr, code = self._run(["start-server"], timeout)
+        return code == 0
+
+    def devices(self, timeout=15):
+        stdout, stderr, code = self._run(["devices", "-l"], timeout)
+        if code != 0:
+            raise RuntimeError(f"adb devices failed: {stderr.strip() or code}")
+        return parse_devices(stdout)
+
+    def shell(self, serial, script, timeout=30):
+        return self._run(["-s", serial, "shell", script], timeout)
+
+    def install(self, serial, apk, grant_permissions=False, timeout=180):
+        flags = ["-r", "-g"] if grant_permissions else ["-r"]
+        return self._run(["-s", serial, "install", *flags, apk], timeout)
+
+class DeviceReport:
+    def __init__(self, serial, state, model=None):
+        self.serial = serial
+        self.state = state
+        self.model = model
+        self.status = NOT_READY
+        self.boot_completed = False
+        self.api_level = None
+        self.server_version = None
+        self.test_installed = False
+        self.installed = []
+        self.problems = []
+
+    @property
+    def ready(self):
+        return self.status == READY
+
+    def summary(self):
+        name = f"{self.serial} ({self.model})" if self.model else self.serial
+        if self.ready:
+            detail = f"API {self.api_level}, uiautomator2 server {self.server_version}"
+            if self.installed:
+                detail += f", installed {', '.join(self.installed)}"
+            return f"{name}: ✅ {detail}"
+        return f"{name}: ❌ {'; '.join(self.problems) or self.status}"
+
+    def to_dict(self):
+        return {
+            "serial": self.serial,
+            "model": self.model,
+            "state": self.state,
+            "status": self.status,
+            "boot_completed": self.boot_completed,
+            "api_level": self.api_level,
+            "server_version": self.server_version,
+            "test_installed": self.test_installed,
+            "installed": self.installed,
+            "problems": self.problems,
+        }
+
+class DeviceStage:
+    """Readiness check and uiautomator2 server pre-install for every attached device.
+
+    Devices are checked in parallel, at most ``max_workers`` at a time, each
+    with one shell round trip; missing or outdated server APKs are installed
+    so the first Appium session on a device does not pay for it.
+    """
+
+    def __init__(self, adb, write_log, apks=None, preinstall=True, max_workers=DEFAULT_MAX_WORKERS,
+                 command_timeout=30, install_timeout=180):
+        self.adb = adb
+        self.write_log = write_log
+        self.apks = apks
+        self.preinstall = preinstall
+        self.max_workers = max_workers
+        self.command_timeout = command_timeout
+        self.install_timeout = install_timeout
+
+    def _inspect(self, report):
+        stdout, stderr, code = self.adb.shell(report.serial, DEVICE_SCRIPT, self.command_timeout)
+        if code != 0:
+            raise RuntimeError("timed out" if code == COMMAND_TIMEOUT else f"adb shell failed: {stderr.strip() or code}")
+        facts = parse_device_script(stdout)
+        report.boot_completed = facts["boot_completed"]
+        report.api_level = facts["api_level"]
+        report.server_version = facts["server_version"]
+        report.test_installed = facts["test_installed"]
+
+    def _install(self, report, apk, label):
+        self.write_log(f"{report.serial}: installing {label}...", "yellow")
+        grant = report.api_level is not None and report.api_level >= 23
+        stdout, stderr, code = self.adb.install(report.serial, apk, grant, self.install_timeout)
+        if code != 0 or "Failure" in stdout:
+            raise RuntimeError(f"installing {label} failed: {(stderr or stdout).strip() or code}")
+        report.installed.append(label)
+
+    def check_device(self, device):
+        with tracer.span(device["serial"], "device", model=device.get("model")) as span:
+            report = self._check_device(device)
+            span.set(status=report.status, installed=report.installed)
+            return report
+
+    def _check_device(self, device):
+        report = DeviceReport(device["serial"], device["state"], device.get("model"))
+        if report.state != "device":
+            report.status = OFFLINE
+            report.problems.append(f"adb state is '{report.state}'")
+            return report
+        try:
+            self._inspect(report)
+            if not report.boot_completed:
+                report.problems.append("still booting")
+                return report
+
+            if self.preinstall and self.apks is not None:
+                if report.server_version != self.apks.version:
+                    self._install(report, self.apks.server_apk, f"uiautomator2 server {self.apks.version}")
+                if not report.test_installed:
+                    self._install(report, self.apks.test_apk, "uiautomator2 server test")
+                if report.installed:
+                    self._inspect(report)
+
+            if report.server_version is None:
+                report.problems.append("uiautomator2 server not installed")
+            elif self.apks is not None and report.server_version != self.apks.version:
+                report.problems.append(f"uiautomator2 server {report.server_version}, driver needs {self.apks.version}")
+            if not report.test_installed:
+                report.problems.append("uiautomator2 server test APK not installed")
+            if not report.problems:
+                report.status = READY
+        except Exception as e:
+            report.status = ERROR
+            report.problems.append(str(e))
+        return report
+
+    def run(self):
+        """Return one DeviceReport per attached device, in ``adb devices`` order."""
+        # Start the daemon once up front; concurrent clients would each race to start it.
+        self.adb.start_server()
+        devices = self.adb.devices()
+        if not devices:
+            self.write_log("No Android devices attached.", "yellow")
+            return []
+        self.write_log(f"Checking {len(devices)} Android device(s)...", "darkblue")
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="device") as pool:
+            reports = list(pool.map(self.check_device, devices))
+        for report in reports:
+            self.write_log(report.summary(), "green" if report.ready else "red")
+        return reports
@@ -0,0 +1,279 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import urllib3
+from urllib3.exceptions import HTTPError
+
+CHUNK_SIZE = 256 * 1024
+MIN_SEGMENT_SIZE = 4 * 1024 * 1024
+USER_AGENT = "appium-windows-auto-install"
+# Next to a partial file: the ETag or Last-Modified of the response it came from.
+VALIDATOR_SUFFIX = ".validator"
+
+class DownloadError(Exception):
+    pass
+
+def resume_validator(headers):
+    """What ``If-Range`` may carry for this response: a strong ETag, else Last-Modified, else None."""
+    etag = headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified")
+
+class Downloader:
+    """Streaming HTTP downloader on a shared urllib3 connection pool.
+
+    Partial files are kept on failure and continued with a ``Range`` request
+    on the next attempt, so an interrupted download never restarts from zero
+    as long as the server honours ranges. The resumed request carries
+    ``If-Range`` with the validator of the response the partial file came
+    from, so a file that changed upstream is sent whole instead of being
+    appended to the old bytes; a partial file without a validator is
+    discarded.
+    """
+
+    def __init__(self, pool=None, chunk_size=CHUNK_SIZE, retries=5, backoff=0.5,
+                 connect_timeout=15.0, read_timeout=60.0):
+        self.pool = pool or urllib3.PoolManager(
+            num_pools=8,
+            maxsize=8,
+            headers={"User-Agent": USER_AGENT},
+            retries=urllib3.Retry(total=3, connect=3, read=0, redirect=5, backoff_factor=backoff),
+            timeout=urllib3.Timeout(connect=connect_timeout, read=read_timeout),
+        )
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.backoff = backoff
+
+    def _hash_existing(self, destination, digest):
+        size = 0
+        with open(destination, "rb") as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b""):
+                digest.update(chunk)
+                size += len(chunk)
+        return size
+
+    def _load_validator(self, destination):
+        try:
+            with open(destination + VALIDATOR_SUFFIX, "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def _save_validator(self, destination, headers):
+        validator = resume_validator(headers)
+        if validator:
+            with open(destination + VALIDATOR_SUFFIX, "w", encoding="utf-8") as f:
+                f.write(validator)
+        else:
+            self.discard_validator(destination)
+
+    def discard_validator(self, destination):
+        try:
+            os.remove(destination + VALIDATOR_SUFFIX)
+        except OSError:
+            pass
+
+    def _attempt(self, url, destination, progress):
+        digest = hashlib.sha256()
+        offset = 0
+        validator = None
+        if os.path.exists(destination):
+            validator = self._load_validator(destination)
+            if validator:
+                offset = self._hash_existing(destination, digest)
+            else:
+                # Nothing tells us the origin still serves the same file.
+                os.remove(destination)
+
+        headers = {"Range": f"bytes={offset}-", "If-Range": validator} if offset else {}
+        response = self.pool.request("GET", url, headers=headers, preload_content=False)
+        try:
+            if response.status == 416 and offset:
+                # Nothing left to fetch: the partial file is already complete.
+                return offset, digest.hexdigest()
+            if response.status == 200 and offset:
+                # The file changed upstream (If-Range failed) or ranges are not supported; start over.
+                digest = hashlib.sha256()
+                offset = 0
+            elif response.status not in (200, 206):
+                raise DownloadError(f"HTTP {response.status} for {url}")
+            if not offset:
+                self._save_validator(destination, response.headers)
+
+            length = response.headers.get("Content-Length")
+            total = offset + int(length) if length is not None else None
+            done = offset
+
+            with open(destination, "ab" if offset else "wb") as f:
+                for chunk in response.stream(self.chunk_size):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    done += len(chunk)
+                    if progress:
+                        progress(done, total)
+
+            if total is not None and done != total:
+                raise DownloadError(f"Incomplete download for {url}: {done} of {total} bytes")
+            return done, digest.hexdigest()
+        finally:
+            response.release_conn()
+
+    def _with_retries(self, url, attempt_function):
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.backoff * (2 ** (attempt - 1)))
+            try:
+                return attempt_function()
+            except (HTTPError, OSError, DownloadError) as e:
+                last_error = e
+                if isinstance(e, DownloadError) and str(e).startswith("HTTP 4"):
+                    break
+        raise DownloadError(f"Giving up on {url}: {last_error}")
+
+    def head(self, url, retries=1):
+        """Return the response headers of a HEAD request, or None unless it is a 200."""
+        response = self.pool.request("HEAD", url, retries=retries, preload_content=False)
+        try:
+            if response.status != 200:
+                return None
+            return response.headers
+        finally:
+            response.release_conn()
+
+    def probe_ranges(self, url):
+        """Return the content length if the server supports byte ranges, else None."""
+        response = self.pool.request("HEAD", url, preload_content=False)
+        try:
+            length = response.headers.get("Content-Length")
+            if response.status != 200 or length is None:
+                return None
+            if response.headers.get("Accept-Ranges", "").lower() != "bytes":
+                return None
+            return int(length)
+        finally:
+            response.release_conn()
+
+    def _fetch_segment(self, url, destination, segment, progress):
+        # segment is [start, end, next_offset]; next_offset survives retries.
+        start, end, offset = segment
+        if offset > end:
+            return
+        headers = {"Range": f"bytes={offset}-{end}"}
+        response = self.pool.request("GET", url, headers=headers, preload_content=False)
+        try:
+            if response.status != 206:
+                raise DownloadError(f"HTTP {response.status} for range {offset}-{end} of {url}")
+            with open(destination, "r+b") as f:
+                f.seek(offset)
+                for chunk in response.stream(self.chunk_size):
+                    chunk = chunk[:end + 1 - segment[2]]
+                    f.write(chunk)
+                    # Flushed before it counts as written: the hash may read it back through another handle.
+                    f.flush()
+                    segment[2] += len(chunk)
+                    progress(segment[2] - len(chunk), chunk)
+            if segment[2] <= end:
+                raise DownloadError(f"Segment {start}-{end} of {url} ended early at {segment[2]}")
+        finally:
+            response.release_conn()
+
+    def download_segmented(self, url, destination, size, segments, progress=None):
+        segment_size = -(-size // segments)
+        ranges = [[start, min(start + segment_size, size) - 1, start]
+                  for start in range(0, size, segment_size)]
+
+        with open(destination, "wb") as f:
+            f.truncate(size)
+
+        # The SHA-256 is taken in file order as the data arrives: chunks at the
+        # hashed offset straight from memory, and whatever later segments wrote
+        # in the meantime read back once the hash gets there, while it is
+        # still in the page cache. The file is never read again as a whole.
+        lock = threading.Lock()
+        done = [0]
+        digest = hashlib.sha256()
+        hashed = [0]
+
+        def catch_up(reader):
+            for start, end, written in ([segment[0], segment[1], segment[2]] for segment in ranges):
+                if end < hashed[0]:
+                    continue
+                if written > hashed[0]:
+                    reader.seek(hashed[0])
+                    while hashed[0] < written:
+                        chunk = reader.read(min(self.chunk_size, written - hashed[0]))
+                        if not chunk:
+                            raise DownloadError(f"{destination} is shorter than what was written to it")
+                        digest.update(chunk)
+                        hashed[0] += len(chunk)
+                if written <= end:
+                    break
+
+        def advance(offset, chunk):
+            with lock:
+                done[0] += len(chunk)
+                current = done[0]
+                if offset <= hashed[0] < offset + len(chunk):
+                    digest.update(chunk[hashed[0] - offset:])
+                    hashed[0] = offset + len(chunk)
+                catch_up(reader)
+            if progress:
+                progress(current, size)
+
+        def fetch(segment):
+            self._with_retries(url, lambda: self._fetch_segment(url, destination, segment, advance))
+
+        try:
+            with open(destination, "rb") as reader:
+                with ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix="segment") as pool:
+                    list(pool.map(fetch, ranges))
+                catch_up(reader)
+        except Exception:
+            # A preallocated file has holes, so it must never be resumed as a prefix.
+            os.remove(destination)
+            raise
+
+        actual = os.path.getsize(destination)
+        if actual != size or hashed[0] != size:
+            raise DownloadError(f"Size mismatch for {url}: expected {size}, got {actual} ({hashed[0]} hashed)")
+        return size, digest.hexdigest()
+
+    def download(self, url, destination, progress=None, segments=1, expected_sha256=None):
+        """Download ``url`` to ``destination`` and return ``(size, sha256)``.
+
+        With ``segments > 1`` the file is fetched as parallel byte ranges when the
+        server advertises range support and the file is large enough; otherwise
+        (or when resuming a partial file) a single stream is used.
+        """
+        result = None
+        if segments > 1 and not os.path.exists(destination):
+            try:
+                size = self.probe_ranges(url)
+            except (HTTPError, OSError):
+                size = None
+            if size:
+                segments = max(1, min(segments, size // MIN_SEGMENT_SIZE))
+            if size and segments > 1:
+                result = self.download_segmented(url, destination, size, segments, progress)
+
+        if result is None:
+            result = self._with_retries(url, lambda: self._attempt(url, destination, progress))
+        self.discard_validator(destination)
+
+        if expected_sha256 and result[1] != expected_sha256.lower():
+            os.remove(destination)
+            raise DownloadError(f"SHA-256 mismatch for {url}: expected {expected_sha256}, got {result[1]}")
+        return result
+
+_default_downloader = None
+
+def get_downloader():
+    global _default_downloader
+    if _default_downloader is None:
+        _default_downloader = Downloader()
+    return _default_downloader
@@ -0,0 +1,145 @@
+import json
+import os
+import re
+
+from cmd.cache import default_cache_dir
+
+DRIVER = "driver"
+PLUGIN = "plugin"
+
+# Install names of the official extensions and the npm packages they come from.
+KNOWN_PACKAGES = {
+    (DRIVER, "uiautomator2"): "appium-uiautomator2-driver",
+    (DRIVER, "espresso"): "appium-espresso-driver",
+    (DRIVER, "flutter"): "appium-flutter-driver",
+    (DRIVER, "chromium"): "appium-chromium-driver",
+    (DRIVER, "gecko"): "appium-geckodriver",
+    (DRIVER, "windows"): "appium-windows-driver",
+    (PLUGIN, "images"): "@appium/images-plugin",
+    (PLUGIN, "relaxed-caps"): "@appium/relaxed-caps-plugin",
+    (PLUGIN, "execute-driver"): "@appium/execute-driver-plugin",
+    (PLUGIN, "universal-xml"): "@appium/universal-xml-plugin",
+}
+
+MANIFEST_LINE = re.compile(r"^( *)([^\s:#][^:#]*):(?:\s+(.*))?$")
+
+class Extension:
+    def __init__(self, kind, name, package=None, version=None):
+        if kind not in (DRIVER, PLUGIN):
+            raise ValueError(f"Unknown extension type: {kind}")
+        package = package or KNOWN_PACKAGES.get((kind, name))
+        if package is None:
+            raise ValueError(f"No npm package known for {kind} '{name}'; use {kind}:{name}=<package>")
+        self.kind = kind
+        self.name = name
+        self.package = package
+        self.version = version
+
+    @property
+    def spec(self):
+        return f"{self.package}@{self.version}" if self.version else self.package
+
+    def __repr__(self):
+        return f"{self.kind}:{self.name}" + (f"@{self.version}" if self.version else "")
+
+# Drivers and plugins every machine gets; pin a version to make reinstalls reproducible.
+APPIUM_EXTENSIONS = (
+    Extension(DRIVER, "uiautomator2"),
+    Extension(DRIVER, "espresso"),
+    Extension(PLUGIN, "images"),
+    Extension(PLUGIN, "relaxed-caps"),
+)
+
+def parse_extension(spec):
+    """Parse ``kind:name[=package][@version]``, e.g. ``driver:espresso@2.40.0``."""
+    kind, sep, rest = spec.partition(":")
+    if not sep or not rest:
+        raise ValueError(f"Expected driver:<name> or plugin:<name>, got '{spec}'")
+    name, _, package = rest.partition("=")
+    version = None
+    # The version separator is the last '@' that is not the start of an npm scope.
+    target = package or name
+    at = target.rfind("@")
+    if at > 0:
+        target, version = target[:at], target[at + 1:]
+        if package:
+            package = target
+        else:
+            name = target
+    return Extension(kind, name, package or None, version)
+
+def npm_cache_dir():
+    # Next to the download cache, so both survive between runs and can be warmed together.
+    return os.path.join(os.path.dirname(default_cache_dir()), "npm-cache")
+
+def npm_env(cache_dir=None):
+    env = dict(os.environ)
+    env["npm_config_cache"] = cache_dir or npm_cache_dir()
+    env["npm_config_prefer_offline"] = "true"
+    env["npm_config_audit"] = "false"
+    env["npm_config_fund"] = "false"
+    return env
+
+def read_manifest(path):
+    """Read the drivers and plugins sections of Appium's ``extensions.yaml``.
+
+    Appium writes the manifest with a fixed two-space layout, so a line
+    reader is enough and keeps PyYAML out of the dependencies.
+    """
+    manifest = {DRIVER: {}, PLUGIN: {}}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return manifest
+
+    section = None
+    entry = None
+    for line in lines:
+        match = MANIFEST_LINE.match(line)
+        if not match:
+            continue
+        indent, key, value = len(match.group(1)), match.group(2).strip(), (match.group(3) or "").strip()
+        if indent == 0:
+            section = {"drivers": DRIVER, "plugins": PLUGIN}.get(key)
+            entry = None
+        elif indent == 2 and section:
+            entry = manifest[section].setdefault(key.strip("'\""), {})
+        elif indent == 4 and entry is not None and value:
+            entry[key] = value.strip("'\"")
+    return manifest
+
+class ExtensionManifest:
+    """What is installed in an APPIUM_HOME, read from disk without starting Appium."""
+
+    def __init__(self, home):
+        self.home = home
+        self.path = os.path.join(home, "node_modules", ".cache", "appium", "extensions.yaml")
+        self.entries = read_manifest(self.path)
+
+    def package_json(self, extension):
+        return os.path.join(self.home, "node_modules", *extension.package.split("/"), "package.json")
+
+    def installed_version(self, extension):
+        # Appium records where each extension lives; npm installs into APPIUM_HOME
+        # that Appium has not synced into the manifest yet are found by package name.
+        candidates = []
+        entry = self.entries[extension.kind].get(extension.name)
+        if entry and entry.get("installPath"):
+            candidates.append(os.path.join(entry["installPath"], "package.json"))
+        candidates.append(self.package_json(extension))
+        for path in candidates:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    package = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if package.get("name") == extension.package:
+                return package.get("version")
+        return None
+
+    def satisfies(self, extension):
+        version = self.installed_version(extension)
+        if version is None:
+            return False
+        return extension.version is None or version == extension.version
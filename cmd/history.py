@@ -0,0 +1,337 @@
+import os
+import socket
+import sqlite3
+import statistics
+import threading
+import time
+
+from cmd.state import RUN
+
+# Samples per step used for estimates: recent enough to follow new versions and mirrors.
+DEFAULT_WINDOW = 20
+# Seconds a step that has never run on this machine is assumed to take.
+DEFAULT_ESTIMATES = {
+    "node": 60.0,
+    "appium": 90.0,
+    "driver": 120.0,
+    "platform_tools": 20.0,
+    "android_env": 5.0,
+    "java": 150.0,
+    "warmup": 15.0,
+}
+DEFAULT_ESTIMATE = 30.0
+# What an up-to-date step costs: the state file check and a log line.
+UP_TO_DATE_SECONDS = 0.2
+# A step is flagged when its last run took this much longer than its median.
+REGRESSION_FACTOR = 1.5
+REGRESSION_MIN_SECONDS = 5.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    host TEXT NOT NULL,
+    started REAL NOT NULL,
+    elapsed_s REAL NOT NULL,
+    success INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS steps (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    step TEXT NOT NULL,
+    label TEXT NOT NULL,
+    action TEXT NOT NULL,
+    observed TEXT NOT NULL DEFAULT 'run',
+    status TEXT NOT NULL,
+    duration_s REAL NOT NULL,
+    bytes INTEGER NOT NULL,
+    download_s REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS steps_by_name ON steps (step, run_id);
+"""
+
+def default_history_path():
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "appium-auto-installer", "history.sqlite3")
+
+def steps_from_trace(summary, plan):
+    """Per-step duration, downloaded bytes and download time, from a tracer summary."""
+    actions = {entry["step"]: entry["action"] for entry in plan}
+    spans = {span["id"]: span for span in summary["spans"]}
+
+    def owning_step(span):
+        while span is not None and span["category"] != "step":
+            span = spans.get(span["parent"])
+        return span
+
+    steps = {}
+    for span in summary["spans"]:
+        if span["category"] == "step" and span["attrs"].get("step") in actions:
+            steps[span["id"]] = {
+                "step": span["attrs"]["step"],
+                "label": span["name"],
+                "action": actions[span["attrs"]["step"]],
+                # The plan's action is decided up front; the step may still find itself up to date.
+                "observed": span["attrs"].get("observed", actions[span["attrs"]["step"]]),
+                "status": span["attrs"].get("status", "done"),
+                "duration_s": span["duration_ms"] / 1000,
+                "bytes": 0,
+                "download_s": 0.0,
+            }
+    for span in summary["spans"]:
+        if span["category"] != "download":
+            continue
+        step = owning_step(span)
+        if step is not None and step["id"] in steps:
+            steps[step["id"]]["bytes"] += span["attrs"].get("bytes") or 0
+            steps[step["id"]]["download_s"] += span["duration_ms"] / 1000
+    return list(steps.values())
+
+class StepHistory:
+    """Durations and downloaded bytes of every install step, per run, in SQLite."""
+
+    def __init__(self, path=None):
+        self.path = path or default_history_path()
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA foreign_keys = ON")
+        connection.executescript(SCHEMA)
+        columns = {row["name"] for row in connection.execute("PRAGMA table_info(steps)")}
+        if "observed" not in columns:
+            # Databases from before the column: their rows were taken as run when planned.
+            connection.execute("ALTER TABLE steps ADD COLUMN observed TEXT NOT NULL DEFAULT 'run'")
+        return connection
+
+    def record_run(self, name, started, elapsed_s, success, steps):
+        connection = self._connect()
+        try:
+            with connection:
+                run_id = connection.execute(
+                    "INSERT INTO runs (name, host, started, elapsed_s, success) VALUES (?, ?, ?, ?, ?)",
+                    (name, socket.gethostname(), started, elapsed_s, int(bool(success))),
+                ).lastrowid
+                connection.executemany(
+                    "INSERT INTO steps (run_id, step, label, action, observed, status, duration_s, bytes, download_s)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(run_id, step["step"], step["label"], step["action"], step.get("observed", step["action"]),
+                      step["status"], step["duration_s"], step["bytes"], step["download_s"]) for step in steps],
+                )
+            return run_id
+        finally:
+            connection.close()
+
+    def samples(self, window=DEFAULT_WINDOW):
+        """{step: [row, ...]} of the latest completed executions that really ran, newest first."""
+        try:
+            connection = self._connect()
+        except (OSError, sqlite3.Error):
+            return {}
+        try:
+            rows = connection.execute(
+                "SELECT steps.*, runs.started FROM steps JOIN runs ON runs.id = steps.run_id"
+                " WHERE steps.action = ? AND steps.observed = ? AND steps.status = 'done' ORDER BY runs.started DESC",
+                (RUN, RUN),
+            ).fetchall()
+        finally:
+            connection.close()
+        samples = {}
+        for row in rows:
+            rows_for_step = samples.setdefault(row["step"], [])
+            if len(rows_for_step) < window:
+                rows_for_step.append(dict(row))
+        return samples
+
+    def estimates(self, window=DEFAULT_WINDOW):
+        """Median duration, bytes and download time of each step's recent executions."""
+        return {
+            step: {
+                "duration_s": statistics.median(row["duration_s"] for row in rows),
+                "bytes": statistics.median(row["bytes"] for row in rows),
+                "download_s": statistics.median(row["download_s"] for row in rows),
+                "samples": len(rows),
+            }
+            for step, rows in self.samples(window).items()
+        }
+
+    def record_trace(self, plan, success):
+        """Store the steps of the run the global tracer just recorded."""
+        from cmd.tracing import tracer
+
+        summary = tracer.summary()
+        return self.record_run(summary["name"], tracer.started, summary["wall_s"], success,
+                               steps_from_trace(summary, plan))
+
+    def runs(self, limit=20):
+        connection = self._connect()
+        try:
+            runs = [dict(row) for row in connection.execute(
+                "SELECT * FROM runs ORDER BY started DESC LIMIT ?", (limit,))]
+            for run in runs:
+                run["steps"] = [dict(row) for row in connection.execute(
+                    "SELECT step, label, action, observed, status, duration_s, bytes, download_s FROM steps"
+                    " WHERE run_id = ?",
+                    (run["id"],))]
+            return runs
+        finally:
+            connection.close()
+
+    def report(self, window=DEFAULT_WINDOW):
+        """Per step: latest and median duration, the trend between the older and newer
+        half of the window, and whether the latest run is a regression."""
+        report = []
+        for step, rows in sorted(self.samples(window).items()):
+            durations = [row["duration_s"] for row in rows]
+            latest, previous = durations[0], durations[1:]
+            median = statistics.median(previous or durations)
+            half = len(durations) // 2
+            trend = None
+            if half:
+                newer, older = statistics.median(durations[:half]), statistics.median(durations[-half:])
+                trend = round((newer - older) / older * 100, 1) if older else None
+            throughput = [row["bytes"] / row["download_s"] for row in rows if row["download_s"] > 0 and row["bytes"]]
+            report.append({
+                "step": step,
+                "label": rows[0]["label"],
+                "samples": len(rows),
+                "latest_s": round(latest, 3),
+                "median_s": round(median, 3),
+                "trend_pct": trend,
+                "median_mb_per_s": round(statistics.median(throughput) / (1024 * 1024), 2) if throughput else None,
+                "regression": bool(previous) and latest > median * REGRESSION_FACTOR
+                              and latest - median > REGRESSION_MIN_SECONDS,
+            })
+        return report
+
+class ProgressEstimator:
+    """Weighted progress and a live ETA for one install run.
+
+    Each step weighs what it took on this machine before (the median from
+    StepHistory), or a default guess, or almost nothing when the plan says
+    it is up to date. While downloads are running, the time left for them
+    is worked out from the current throughput instead; the rest of a step
+    (running the installer) still comes from history. Steps whose
+    requirements are met run in parallel, so the ETA is the remaining time
+    along the critical path of the step graph.
+    """
+
+    # Seconds between samples of a download's throughput.
+    RATE_INTERVAL = 0.5
+
+    def __init__(self, steps, plan, estimates):
+        self.steps = {step.name: step for step in steps}
+        self.names = {step.label: step.name for step in steps}
+        self.estimates = estimates
+        actions = {entry["step"]: entry["action"] for entry in plan}
+        self.expected = {}
+        for name in self.steps:
+            if actions.get(name, RUN) != RUN:
+                self.expected[name] = UP_TO_DATE_SECONDS
+            elif name in estimates:
+                self.expected[name] = max(estimates[name]["duration_s"], UP_TO_DATE_SECONDS)
+            else:
+                self.expected[name] = DEFAULT_ESTIMATES.get(name, DEFAULT_ESTIMATE)
+        self.started = {}
+        self.finished = set()
+        self.downloads = {}
+        self._lock = threading.Lock()
+
+    def step_started(self, step):
+        with self._lock:
+            self.started[step.name] = time.monotonic()
+
+    def step_finished(self, label):
+        """Takes the label, which is what the scheduler's progress callback reports."""
+        with self._lock:
+            self.finished.add(self.names.get(label, label))
+
+    def download_progress(self, url, done, total, step=None):
+        now = time.monotonic()
+        with self._lock:
+            download = self.downloads.get(url)
+            if download is None:
+                self.downloads[url] = {"step": step, "done": done, "total": total, "rate": None,
+                                       "sample_time": now, "sample_done": done, "updated": now}
+                return
+            download.update(done=done, total=total, updated=now)
+            elapsed = now - download["sample_time"]
+            if elapsed >= self.RATE_INTERVAL:
+                rate = (done - download["sample_done"]) / elapsed
+                # Smooth out bursts; a new sample counts for a third.
+                download["rate"] = rate if download["rate"] is None else download["rate"] * 2 / 3 + rate / 3
+                download["sample_time"], download["sample_done"] = now, done
+
+    def throughput(self):
+        """Bytes per second across the downloads active in the last two seconds, or None."""
+        now = time.monotonic()
+        rates = [download["rate"] for download in self.downloads.values()
+                 if download["rate"] and now - download["updated"] < 2 and download["done"] < (download["total"] or 0)]
+        if rates:
+            return sum(rates)
+        finished = [download["rate"] for download in self.downloads.values() if download["rate"]]
+        return finished[-1] if finished else None
+
+    def _remaining(self, name, now, throughput):
+        if name in self.finished:
+            return 0.0
+        expected = self.expected[name]
+        history = self.estimates.get(name)
+        install_s = max(expected - history["download_s"], 0.0) if history else None
+        if name in self.started:
+            elapsed = now - self.started[name]
+            active = [download for download in self.downloads.values()
+                      if download["step"] == name and download["total"] and download["done"] < download["total"]]
+            if active and install_s is not None:
+                download_left = sum(
+                    (download["total"] - download["done"]) / (download["rate"] or throughput or float("inf"))
+                    for download in active
+                )
+                if download_left != float("inf"):
+                    return download_left + install_s
+            # Never claim a running step is done; overruns shrink towards a floor.
+            return max(expected - elapsed, expected * 0.05)
+        if history and history["bytes"] and throughput:
+            return install_s + history["bytes"] / throughput
+        return expected
+
+    def snapshot(self):
+        """(fraction done 0..1, seconds left)."""
+        now = time.monotonic()
+        with self._lock:
+            throughput = self.throughput()
+            remaining = {name: self._remaining(name, now, throughput) for name in self.steps}
+            finished = set(self.finished)
+        total = sum(max(self.expected[name], remaining[name]) for name in self.steps)
+        if len(finished) == len(self.steps):
+            return 1.0, 0.0
+        done = sum(max(self.expected[name], remaining[name]) - remaining[name] for name in self.steps)
+        return min(done / total, 0.99) if total else 0.0, self.critical_path(remaining)
+
+    def critical_path(self, remaining):
+        """Seconds until the last step finishes, if every step starts as soon as its requirements are done."""
+        finish = {}
+
+        def finish_time(name):
+            if name not in finish:
+                requires = [dep for dep in self.steps[name].requires if dep in self.steps]
+                finish[name] = remaining[name] + max((finish_time(dep) for dep in requires), default=0.0)
+            return finish[name]
+
+        return max((finish_time(name) for name in self.steps), default=0.0)
+
+    def describe(self):
+        fraction, eta = self.snapshot()
+        if fraction >= 1:
+            return "100%"
+        return f"{int(fraction * 100)}% - about {format_eta(eta)} left"
+
+def format_eta(seconds):
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+
+step_history = StepHistory()
@@ -1,85 +1,420 @@
-import subprocess
+import abc
 import os
-import tempfile
-import urllib.request
-import zipfile
-import shutil
+import re
+import shlex
+import threading
 import webbrowser
-from tkinter import messagebox
+from cmd.cache import download_cache, url_key
+from cmd.adb import AdbClient, AdbError
+from cmd.devices import DEFAULT_MAX_WORKERS, AdbCommandLine, DeviceStage, ServerApks
+from cmd.extensions import APPIUM_EXTENSIONS, ExtensionManifest, npm_env
+from cmd.pathindex import executable_index
+from cmd.process import CommandRunner, COMMAND_TIMEOUT
+from cmd.releases import Release, release_resolver
+from cmd.runtimes import JAVA, NODE, runtime_discovery
+from cmd.tracing import tracer
+from cmd.verify import ProbeResult, OK, FAILED, TIMEOUT, file_fingerprint
+from cmd.warmup import DEFAULT_PORT as DEFAULT_APPIUM_PORT, AppiumServer, WarmupStage
+from cmd.ziptree import ZipTreeSync
+
+# "Android Debug Bridge version 1.0.41": the last number is what host:version reports.
+ADB_VERSION_PATTERN = re.compile(r"version \d+\.\d+\.(\d+)")
+MACHINE_ENVIRONMENT_KEY = r"SYSTEM\CurrentControlSet\Control\Session Manager\Environment"
+
+def machine_environment(*names):
+    """{name: value or None} as stored in the machine environment, unexpanded; None without a registry."""
+    try:
+        import winreg
+        with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, MACHINE_ENVIRONMENT_KEY) as key:
+            values = {}
+            for name in names:
+                try:
+                    values[name] = winreg.QueryValueEx(key, name)[0]
+                except OSError:
+                    values[name] = None
+            return values
+    except (ImportError, OSError):
+        return None
+
+def _broadcast_environment_change():
+    # What setx does after writing: tell Explorer and other top-level windows to reload the environment.
+    import ctypes
+    from ctypes import wintypes
+
+    HWND_BROADCAST, WM_SETTINGCHANGE, SMTO_ABORTIFHUNG = 0xFFFF, 0x001A, 0x0002
+    result = wintypes.DWORD()
+    ctypes.windll.user32.SendMessageTimeoutW(HWND_BROADCAST, WM_SETTINGCHANGE, 0, "Environment",
+                                             SMTO_ABORTIFHUNG, 5000, ctypes.byref(result))
+
+def append_machine_path(directory):
+    """Append ``directory`` to the machine Path in the registry; False if it is already there.
+
+    The value is rewritten as REG_EXPAND_SZ, so entries such as
+    %SystemRoot%\\system32 keep expanding, and at full length (setx cuts
+    values at 1024 characters). Raises ImportError without a registry and
+    OSError when the key cannot be written.
+    """
+    import winreg
+
+    access = winreg.KEY_QUERY_VALUE | winreg.KEY_SET_VALUE
+    with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, MACHINE_ENVIRONMENT_KEY, 0, access) as key:
+        try:
+            current = winreg.QueryValueEx(key, "Path")[0]
+        except FileNotFoundError:
+            current = ""
+        if os.path.normcase(directory.rstrip("\\/")) in path_entries(current or ""):
+            return False
+        value = f"{current.rstrip(';')};{directory}" if current else directory
+        winreg.SetValueEx(key, "Path", 0, winreg.REG_EXPAND_SZ, value)
+    _broadcast_environment_change()
+    return True
+
+def path_entries(path, separator=";"):
+    return [os.path.normcase(entry.strip().rstrip("\\/")) for entry in path.split(separator) if entry.strip()]
+
+def windows_arch():
+    return "x64" if "64" in os.environ.get("PROCESSOR_ARCHITECTURE", "x86") else "x86"
+
+def appium_home():
+    return os.environ.get("APPIUM_HOME") or os.path.join(os.path.expanduser("~"), ".appium")
+
+def global_package_json(bin_path, package):
+    # npm puts global packages next to the shim on Windows and under lib/ elsewhere.
+    if not bin_path:
+        return None
+    bin_dir = os.path.dirname(bin_path)
+    for candidate in (
+        os.path.join(bin_dir, "node_modules", package, "package.json"),
+        os.path.join(os.path.dirname(bin_dir), "lib", "node_modules", package, "package.json"),
+    ):
+        if os.path.exists(candidate):
+            return candidate
+    return None
 
 class BaseInstaller:
-    def __init__(self, log_function):
+    # Windows Installer only runs one msiexec at a time (error 1618), so MSI
+    # installs are serialized even when the install steps run in parallel.
+    msi_lock = threading.Lock()
+    # "setx PATH" replaces the whole machine PATH, so concurrent steps take turns.
+    path_lock = threading.Lock()
+    
+    # Parallel byte-range connections per download; large artifacts override this.
+    download_segments = 1
+
+    
+    def __init__(self, log_function, cache=None, progress_function=None, cancel_event=None, confirm_function=None,
+                 bundle=None, mirror=None):
         self.write_log = log_function
+        # A peer running "main.py serve"; tried before the origin for every download.
+        self.mirror = mirror or os.environ.get("APPIUM_INSTALLER_MIRROR") or None
+        # An offline bundle replaces the network entirely (see cmd/bundle.py).
+        self.bundle = bundle
+        self.cache = cache or download_cache
+        self.progress_function = progress_function
+        self.cancel_event = cancel_event or threading.Event()
+        # The GUI passes messagebox.askyesno; unattended runs never prompt.
+        self.confirm = confirm_function or (lambda title, message: False)
+        # URL -> SHA-256 of every artifact this installer used, for the state file.
+        self.fetched = {}
+        # Set when a runtime already on the machine stood in for the release (see satisfied_by()).
+        self.existing_runtime = None
         
-    def run_command(self, cmd, shell=True):
-        try:
-            result = subprocess.run(
-                cmd, 
-                shell=shell, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            return result.stdout, result.stderr, result.returncode
-        except Exception as e:
-            return "", str(e), -1
+    def log_output_line(self, line, stream_name):
+        if line.strip():
+            self.write_log(f"    {line}", "yellow" if stream_name == "stderr" else "black")
+        
+    def run_command(self, cmd, shell=True, timeout=None, stream=False, env=None):
+        # With stream=True output reaches the log as it is produced; either way only
+        # a bounded tail of stdout/stderr is returned.
+        command_line = cmd if isinstance(cmd, str) else " ".join(cmd)
+        with tracer.span(command_line[:80], "command", cmd=command_line) as span:
+            try:
+                runner = CommandRunner(self.log_output_line if stream else None, self.cancel_event)
+                result = runner.run(cmd, shell=shell, timeout=timeout, env=env)
+                span.set(exit_code=result.returncode, cpu_s=result.cpu_seconds,
+                         timed_out=result.timed_out, cancelled=result.cancelled)
+                return result.stdout, result.stderr, result.returncode
+            except Exception as e:
+                span.set(exit_code=-1, error=str(e))
+                return "", str(e), -1
             
     def check_command(self, command):
+        return executable_index.exists(command)
+    
+    def command_version(self, command, args="--version"):
+        return executable_index.version(command, self.run_command, args)
+    
+    def run_msi(self, cmd, timeout=30 * 60):
+        with tracer.span("waiting for msiexec", "wait"):
+            self.msi_lock.acquire()
+        try:
+            return self.run_command(cmd, timeout=timeout)
+        finally:
+            self.msi_lock.release()
+    
+    def add_to_path(self, directory):
+        """Append ``directory`` to the machine PATH and this process's PATH unless it is there already.
+
+        The machine value is read and written in the registry under
+        path_lock, so what other steps (or the user) added since this
+        process started is kept. Returns run_command's (stdout, stderr, code).
+        """
+        with tracer.span("waiting for PATH update", "wait"):
+            self.path_lock.acquire()
+        try:
+            result = ("", "", 0)
+            try:
+                if not append_machine_path(directory):
+                    self.write_log(f"{directory} is already on the machine PATH.", "green")
+            except ImportError:
+                # No registry: setx on what this process sees, the closest thing to the machine PATH.
+                current = ";".join(os.environ.get("PATH", "").split(os.pathsep))
+                if os.path.normcase(directory.rstrip("\\/")) not in path_entries(current):
+                    result = self.run_command(["setx", "PATH", f"{current.rstrip(';')};{directory}", "/M"], shell=False)
+            except OSError as e:
+                result = ("", f"Could not write the machine PATH: {e}", 1)
+            if result[2] == 0 and os.path.normcase(directory) not in path_entries(os.environ.get("PATH", ""), os.pathsep):
+                os.environ["PATH"] = os.environ.get("PATH", "") + os.pathsep + directory
+            return result
+        finally:
+            self.path_lock.release()
+    
+    def download_progress(self, url):
+        name = url.rsplit("/", 1)[-1]
+        last_logged = [0]
+        # Segmented downloads report from their own threads; remember the step here.
+        step_span = tracer.current("step")
+        step = step_span.attrs.get("step") if step_span else None
+        
+        def report(done, total):
+            if self.progress_function:
+                self.progress_function(url, done, total, step)
+            if total:
+                percent = done * 100 // total
+                if percent >= last_logged[0] + 10:
+                    last_logged[0] = percent - percent % 10
+                    self.write_log(f"{name}: {percent}% ({done // (1024 * 1024)} of {total // (1024 * 1024)} MB)", "black")
+        return report
+    
+    def download_segment_count(self):
+        return int(os.environ.get("APPIUM_INSTALLER_SEGMENTS", self.download_segments))
+    
+    def download_from_mirror(self, url, destination, sha256=None):
+        # The mirror's own X-Artifact-SHA256 only proves the transfer; when the
+        # expected hash is known, the mirror's copy must match it too.
+        from cmd.downloader import get_downloader
+        from cmd.mirror import SHA256_HEADER
+
+        name = url.rsplit("/", 1)[-1]
+        mirror_url = f"{self.mirror.rstrip('/')}/by-url/{url_key(url)}"
+        # A separate partial file, so a half-finished mirror transfer is never resumed from the origin.
+        mirror_path = destination + ".mirror"
         try:
-            subprocess.run(
-                [command, "--version"], 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE,
-                check=False
+            downloader = get_downloader()
+            headers = downloader.head(mirror_url)
+            if headers is None or SHA256_HEADER not in headers:
+                self.write_log(f"Mirror does not have {name}, using origin.", "yellow")
+                return False
+            if sha256 and headers[SHA256_HEADER].lower() != sha256.lower():
+                self.write_log(f"Mirror's copy of {name} does not match its expected SHA-256, using origin.", "yellow")
+                return False
+            self.write_log(f"Downloading {name} from mirror {self.mirror}...", "yellow")
+            size, sha256 = downloader.download(
+                mirror_url, mirror_path, self.download_progress(url), self.download_segment_count(),
+                expected_sha256=sha256 or headers[SHA256_HEADER]
             )
-            return True
-        except:
+            os.replace(mirror_path, destination)
+            self.write_log("Download completed.", "green")
+            return sha256
+        except Exception as e:
+            self.write_log(f"Mirror download failed ({str(e)}), using origin.", "yellow")
+            if os.path.exists(mirror_path):
+                os.remove(mirror_path)
+            get_downloader().discard_validator(mirror_path)
             return False
+
+    def download_file(self, url, destination, sha256=None):
+        # Returns the SHA-256 of the downloaded file (computed while streaming) or False.
+        # Imported here so that runs which never download don't pay for urllib3.
+        from cmd.downloader import get_downloader
+        with tracer.span(url.rsplit("/", 1)[-1], "download", url=url) as span:
+            if self.mirror:
+                mirrored = self.download_from_mirror(url, destination, sha256)
+                if mirrored:
+                    span.set(source="mirror", bytes=os.path.getsize(destination), sha256=mirrored)
+                    return mirrored
+            try:
+                self.write_log(f"Downloading {url}...", "yellow")
+                segments = self.download_segment_count()
+                size, sha256 = get_downloader().download(url, destination, self.download_progress(url), segments)
+                span.set(source="origin", bytes=size, segments=segments, sha256=sha256)
+                self.write_log("Download completed.", "green")
+                return sha256
+            except Exception as e:
+                span.set(error=str(e))
+                self.write_log(f"Download failed: {str(e)}", "red")
+                return False
     
-    def download_file(self, url, destination):
+    def use_existing_runtime(self, kind, minimum, preferred_major, variables=()):
+        """Wire up a compatible runtime already on disk but not on PATH; True if one was.
+
+        ``variables`` are set to the runtime's home (JAVA_HOME); its bin
+        directory is appended to the machine PATH the same way the platform
+        tools are.
+        """
+        with tracer.span(f"discover {kind}", "discover") as span:
+            runtime = runtime_discovery.best(kind, minimum, preferred_major)
+            span.set(found=runtime.home if runtime else None)
+        if runtime is None:
+            return False
+        self.write_log(f"Found {runtime.describe()}; using it instead of downloading.", "green")
+        self.existing_runtime = {"source": "discovered", "version": runtime.version, "location": runtime.home}
+        for name in variables:
+            stdout, stderr, code = self.run_command(f'setx {name} "{runtime.home}" /M')
+            if code != 0:
+                self.write_log(f"Error setting {name}: {stderr}", "red")
+                return False
+            os.environ[name] = runtime.home
+        stdout, stderr, code = self.add_to_path(runtime.bin_dir)
+        if code != 0:
+            self.write_log(f"Error updating PATH: {stderr}", "red")
+            return False
+        executable_index.refresh()
+        return executable_index.exists(kind)
+    
+    def installed_details(self, command):
+        return {"location": executable_index.resolve(command), "artifacts": dict(self.fetched)}
+    
+    def use_runtime_on_path(self, command, args="--version"):
+        """Note that ``command`` was already on PATH; returns its version output."""
+        output = self.command_version(command, args)
+        version = output.strip().splitlines()[0] if output and output.strip() else None
+        self.existing_runtime = {"source": "PATH", "version": version, "location": executable_index.resolve(command)}
+        return output
+    
+    def satisfied_by(self):
+        """What stood in for the release on the last install: a runtime on PATH or on disk, or None."""
+        return self.existing_runtime
+    
+    def probe_failure(self, name, code, message):
+        if code == COMMAND_TIMEOUT:
+            self.write_log(f"{name} check timed out!", "red")
+            return ProbeResult(name, TIMEOUT, f"{name}: ❌ Check timed out")
+        self.write_log(message, "red")
+        return ProbeResult(name, FAILED, f"{name}: ❌ Not installed or not working properly")
+    
+    def fetch_artifact(self, url, sha256=None, max_age=None):
+        if self.bundle is not None:
+            path = self.bundle.path_for_url(url)
+            if path:
+                self.fetched[url] = self.bundle.artifacts[self.bundle.name_for_url(url)]["sha256"]
+                self.write_log(f"Using {os.path.basename(path)} from offline bundle", "green")
+            else:
+                self.write_log(f"{url} is missing from the offline bundle or failed its integrity check", "red")
+            return path
         try:
-            self.write_log(f"Downloading {url}...", "yellow")
-            urllib.request.urlretrieve(url, destination)
-            self.write_log("Download completed.", "green")
-            return True
+            with tracer.span(url.rsplit("/", 1)[-1], "artifact", url=url) as span:
+                path, hit = self.cache.fetch(url, lambda url, destination: self.download_file(url, destination, sha256),
+                                             sha256, max_age)
+                span.set(cache_hit=hit)
+            # Cache blobs are named by their SHA-256.
+            self.fetched[url] = os.path.basename(path)
+            if hit:
+                self.write_log(f"Using cached download for {url}", "green")
+            return path
         except Exception as e:
             self.write_log(f"Download failed: {str(e)}", "red")
+            return None
+
+class ReleaseMixin(abc.ABC):
+    """For installers of a versioned runtime: picks the release to install.
+
+    ``release_component`` and ``release_line`` are what is looked up in
+    upstream metadata (cmd/releases.py); ``bundle_name`` is the bundle
+    artifact that replaces it offline.
+    """
+
+    release_component = None
+    release_line = None
+    bundle_name = None
+
+    @abc.abstractmethod
+    def pinned_release(self, arch):
+        """The Release installed when neither a bundle nor upstream metadata has one."""
+
+    def release(self, arch=None):
+        """The release to install: the bundle's, the newest upstream one, or the pinned fallback."""
+        arch = arch or windows_arch()
+        if self.bundle is not None:
+            entry = self.bundle.artifacts.get(self.bundle_name)
+            if entry:
+                return Release(self.release_component, entry["version"], entry["url"], source="bundle")
+            return self.pinned_release(arch)
+        return release_resolver.resolve(self.release_component, self.release_line, arch) or self.pinned_release(arch)
+
+    def desired_inputs(self):
+        return {"version": self.release().version, "arch": windows_arch()}
+
+    def keeps_recorded_inputs(self, recorded):
+        """Whether ``recorded`` inputs still hold because release() could only fall back to the pinned release.
+
+        Without upstream metadata the newest release is unknown, so a
+        version of the same line recorded by an earlier, online run is not
+        an input change.
+        """
+        if self.bundle is not None or self.release().source != "pinned":
             return False
+        version = str(recorded.get("version") or "")
+        return recorded.get("arch") == windows_arch() and version.split(".")[0] == str(self.release_line)
 
-class NodeInstaller(BaseInstaller):
+class NodeInstaller(ReleaseMixin, BaseInstaller):
+    # The newest 20.x release is installed; NODE_VERSION only when nodejs.org can't be asked.
+    NODE_LINE = 20
+    NODE_VERSION = "20.11.1"
+    # Oldest Node.js an existing install may have to be used instead of NODE_VERSION.
+    MIN_NODE_VERSION = (18, 0, 0)
+    
+    release_component = NODE
+    release_line = NODE_LINE
+    bundle_name = "node"
+    
     def install(self):
         if not self.check_command("node"):
+            if self.use_existing_runtime(NODE, self.MIN_NODE_VERSION, self.NODE_LINE):
+                return True
             self.write_log("Node.js not found. Starting automatic installation...", "yellow")
             
             if not self.install_nodejs():
                 self.write_log("Automatic Node.js installation failed.", "red")
-                if messagebox.askyesno("Open Download Page", "Open Node.js download page in browser?"):
+                if self.confirm("Open Download Page", "Open Node.js download page in browser?"):
                     webbrowser.open("https://nodejs.org/en/download/")
                 return False
         else:
-            stdout, stderr, code = self.run_command("node --version")
-            self.write_log(f"Node.js is already installed: {stdout.strip()}", "green")
+            self.write_log(f"Node.js is already installed: {self.use_runtime_on_path('node')}", "green")
         return True
             
+    def pinned_release(self, arch):
+        url = f"https://nodejs.org/dist/v{self.NODE_VERSION}/node-v{self.NODE_VERSION}-{arch}.msi"
+        return Release(NODE, self.NODE_VERSION, url, source="pinned")
+            
     def install_nodejs(self):
-        arch = "x64" if "64" in os.environ.get("PROCESSOR_ARCHITECTURE", "x86") else "x86"
-        
         self.write_log("Downloading Node.js...", "yellow")
         
-        temp_dir = tempfile.mkdtemp()
-        
         try:
-            nodejs_url = f"https://nodejs.org/dist/v20.11.1/node-v20.11.1-{arch}.msi"
-            installer_path = os.path.join(temp_dir, "nodejs_installer.msi")
+            release = self.release()
+            self.write_log(f"Node.js {release.version} selected.", "darkblue")
+            installer_path = self.fetch_artifact(release.url, release.sha256)
             
-            if self.download_file(nodejs_url, installer_path):
+            if installer_path:
                 self.write_log("Installing Node.js...", "yellow")
                 cmd = f'msiexec /i "{installer_path}" /qn'
-                stdout, stderr, code = self.run_command(cmd)
+                stdout, stderr, code = self.run_msi(cmd)
                 
                 if code == 0:
                     self.write_log("Node.js installed successfully.", "green")
-                    os.environ["Path"] = os.environ["Path"] + ";C:\\Program Files\\nodejs"
+                    with self.path_lock:
+                        os.environ["Path"] = os.environ["Path"] + ";C:\\Program Files\\nodejs"
+                    executable_index.refresh()
                     return True
                 else:
                     self.write_log(f"Error installing Node.js: {stderr}", "red")
@@ -88,55 +423,80 @@ class NodeInstaller(BaseInstaller):
         except Exception as e:
             self.write_log(f"Error installing Node.js: {str(e)}", "red")
             return False
-        finally:
-            try:
-                shutil.rmtree(temp_dir)
-            except Exception:
-                pass
                 
-    def verify(self):
-        stdout, stderr, code = self.run_command("node --version")
+    def verify(self, timeout=None):
+        stdout, stderr, code = self.run_command("node --version", timeout=timeout)
         
         if code == 0:
             node_version = stdout.strip()
             self.write_log(f"Node.js version: {node_version}", "green")
-            return f"Node.js: ✅ {node_version}"
+            return ProbeResult("Node.js", OK, f"Node.js: ✅ {node_version}", node_version)
         else:
-            self.write_log("Node.js not found or version check failed!", "red")
-            return "Node.js: ❌ Not installed or not working properly"
+            return self.probe_failure("Node.js", code, "Node.js not found or version check failed!")
+            
+    def verify_fingerprint(self):
+        return file_fingerprint(executable_index.resolve("node"))
 
-class JavaInstaller(BaseInstaller):
+class JavaInstaller(ReleaseMixin, BaseInstaller):
+    # The newest Temurin 17 is installed; JDK_VERSION only when Adoptium's API can't be asked.
+    JDK_FEATURE = 17
+    JDK_VERSION = "17.0.10+7"
+    # Oldest Java an existing JDK or JRE (Android Studio's included) may have.
+    MIN_JAVA_VERSION = (11,)
+    
+    release_component = JAVA
+    release_line = JDK_FEATURE
+    bundle_name = "jdk"
+    
+    # The ~180 MB JDK MSI benefits most from several connections behind a proxy.
+    download_segments = 4
+    
     def install(self):
         if not self.check_command("java"):
+            if self.use_existing_runtime(JAVA, self.MIN_JAVA_VERSION, self.JDK_FEATURE, ["JAVA_HOME"]):
+                return True
             self.write_log("Java not found. Starting automatic installation...", "yellow")
             
             if not self.install_java_jdk():
                 self.write_log("Automatic Java installation failed.", "red")
-                if messagebox.askyesno("Open Download Page", "Open Java download page in browser?"):
+                if self.confirm("Open Download Page", "Open Java download page in browser?"):
                     webbrowser.open("https://adoptium.net/temurin/releases/")
                 return False
         else:
-            self.write_log("Java is already installed.", "green")
+            version = self.use_runtime_on_path("java", "-version")
+            self.write_log(f"Java is already installed: {version.splitlines()[0] if version else 'unknown version'}", "green")
         return True
             
+    def pinned_release(self, arch):
+        tag = self.JDK_VERSION.replace("+", "%2B")
+        feature = self.JDK_VERSION.split(".")[0]
+        file_version = self.JDK_VERSION.replace("+", "_")
+        url = (f"https://github.com/adoptium/temurin{feature}-binaries/releases/download/jdk-{tag}/"
+               f"OpenJDK{feature}U-jdk_{arch}_windows_hotspot_{file_version}.msi")
+        return Release(JAVA, self.JDK_VERSION, url, source="pinned")
+            
     def install_java_jdk(self):
         self.write_log("Downloading Adoptium JDK...", "yellow")
         
-        temp_dir = tempfile.mkdtemp()
-        
         try:
-            arch = "x64" if "64" in os.environ.get("PROCESSOR_ARCHITECTURE", "x86") else "x86"
-            
-            jdk_url = f"https://github.com/adoptium/temurin17-binaries/releases/download/jdk-17.0.10%2B7/OpenJDK17U-jdk_{arch}_windows_hotspot_17.0.10_7.msi"
-            installer_path = os.path.join(temp_dir, "jdk_installer.msi")
+            release = self.release()
+            self.write_log(f"Temurin JDK {release.version} selected.", "darkblue")
+            installer_path = self.fetch_artifact(release.url, release.sha256)
             
-            if self.download_file(jdk_url, installer_path):
+            if installer_path:
                 self.write_log("Installing Java JDK...", "yellow")
                 cmd = f'msiexec /i "{installer_path}" /qn ADDLOCAL=FeatureMain,FeatureEnvironment,FeatureJarFileRunWith,FeatureJavaHome'
-                stdout, stderr, code = self.run_command(cmd)
+                stdout, stderr, code = self.run_msi(cmd)
                 
                 if code == 0:
                     self.write_log("Java JDK installed successfully.", "green")
+                    # The MSI only changes the machine PATH; without this the state file
+                    # would record no java, and the next run would check it all over again.
+                    runtime = runtime_discovery.best(JAVA, self.MIN_JAVA_VERSION, self.JDK_FEATURE)
+                    if runtime is not None:
+                        with self.path_lock:
+                            os.environ["PATH"] = os.environ["PATH"] + os.pathsep + runtime.bin_dir
+                    executable_index.refresh()
                     return True
                 else:
                     self.write_log(f"Error installing Java JDK: {stderr}", "red")
@@ -145,54 +505,54 @@ class JavaInstaller(BaseInstaller):
         except Exception as e:
             self.write_log(f"Error installing Java JDK: {str(e)}", "red")
             return False
-        finally:
-            try:
-                shutil.rmtree(temp_dir)
-            except Exception:
-                pass
                 
-    def verify(self):
-        stdout, stderr, code = self.run_command("java -version", shell=False)
+    def verify(self, timeout=None):
+        stdout, stderr, code = self.run_command(["java", "-version"], shell=False, timeout=timeout)
         
         if code == 0:
             java_version = stderr.strip() if stderr else stdout.strip()
             self.write_log(f"Java version: {java_version}", "green")
-            return "Java: ✅ Installed"
+            first_line = java_version.splitlines()[0] if java_version else None
+            return ProbeResult("Java", OK, "Java: ✅ Installed", first_line)
         else:
-            self.write_log("Java not found or version check failed!", "red")
-            return "Java: ❌ Not installed or not working properly"
+            return self.probe_failure("Java", code, "Java not found or version check failed!")
+            
+    def verify_fingerprint(self):
+        java_path = executable_index.resolve("java")
+        java_home = os.path.dirname(os.path.dirname(os.path.realpath(java_path))) if java_path else None
+        return file_fingerprint(java_path, os.path.join(java_home, "release") if java_home else None)
 
 class PlatformToolsInstaller(BaseInstaller):
-    def __init__(self, log_function):
-        super().__init__(log_function)
+    # The "latest" zip changes upstream, so a cached copy is only reused for a week.
+    LATEST_MAX_AGE = 7 * 24 * 60 * 60
+    
+    # APPIUM_INSTALLER_PLATFORM_TOOLS_URL replaces the origin, e.g. with bench/bench_install.py's stand-in.
+    DOWNLOAD_URL = os.environ.get("APPIUM_INSTALLER_PLATFORM_TOOLS_URL",
+                                  "https://dl.google.com/android/repository/platform-tools-latest-windows.zip")
+    
+    def __init__(self, log_function, **options):
+        super().__init__(log_function, **options)
         self.android_home = os.path.join(os.path.expanduser("~"), "android-platform-tools")
         self.platform_tools_path = os.path.join(self.android_home, "platform-tools")
         
     def install(self):
-        platform_tools_url = "https://dl.google.com/android/repository/platform-tools-latest-windows.zip"
+        platform_tools_url = self.DOWNLOAD_URL
         
         try:
-            temp_dir = tempfile.mkdtemp()
-            zip_path = os.path.join(temp_dir, "platform-tools.zip")
-            
-            self.write_log(f"Downloading from {platform_tools_url}...", "yellow")
-            urllib.request.urlretrieve(platform_tools_url, zip_path)
-            self.write_log("Download completed.", "green")
-            
-            self.write_log("Extracting platform-tools...", "yellow")
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_dir)
+            zip_path = self.fetch_artifact(platform_tools_url, max_age=self.LATEST_MAX_AGE)
+            if not zip_path:
+                raise RuntimeError(f"could not download {platform_tools_url}")
             
             if not os.path.exists(self.android_home):
                 os.makedirs(self.android_home)
             
-            platform_tools_dir = os.path.join(temp_dir, "platform-tools")
-            if os.path.exists(self.platform_tools_path):
-                shutil.rmtree(self.platform_tools_path)
-            shutil.copytree(platform_tools_dir, self.platform_tools_path)
-            self.write_log(f"Android Platform Tools extracted to {self.android_home}", "green")
+            self.write_log("Updating platform-tools...", "yellow")
+            written = ZipTreeSync(zip_path, "platform-tools", self.platform_tools_path).sync()
+            if written:
+                self.write_log(f"Android Platform Tools updated in {self.android_home} ({written} files changed)", "green")
+            else:
+                self.write_log(f"Android Platform Tools in {self.android_home} are already up to date.", "green")
             
-            shutil.rmtree(temp_dir)
             return self.platform_tools_path
         except Exception as e:
             self.write_log(f"Error downloading or extracting Android Platform Tools: {str(e)}", "red")
@@ -210,8 +570,7 @@ class PlatformToolsInstaller(BaseInstaller):
                 self.write_log(f"Error setting ANDROID_HOME: {stderr}", "red")
                 return False
                 
-            cmd = f'setx PATH "%PATH%;{self.platform_tools_path}" /M'
-            stdout, stderr, code = self.run_command(cmd)
+            stdout, stderr, code = self.add_to_path(self.platform_tools_path)
             
             if code == 0:
                 self.write_log("PATH environment variable updated successfully.", "green")
@@ -220,80 +579,271 @@ class PlatformToolsInstaller(BaseInstaller):
                 return False
                 
             os.environ["ANDROID_HOME"] = self.android_home
-            os.environ["PATH"] = os.environ["PATH"] + ";" + self.platform_tools_path
+            executable_index.refresh()
             return True
             
         except Exception as e:
             self.write_log(f"Error setting environment variables: {str(e)}", "red")
             return False
             
-    def verify(self):
+    def verify(self, timeout=None):
         adb_path = os.path.join(self.platform_tools_path, "adb.exe")
         
         if os.path.exists(adb_path):
             self.write_log(f"Android Platform Tools found at: {self.platform_tools_path}", "green")
             
-            stdout, stderr, code = self.run_command(f'"{adb_path}" version')
+            # The installed adb itself: the server on port 5037 may belong to another SDK.
+            stdout, stderr, code = self.run_command([adb_path, "version"], shell=False, timeout=timeout)
             
+            adb_version = None
             if code == 0:
+                adb_version = stdout.strip().splitlines()[0] if stdout.strip() else None
                 self.write_log(f"ADB version: {stdout.strip()}", "green")
+                self.check_adb_server(adb_version)
+            elif code == COMMAND_TIMEOUT:
+                self.write_log("ADB found but version check timed out!", "yellow")
             else:
                 self.write_log("ADB found but version check failed!", "yellow")
                 
-            return "Android Platform Tools: ✅ Installed"
+            return ProbeResult("Android Platform Tools", OK, "Android Platform Tools: ✅ Installed", adb_version)
         else:
             self.write_log("Android Platform Tools not found!", "red")
-            return "Android Platform Tools: ❌ Not installed or not in the expected location"
+            return ProbeResult("Android Platform Tools", FAILED,
+                               "Android Platform Tools: ❌ Not installed or not in the expected location")
+            
+    def check_adb_server(self, adb_version):
+        """Warn when the running adb server speaks another protocol version than the installed adb."""
+        match = ADB_VERSION_PATTERN.search(adb_version or "")
+        if not match:
+            return
+        try:
+            server_version = AdbClient(timeout=2).version()
+        except (OSError, AdbError):
+            return
+        if server_version != int(match.group(1)):
+            self.write_log(f"The running adb server is version 1.0.{server_version}, not the installed "
+                           f"1.0.{match.group(1)}; it was probably started by another SDK. "
+                           "Run 'adb kill-server' to switch to the installed one.", "yellow")
+    
+    def verify_fingerprint(self):
+        return file_fingerprint(os.path.join(self.platform_tools_path, "adb.exe"))
+    
+    def verify_devices(self, timeout=None):
+        reports = self.device_stage(preinstall=False, command_timeout=timeout or 30).run()
+        if not reports:
+            return ProbeResult("Android Devices", OK, "Android Devices: ✅ None attached")
+        ready = sum(report.ready for report in reports)
+        summary = f"{ready} of {len(reports)} ready"
+        if ready == len(reports):
+            return ProbeResult("Android Devices", OK, f"Android Devices: ✅ {summary}")
+        return ProbeResult("Android Devices", FAILED, f"Android Devices: ❌ {summary}")
+    
+    def adb_command(self):
+        # APPIUM_INSTALLER_ADB replaces adb with any command line, e.g. "python bench/fake_adb.py".
+        override = os.environ.get("APPIUM_INSTALLER_ADB")
+        if override:
+            return shlex.split(override, posix=os.name != "nt")
+        adb_path = os.path.join(self.platform_tools_path, "adb.exe")
+        return [adb_path if os.path.exists(adb_path) else executable_index.resolve("adb") or "adb"]
+    
+    def device_stage(self, preinstall=True, max_workers=DEFAULT_MAX_WORKERS, command_timeout=30):
+        apks = ServerApks.find(appium_home())
+        if apks is None and preinstall:
+            self.write_log("uiautomator2 server APKs not found in APPIUM_HOME; only checking devices.", "yellow")
+        return DeviceStage(self.adb_client(), self.write_log, apks, preinstall, max_workers, command_timeout)
+    
+    def adb_client(self):
+        # Talk to the adb server directly when it is (or can be) running; the
+        # command line is kept for starting it and for installs.
+        command_line = AdbCommandLine(self.adb_command(), self.run_command)
+        client = AdbClient(fallback=command_line)
+        return client if client.start_server() else command_line
+    
+    def desired_inputs(self):
+        return {"url": self.DOWNLOAD_URL, "android_home": self.android_home}
+    
+    def installed_details(self, command=None):
+        return {"location": self.platform_tools_path, "artifacts": dict(self.fetched)}
+    
+    def environment_snapshot(self):
+        # setx /M writes the machine environment; read it back from the registry
+        # so a change made outside this process is noticed too.
+        values = machine_environment("ANDROID_HOME", "Path")
+        if values is None:
+            android_home, entries = os.environ.get("ANDROID_HOME"), path_entries(os.environ.get("PATH", ""), os.pathsep)
+        else:
+            android_home, entries = values["ANDROID_HOME"], path_entries(values["Path"] or "")
+        return {
+            "ANDROID_HOME": android_home,
+            "platform_tools_on_path": os.path.normcase(self.platform_tools_path) in entries,
+        }
 
 class AppiumInstaller(BaseInstaller):
+    NPM_TIMEOUT = 20 * 60
+    APPIUM_PACKAGE = "appium"
+    # The flags "appium driver install" passes to npm, so Appium treats the result the same way.
+    EXTENSION_NPM_FLAGS = "--save-dev --save-exact --omit=peer --global-style --no-package-lock --no-progress"
+    
+    def __init__(self, log_function, extensions=None, **options):
+        super().__init__(log_function, **options)
+        self.extensions = tuple(APPIUM_EXTENSIONS if extensions is None else extensions)
+        self.warmup_report = None
+        
+    def install_command(self):
+        if self.bundle is not None:
+            return self.bundle.npm_install_command("appium")
+        return "npm install -g appium", npm_env()
+    
+    def extension_install_command(self, extensions):
+        home = appium_home()
+        if self.bundle is not None:
+            tarballs = []
+            for extension in extensions:
+                tarball = self.bundle.verified_path(extension.name)
+                if tarball is None:
+                    return None, None
+                tarballs.append(f'"{tarball}"')
+            targets, env = " ".join(tarballs), self.bundle.npm_env()
+        else:
+            targets, env = " ".join(f'"{extension.spec}"' for extension in extensions), npm_env()
+        return f'npm install --prefix "{home}" {self.EXTENSION_NPM_FLAGS} {targets}', env
+    
     def install(self):
         if not self.check_command("appium"):
             self.write_log("Installing Appium...", "yellow")
-            stdout, stderr, code = self.run_command("npm install -g appium")
+            cmd, env = self.install_command()
+            if cmd is None:
+                self.write_log("Appium is missing from the offline bundle or failed its integrity check.", "red")
+                return False
+            stdout, stderr, code = self.run_command(cmd, timeout=self.NPM_TIMEOUT, stream=True, env=env)
             
             if code == 0:
                 self.write_log("Appium installed successfully.", "green")
+                # npm dropped a new shim into a directory that is already indexed.
+                executable_index.refresh()
             else:
                 self.write_log(f"Error installing Appium: {stderr}", "red")
                 self.write_log("You may need to install Appium manually: npm install -g appium", "yellow")
                 return False
         else:
-            stdout, stderr, code = self.run_command("appium --version")
-            self.write_log(f"Appium is already installed: {stdout.strip()}", "green")
+            self.write_log(f"Appium is already installed: {self.command_version('appium')}", "green")
         return True
         
+    def missing_extensions(self):
+        manifest = ExtensionManifest(appium_home())
+        missing = []
+        for extension in self.extensions:
+            if manifest.satisfies(extension):
+                version = manifest.installed_version(extension)
+                self.write_log(f"Appium {extension.kind} {extension.name} {version} is already installed.", "green")
+            else:
+                missing.append(extension)
+        return missing
+        
     def install_driver(self):
+        # Every missing driver and plugin goes into APPIUM_HOME in one npm run: npm
+        # fetches them in parallel, while separate runs against the same prefix would
+        # race on its package.json. The run needs only npm, not the appium CLI, so it
+        # overlaps the global Appium install and shares its warm npm cache.
         try:
-            stdout, stderr, code = self.run_command("appium driver install uiautomator2")
+            missing = self.missing_extensions()
+            if not missing:
+                return True
+            names = ", ".join(f"{extension.kind} {extension.name}" for extension in missing)
+            cmd, env = self.extension_install_command(missing)
+            if cmd is None:
+                self.write_log(f"Appium extensions missing from the offline bundle or failed its integrity check: {names}", "red")
+                return False
+            
+            os.makedirs(appium_home(), exist_ok=True)
+            self.write_log(f"Installing Appium extensions: {names}...", "yellow")
+            stdout, stderr, code = self.run_command(cmd, timeout=self.NPM_TIMEOUT, stream=True, env=env)
             
             if code == 0:
-                self.write_log("Appium Android Driver (uiautomator2) installed successfully.", "green")
+                self.write_log("Appium drivers and plugins installed successfully.", "green")
                 return True
             else:
-                self.write_log(f"Error installing Appium Android Driver: {stderr}", "red")
-                self.write_log("You may need to install Appium Android Driver manually: appium driver install uiautomator2", "yellow")
+                self.write_log(f"Error installing Appium extensions: {stderr}", "red")
+                self.write_log("You may need to install them manually, e.g. appium driver install uiautomator2", "yellow")
                 return False
         except Exception as e:
-            self.write_log(f"Error setting up Appium Driver: {str(e)}", "red")
+            self.write_log(f"Error setting up Appium extensions: {str(e)}", "red")
             return False
             
-    def verify(self):
-        stdout, stderr, code = self.run_command("appium --version")
+    def verify(self, timeout=None):
+        stdout, stderr, code = self.run_command("appium --version", timeout=timeout)
         
         if code == 0:
             appium_version = stdout.strip()
             self.write_log(f"Appium version: {appium_version}", "green")
-            return f"Appium: ✅ {appium_version}"
+            return ProbeResult("Appium", OK, f"Appium: ✅ {appium_version}", appium_version)
         else:
-            self.write_log("Appium not found or version check failed!", "red")
-            return "Appium: ❌ Not installed or not working properly"
+            return self.probe_failure("Appium", code, "Appium not found or version check failed!")
             
-    def verify_driver(self):
-        stdout, stderr, code = self.run_command("appium driver list --installed")
+    def verify_fingerprint(self):
+        appium_path = executable_index.resolve("appium")
+        return file_fingerprint(
+            appium_path,
+            global_package_json(appium_path, "appium"),
+            executable_index.resolve("node")
+        )
         
-        if code == 0 and "uiautomator2" in stdout:
-            self.write_log("Appium Android Driver (uiautomator2) is installed.", "green")
-            return "Appium Android Driver: ✅ Installed"
-        else:
-            self.write_log("Appium Android Driver (uiautomator2) not found!", "red")
-            return "Appium Android Driver: ❌ Not installed"
\ No newline at end of file
+    def desired_inputs(self):
+        return {"package": self.APPIUM_PACKAGE}
+    
+    def extension_inputs(self):
+        return {
+            "home": appium_home(),
+            "extensions": sorted(f"{extension.kind}:{extension.name}={extension.spec}" for extension in self.extensions),
+        }
+    
+    def extensions_fingerprint(self):
+        manifest = ExtensionManifest(appium_home())
+        return file_fingerprint(*(manifest.package_json(extension) for extension in self.extensions))
+    
+    def extension_details(self):
+        manifest = ExtensionManifest(appium_home())
+        return {repr(extension): manifest.installed_version(extension) for extension in self.extensions}
+        
+    def driver_fingerprint(self):
+        manifest = ExtensionManifest(appium_home())
+        return self.verify_fingerprint() + file_fingerprint(
+            os.path.join(manifest.home, "package.json"),
+            manifest.path,
+            *(manifest.package_json(extension) for extension in self.extensions)
+        )
+            
+    def verify_driver(self, timeout=None):
+        # Starting the CLI makes Appium sync its manifest with what npm put in
+        # APPIUM_HOME; the manifest then says which extensions it recognised.
+        stdout, stderr, code = self.run_command("appium driver list --installed", timeout=timeout)
+        
+        if code != 0:
+            return self.probe_failure("Appium Extensions", code, "Appium could not list its extensions!")
+        
+        manifest = ExtensionManifest(appium_home())
+        missing = [
+            extension for extension in self.extensions
+            if extension.name not in manifest.entries[extension.kind] or not manifest.satisfies(extension)
+        ]
+        if missing:
+            names = ", ".join(f"{extension.kind} {extension.name}" for extension in missing)
+            self.write_log(f"Appium extensions not installed: {names}", "red")
+            return ProbeResult("Appium Extensions", FAILED, f"Appium Extensions: ❌ Missing {names}")
+        names = ", ".join(extension.name for extension in self.extensions)
+        self.write_log(f"Appium extensions are installed: {names}", "green")
+        return ProbeResult("Appium Extensions", OK, f"Appium Extensions: ✅ {names}")
+    
+    def appium_command(self):
+        # APPIUM_INSTALLER_APPIUM replaces appium with any command line, e.g. "python bench/appium_stub.py".
+        override = os.environ.get("APPIUM_INSTALLER_APPIUM")
+        if override:
+            return shlex.split(override, posix=os.name != "nt")
+        return [executable_index.resolve("appium") or "appium"]
+    
+    def warm_up(self, port=DEFAULT_APPIUM_PORT, sessions=0, capabilities=None, keep_running=True):
+        """Start the Appium server, time it to ready and leave it running; returns a WarmupReport."""
+        server = AppiumServer(self.appium_command(), self.write_log, port=port)
+        stage = WarmupStage(server, self.write_log, self.cancel_event)
+        self.warmup_report = stage.run(capabilities, sessions, keep_running)
+        return self.warmup_report
@@ -0,0 +1,144 @@
+import os
+import queue
+import time
+
+DEFAULT_MAX_LINES = 5000
+DEFAULT_INTERVAL_MS = 50
+DEFAULT_BATCH_LIMIT = 20000
+
+def default_log_path():
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "appium-auto-installer", "logs", "installer.log")
+
+class RotatingLogFile:
+    """Append-only log file rotated by size, written one batch at a time."""
+
+    def __init__(self, path, max_bytes=5 * 1024 * 1024, backup_count=3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.file = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.file = open(path, "a", encoding="utf-8")
+        except OSError:
+            pass
+
+    def write_lines(self, lines):
+        if self.file is None or not lines:
+            return
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        self.file.write("".join(f"{stamp} {line}\n" for line in lines))
+        self.file.flush()
+        if self.file.tell() >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        self.file.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+        self.file = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+class LogPipeline:
+    """Thread-safe log sink for the Tk log widget.
+
+    Worker threads only put ``(message, color)`` tuples on a
+    ``queue.SimpleQueue``. The Tk thread drains it every ``interval_ms``
+    with a single multi-segment ``insert`` per batch, trims the widget to
+    ``max_lines`` and mirrors every line to a rotating log file.
+    """
+
+    def __init__(self, root, widget, max_lines=DEFAULT_MAX_LINES, interval_ms=DEFAULT_INTERVAL_MS,
+                 batch_limit=DEFAULT_BATCH_LIMIT, log_path=None):
+        self.root = root
+        self.widget = widget
+        self.max_lines = max_lines
+        self.interval_ms = interval_ms
+        self.batch_limit = batch_limit
+        self.queue = queue.SimpleQueue()
+        self.log_file = RotatingLogFile(log_path or default_log_path())
+        self._running = False
+
+    def write(self, message, color="black"):
+        self.queue.put((message, color))
+
+    def post(self, callback):
+        # Run a UI update (progress bar, labels) on the Tk thread in order with the log lines.
+        self.queue.put((callback, None))
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self.root.after(self.interval_ms, self._tick)
+
+    def stop(self):
+        self._running = False
+        self.log_file.close()
+
+    def _tick(self):
+        if not self._running:
+            return
+        self.drain()
+        self.root.after(self.interval_ms, self._tick)
+
+    def drain(self):
+        segments = []
+        file_lines = []
+        count = 0
+        while count < self.batch_limit:
+            try:
+                item, color = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            count += 1
+
+            if color is None:
+                self._flush(segments, file_lines)
+                segments, file_lines = [], []
+                item()
+                continue
+
+            file_lines.append(item)
+            # Merge consecutive lines of the same color into one segment.
+            if segments and segments[-1][1] == color:
+                segments[-1][0].append(item)
+            else:
+                segments.append(([item], color))
+
+        self._flush(segments, file_lines)
+        return count
+
+    def _flush(self, segments, file_lines):
+        self.log_file.write_lines(file_lines)
+        if not segments:
+            return
+        args = []
+        for lines, color in segments:
+            args.append("\n".join(lines) + "\n")
+            args.append(color)
+
+        self.widget.config(state="normal")
+        self.widget.insert("end", *args)
+        self._trim()
+        self.widget.see("end")
+        self.widget.config(state="disabled")
+
+    def _trim(self):
+        # "end-1c" sits on the empty line after the trailing newline.
+        lines = int(self.widget.index("end-1c").split(".")[0]) - 1
+        excess = lines - self.max_lines
+        if excess > 0:
+            self.widget.delete("1.0", f"{excess + 1}.0")
+
+    def clear(self):
+        self.widget.config(state="normal")
+        self.widget.delete("1.0", "end")
+        self.widget.config(state="disabled")
@@ -0,0 +1,159 @@
+import http.server
+import json
+import os
+import re
+import socket
+import threading
+
+from cmd.cache import download_cache
+
+SHA256_HEADER = "X-Artifact-SHA256"
+KEY_PATTERN = re.compile(r"^/(blobs|by-url)/([0-9a-f]{64})$")
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+class CacheIndexView:
+    """Read-only view of a DownloadCache index, reparsed only when the file changes."""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._index = {"urls": {}, "blobs": {}}
+
+    def _current(self):
+        try:
+            mtime = os.stat(self.cache.index_path).st_mtime_ns
+        except OSError:
+            return {"urls": {}, "blobs": {}}
+        with self._lock:
+            if mtime != self._mtime:
+                try:
+                    with open(self.cache.index_path, "r", encoding="utf-8") as f:
+                        self._index = json.load(f)
+                    self._mtime = mtime
+                except (OSError, ValueError):
+                    pass
+            return self._index
+
+    def resolve(self, kind, key):
+        index = self._current()
+        if kind == "by-url":
+            entry = index.get("urls", {}).get(key)
+            if entry is None:
+                return None
+            key = entry["sha256"]
+        if key not in index.get("blobs", {}):
+            return None
+        path = self.cache.blob_path(key)
+        return (path, key) if os.path.isfile(path) else None
+
+class MirrorHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "AppiumInstallerMirror/1"
+
+    def log_message(self, format, *args):
+        if self.server.write_log:
+            self.server.write_log(f"{self.address_string()} {format % args}", "black")
+
+    def _resolve(self):
+        match = KEY_PATTERN.match(self.path.split("?", 1)[0])
+        if not match:
+            return None
+        return self.server.index.resolve(match.group(1), match.group(2))
+
+    def _not_found(self):
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _range(self, size, etag):
+        header = self.headers.get("Range")
+        if not header:
+            return None
+        if_range = self.headers.get("If-Range")
+        if if_range and if_range != etag:
+            # The client's partial copy is of another file: send this one whole.
+            return None
+        match = RANGE_PATTERN.match(header.strip())
+        if not match or (not match.group(1) and not match.group(2)):
+            return False
+        if match.group(1):
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+        else:
+            # Suffix range: the last N bytes.
+            start = max(size - int(match.group(2)), 0)
+            end = size - 1
+        if start > end or start >= size:
+            return False
+        return start, end
+
+    def _serve(self, send_body):
+        resolved = self._resolve()
+        if resolved is None:
+            self._not_found()
+            return
+        path, sha256 = resolved
+        try:
+            f = open(path, "rb")
+        except OSError:
+            self._not_found()
+            return
+
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            etag = f'"{sha256}"'
+            byte_range = self._range(size, etag)
+            if byte_range is False:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            start, end = byte_range or (0, size - 1)
+            self.send_response(206 if byte_range else 200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(end - start + 1))
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", etag)
+            self.send_header(SHA256_HEADER, sha256)
+            if byte_range:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            self.end_headers()
+
+            if send_body and end >= start:
+                self.wfile.flush()
+                # socket.sendfile uses os.sendfile (zero-copy) where the platform has it.
+                self.connection.sendfile(f, start, end - start + 1)
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+class MirrorServer(http.server.ThreadingHTTPServer):
+    """Serves the local download cache to other installers on the LAN.
+
+    ``/by-url/<sha256 of the origin URL>`` and ``/blobs/<sha256 of content>``
+    return the cached file, with byte ranges, and the content hash in the
+    ``X-Artifact-SHA256`` header so clients can verify what they received.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, host="0.0.0.0", port=8765, cache=None, write_log=None):
+        super().__init__((host, port), MirrorHandler)
+        self.cache = cache or download_cache
+        self.index = CacheIndexView(self.cache)
+        self.write_log = write_log
+
+    @property
+    def url(self):
+        """What peers pass to --mirror: a wildcard bind is advertised by host name."""
+        host, port = self.server_address[:2]
+        if host in ("0.0.0.0", "::", ""):
+            host = socket.gethostname()
+        return f"http://{host}:{port}"
@@ -0,0 +1,102 @@
+import os
+import threading
+
+class ExecutableIndex:
+    """Index of the executables reachable through PATH.
+
+    PATH (and PATHEXT on Windows) is scanned once; later lookups are
+    dictionary hits. The index rebuilds itself whenever PATH or PATHEXT
+    differ from the values it was built from, and ``refresh()`` forces a
+    rescan after an install drops new files into a directory already on
+    PATH. Version strings are memoised per resolved executable until the
+    next refresh.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._signature = None
+        self._index = {}
+        self._versions = {}
+
+    def _current_signature(self):
+        return os.environ.get("PATH", ""), os.environ.get("PATHEXT", "")
+
+    def _extensions(self):
+        if os.name != "nt":
+            return None
+        pathext = os.environ.get("PATHEXT", ".COM;.EXE;.BAT;.CMD")
+        return [ext.lower() for ext in pathext.split(";") if ext]
+
+    def _scan(self):
+        index = {}
+        extensions = self._extensions()
+        for directory in os.environ.get("PATH", "").split(os.pathsep):
+            directory = directory.strip().strip('"')
+            if not directory:
+                continue
+            directory = os.path.normpath(directory)
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+                name = entry.name
+                if extensions is not None:
+                    name = name.lower()
+                    base, ext = os.path.splitext(name)
+                    if ext not in extensions:
+                        continue
+                    # "node" resolves to the first PATHEXT match, "node.exe" to itself.
+                    index.setdefault(name, entry.path)
+                    current = index.get(base)
+                    if current is None or (
+                        os.path.dirname(current) == directory
+                        and extensions.index(ext) < extensions.index(os.path.splitext(current)[1].lower())
+                    ):
+                        index[base] = entry.path
+                elif os.access(entry.path, os.X_OK):
+                    index.setdefault(name, entry.path)
+        return index
+
+    def refresh(self):
+        with self._lock:
+            self._signature = self._current_signature()
+            self._index = self._scan()
+            self._versions = {}
+
+    def _ensure_current(self):
+        if self._signature != self._current_signature():
+            self.refresh()
+
+    def resolve(self, name):
+        with self._lock:
+            self._ensure_current()
+            if os.name == "nt":
+                name = name.lower()
+            return self._index.get(name)
+
+    def exists(self, name):
+        return self.resolve(name) is not None
+
+    def version(self, name, run_command, args="--version"):
+        """Return ``<name> <args>`` output, running it at most once per refresh."""
+        path = self.resolve(name)
+        if path is None:
+            return None
+        key = (path, args)
+        with self._lock:
+            if key in self._versions:
+                return self._versions[key]
+
+        stdout, stderr, code = run_command(f'"{path}" {args}')
+        output = (stdout.strip() or stderr.strip()) if code == 0 else None
+        with self._lock:
+            self._versions[key] = output
+        return output
+
+executable_index = ExecutableIndex()
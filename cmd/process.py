@@ -0,0 +1,226 @@
+import collections
+import os
+import signal
+import subprocess
+import threading
+import time
+
+# Return codes used when a command does not exit on its own.
+COMMAND_TIMEOUT = 124
+COMMAND_CANCELLED = 130
+
+DEFAULT_TAIL_LINES = 500
+
+def new_process_group():
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+def kill_process_tree(process):
+    try:
+        if os.name == "nt":
+            subprocess.run(
+                ["taskkill", "/F", "/T", "/PID", str(process.pid)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except (OSError, ProcessLookupError):
+        pass
+    try:
+        process.kill()
+    except OSError:
+        pass
+
+class ChildCpuClock:
+    """CPU time (user + system seconds) of a command and everything it spawned.
+
+    On Windows the process is put in a job object, whose accounting covers
+    every process started inside it. Elsewhere the child is reaped with
+    ``os.wait4``, whose rusage includes the descendants it waited for.
+    """
+
+    def __init__(self, process):
+        self.process = process
+        self.cpu_seconds = None
+        self._job = None
+        if os.name == "nt":
+            self._job = _assign_job(process)
+
+    def wait(self, timeout=None):
+        if os.name == "nt" or not hasattr(os, "wait4"):
+            return self.process.wait(timeout=timeout)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        delay = 0.0005
+        while self.process.returncode is None:
+            try:
+                pid, status, rusage = os.wait4(self.process.pid, os.WNOHANG)
+            except ChildProcessError:
+                return self.process.wait(timeout=timeout)
+            if pid:
+                self.process.returncode = os.waitstatus_to_exitcode(status)
+                self.cpu_seconds = rusage.ru_utime + rusage.ru_stime
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                raise subprocess.TimeoutExpired(self.process.args, timeout)
+            delay = min(delay * 2, 0.05)
+            time.sleep(delay if deadline is None else max(min(delay, deadline - time.monotonic()), 0))
+        return self.process.returncode
+
+    def close(self):
+        if self._job is not None:
+            self.cpu_seconds = _job_cpu_seconds(self._job)
+            self._job = None
+        return self.cpu_seconds
+
+if os.name == "nt":
+    import ctypes
+    from ctypes import wintypes
+
+    class _JobAccounting(ctypes.Structure):
+        _fields_ = [
+            ("TotalUserTime", ctypes.c_int64),
+            ("TotalKernelTime", ctypes.c_int64),
+            ("ThisPeriodTotalUserTime", ctypes.c_int64),
+            ("ThisPeriodTotalKernelTime", ctypes.c_int64),
+            ("TotalPageFaultCount", wintypes.DWORD),
+            ("TotalProcesses", wintypes.DWORD),
+            ("ActiveProcesses", wintypes.DWORD),
+            ("TotalTerminatedProcesses", wintypes.DWORD),
+        ]
+
+    _JOB_BASIC_ACCOUNTING = 1
+
+    def _kernel32():
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        kernel32.CreateJobObjectW.restype = wintypes.HANDLE
+        kernel32.CreateJobObjectW.argtypes = (ctypes.c_void_p, wintypes.LPCWSTR)
+        kernel32.AssignProcessToJobObject.argtypes = (wintypes.HANDLE, wintypes.HANDLE)
+        kernel32.QueryInformationJobObject.argtypes = (
+            wintypes.HANDLE, ctypes.c_int, ctypes.c_void_p, wintypes.DWORD, ctypes.c_void_p
+        )
+        kernel32.CloseHandle.argtypes = (wintypes.HANDLE,)
+        return kernel32
+
+    def _assign_job(process):
+        # Children the shell starts before the assignment are not counted; in
+        # practice cmd.exe has not got that far yet.
+        try:
+            kernel32 = _kernel32()
+            job = kernel32.CreateJobObjectW(None, None)
+            if not job:
+                return None
+            if not kernel32.AssignProcessToJobObject(job, int(process._handle)):
+                kernel32.CloseHandle(job)
+                return None
+            return job
+        except (OSError, AttributeError):
+            return None
+
+    def _job_cpu_seconds(job):
+        kernel32 = _kernel32()
+        info = _JobAccounting()
+        try:
+            if not kernel32.QueryInformationJobObject(job, _JOB_BASIC_ACCOUNTING, ctypes.byref(info),
+                                                      ctypes.sizeof(info), None):
+                return None
+            # 100-nanosecond units.
+            return (info.TotalUserTime + info.TotalKernelTime) / 1e7
+        finally:
+            kernel32.CloseHandle(job)
+
+class CommandResult:
+    def __init__(self, stdout, stderr, returncode, timed_out=False, cancelled=False, cpu_seconds=None):
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = returncode
+        self.timed_out = timed_out
+        self.cancelled = cancelled
+        self.cpu_seconds = cpu_seconds
+
+class CommandRunner:
+    """Run a command while streaming its output line by line.
+
+    Only the last ``tail_lines`` lines of each stream are kept in memory.
+    The command is started in its own process group so that a timeout or
+    cancellation takes down everything it spawned, not just the shell.
+    """
+
+    def __init__(self, on_line=None, cancel_event=None, tail_lines=DEFAULT_TAIL_LINES, poll_interval=0.1):
+        self.on_line = on_line
+        self.cancel_event = cancel_event
+        self.tail_lines = tail_lines
+        self.poll_interval = poll_interval
+
+    def _pump(self, pipe, tail, stream_name, lock):
+        try:
+            for line in iter(pipe.readline, ""):
+                with lock:
+                    tail.append(line)
+                if self.on_line:
+                    self.on_line(line.rstrip("\r\n"), stream_name)
+        except (OSError, ValueError):
+            pass
+        finally:
+            pipe.close()
+
+    def run(self, cmd, shell=True, timeout=None, env=None, cwd=None):
+        process = subprocess.Popen(
+            cmd,
+            shell=shell,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            env=env,
+            cwd=cwd,
+            **new_process_group()
+        )
+
+        stdout_tail = collections.deque(maxlen=self.tail_lines)
+        stderr_tail = collections.deque(maxlen=self.tail_lines)
+        # A reader that outlives the join below may still append; the tails are copied under this lock.
+        tail_lock = threading.Lock()
+        readers = [
+            threading.Thread(target=self._pump, args=(process.stdout, stdout_tail, "stdout", tail_lock), daemon=True),
+            threading.Thread(target=self._pump, args=(process.stderr, stderr_tail, "stderr", tail_lock), daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+
+        clock = ChildCpuClock(process)
+        deadline = time.monotonic() + timeout if timeout else None
+        timed_out = cancelled = False
+        while True:
+            try:
+                clock.wait(timeout=self.poll_interval)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                cancelled = True
+            elif deadline is not None and time.monotonic() >= deadline:
+                timed_out = True
+            if timed_out or cancelled:
+                kill_process_tree(process)
+                clock.wait()
+                break
+
+        for reader in readers:
+            # A detached grandchild may still hold the pipe; don't wait on it forever.
+            reader.join(timeout=5)
+
+        with tail_lock:
+            stdout, stderr = list(stdout_tail), list(stderr_tail)
+        returncode = process.returncode
+        if timed_out:
+            returncode = COMMAND_TIMEOUT
+            stderr.append(f"Timed out after {timeout}s\n")
+        elif cancelled:
+            returncode = COMMAND_CANCELLED
+            stderr.append("Cancelled\n")
+
+        return CommandResult("".join(stdout), "".join(stderr), returncode, timed_out, cancelled, clock.close())
@@ -0,0 +1,224 @@
+import email.utils
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cmd.cache import url_key
+from cmd.tracing import tracer
+
+NODE = "node"
+JAVA = "java"
+
+NODE_DIST = "https://nodejs.org/dist"
+ADOPTIUM_API = "https://api.adoptium.net"
+# Release lists change a few times a week; within this window no request is made at all.
+DEFAULT_TTL = 6 * 60 * 60
+
+def default_metadata_dir():
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "appium-auto-installer", "metadata")
+
+class MetadataError(Exception):
+    pass
+
+class Release:
+    def __init__(self, component, version, url, sha256=None, source="metadata"):
+        self.component = component
+        self.version = version
+        self.url = url
+        self.sha256 = sha256
+        # "metadata", "pinned" (the fallback in the code) or "bundle".
+        self.source = source
+
+    def to_dict(self):
+        return dict(vars(self))
+
+class MetadataCache:
+    """HTTP responses kept on disk and revalidated with ETag / Last-Modified.
+
+    Within ``ttl`` seconds of the last check a cached body is returned
+    without a request; after that a conditional GET usually costs a 304.
+    If the origin cannot be reached, the last body is used however old.
+    """
+
+    def __init__(self, directory=None, ttl=DEFAULT_TTL):
+        self.directory = directory or default_metadata_dir()
+        self.ttl = ttl
+        self.requests = {"fresh": 0, "revalidated": 0, "downloaded": 0, "stale": 0}
+        self._lock = threading.Lock()
+
+    def _paths(self, url):
+        key = url_key(url)
+        return os.path.join(self.directory, f"{key}.json"), os.path.join(self.directory, f"{key}.body")
+
+    def _load(self, url):
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                return meta, f.read()
+        except (OSError, ValueError):
+            return None, None
+
+    def _store(self, url, meta, body=None):
+        os.makedirs(self.directory, exist_ok=True)
+        meta_path, body_path = self._paths(url)
+        if body is not None:
+            with open(body_path + ".tmp", "wb") as f:
+                f.write(body)
+            os.replace(body_path + ".tmp", body_path)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def _count(self, outcome):
+        with self._lock:
+            self.requests[outcome] += 1
+
+    def get(self, url, ttl=None):
+        """Return the body of ``url``; ``ttl=0`` always revalidates, ``ttl=-1`` never does."""
+        from cmd.downloader import get_downloader
+        from urllib3.exceptions import HTTPError
+
+        ttl = self.ttl if ttl is None else ttl
+        meta, body = self._load(url)
+        if meta is not None and (ttl < 0 or time.time() - meta["checked"] < ttl):
+            self._count("fresh")
+            return body
+
+        headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        with tracer.span(url.rsplit("/", 1)[-1][:60], "metadata", url=url) as span:
+            try:
+                response = get_downloader().pool.request("GET", url, headers=headers, retries=2, timeout=15.0)
+            except (HTTPError, OSError) as e:
+                if body is None:
+                    raise MetadataError(f"could not fetch {url}: {str(e)}")
+                span.set(outcome="stale", error=str(e))
+                self._count("stale")
+                return body
+            span.set(status=response.status)
+
+        if response.status == 304 and meta is not None:
+            meta["checked"] = time.time()
+            self._store(url, meta)
+            self._count("revalidated")
+            return body
+        if response.status != 200:
+            if body is not None:
+                self._count("stale")
+                return body
+            raise MetadataError(f"HTTP {response.status} for {url}")
+        self._store(url, {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified") or email.utils.formatdate(usegmt=True),
+            "checked": time.time(),
+        }, response.data)
+        self._count("downloaded")
+        return response.data
+
+    def get_json(self, url, ttl=None):
+        try:
+            return json.loads(self.get(url, ttl).decode("utf-8"))
+        except ValueError as e:
+            raise MetadataError(f"{url} is not valid JSON: {str(e)}")
+
+class ReleaseResolver:
+    """Newest matching Node.js and Temurin JDK releases, with their published SHA-256.
+
+    Node.js comes from ``<dist>/index.json`` and the release's
+    SHASUMS256.txt, the JDK from Adoptium's ``assets/latest`` API. The
+    origins can be pointed elsewhere with APPIUM_INSTALLER_NODE_DIST and
+    APPIUM_INSTALLER_ADOPTIUM_API. Answers are kept per (component, line,
+    arch) for the life of the process.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache or MetadataCache()
+        self._results = {}
+        self._lock = threading.Lock()
+        self._pending = {}
+        # Why each unresolved key failed, for the log.
+        self.errors = {}
+
+    @property
+    def node_dist(self):
+        return os.environ.get("APPIUM_INSTALLER_NODE_DIST", NODE_DIST).rstrip("/")
+
+    @property
+    def adoptium_api(self):
+        return os.environ.get("APPIUM_INSTALLER_ADOPTIUM_API", ADOPTIUM_API).rstrip("/")
+
+    def resolve_node(self, line, arch):
+        releases = self.cache.get_json(f"{self.node_dist}/index.json")
+        # index.json is newest first; "files" lists the packages built for each release.
+        for release in releases:
+            version = release["version"].lstrip("v")
+            if version.split(".")[0] == str(line) and f"win-{arch}-msi" in release.get("files", []):
+                break
+        else:
+            raise MetadataError(f"no Node.js {line}.x release with a win-{arch} MSI")
+        filename = f"node-v{version}-{arch}.msi"
+        base = f"{self.node_dist}/v{version}"
+        # A published release's checksums never change.
+        shasums = self.cache.get(f"{base}/SHASUMS256.txt", ttl=-1).decode("utf-8", "replace")
+        sha256 = next((entry.split()[0] for entry in shasums.splitlines() if entry.split()[1:] == [filename]), None)
+        if sha256 is None:
+            raise MetadataError(f"{filename} is missing from SHASUMS256.txt")
+        return Release(NODE, version, f"{base}/{filename}", sha256)
+
+    def resolve_java(self, feature, arch):
+        api_arch = {"x86": "x32"}.get(arch, arch)
+        url = (f"{self.adoptium_api}/v3/assets/latest/{feature}/hotspot"
+               f"?architecture={api_arch}&image_type=jdk&os=windows&vendor=eclipse")
+        for asset in self.cache.get_json(url):
+            installer = (asset.get("binary") or {}).get("installer")
+            if installer and installer.get("link"):
+                version = (asset.get("version") or {}).get("semver") or asset["release_name"].replace("jdk-", "")
+                return Release(JAVA, version, installer["link"], installer.get("checksum"))
+        raise MetadataError(f"no Temurin {feature} MSI for windows/{arch}")
+
+    def resolve(self, component, line, arch):
+        """Return the Release, or None when the metadata is unavailable (errors are logged by callers)."""
+        key = (component, str(line), arch)
+        with self._lock:
+            if key in self._results:
+                return self._results[key]
+            event = self._pending.get(key)
+            owner = event is None
+            if owner:
+                event = self._pending[key] = threading.Event()
+        if not owner:
+            # Someone else is already asking; wait for their answer instead of asking twice.
+            event.wait()
+            return self._results.get(key)
+
+        resolve = self.resolve_node if component == NODE else self.resolve_java
+        result = None
+        try:
+            result = resolve(line, arch)
+        except Exception as e:
+            # Whatever went wrong (bad metadata, a cache that can't be written), fall back to the pinned release.
+            self.errors[key] = str(e)
+        finally:
+            # Waiters must always be released, with None when there is no answer.
+            with self._lock:
+                self._results[key] = result
+                del self._pending[key]
+            event.set()
+        return result
+
+    def resolve_all(self, requests):
+        """Resolve every (component, line, arch) at the same time; returns them in order."""
+        with ThreadPoolExecutor(max_workers=max(1, len(requests)), thread_name_prefix="releases") as pool:
+            return list(pool.map(lambda request: self.resolve(*request), requests))
+
+release_resolver = ReleaseResolver()
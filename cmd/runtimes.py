@@ -0,0 +1,305 @@
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+JAVA = "java"
+NODE = "node"
+
+DEFAULT_MAX_WORKERS = 8
+CACHE_FORMAT = 1
+VERSION_DIR = re.compile(r"^v?(\d+\.\d+\.\d+)$")
+NODE_VERSION_DEFINE = re.compile(r"#define\s+NODE_(MAJOR|MINOR|PATCH)_VERSION\s+(\d+)")
+
+def default_runtime_cache_path():
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "appium-auto-installer", "runtimes.json")
+
+def version_tuple(version):
+    """``"17.0.10+7"`` -> (17, 0, 10); Java 8's ``"1.8.0_392"`` -> (8, 0, 392)."""
+    numbers = [int(part) for part in re.findall(r"\d+", version or "")[:4]]
+    if numbers[:1] == [1] and len(numbers) > 1:
+        numbers = numbers[1:]
+    return tuple(numbers[:3])
+
+def _executable(directory, name):
+    return os.path.join(directory, f"{name}.exe" if os.name == "nt" else name)
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def _env_path(name, *parts):
+    value = os.environ.get(name)
+    return os.path.join(value.strip().strip('"'), *parts) if value and value.strip() else None
+
+def _program_files():
+    seen = []
+    for name in ("ProgramFiles", "ProgramW6432", "ProgramFiles(x86)"):
+        value = os.environ.get(name)
+        if value and os.path.normcase(value) not in map(os.path.normcase, seen):
+            seen.append(value)
+    return seen
+
+def java_locations():
+    """(path, source, has_children) for every place a JDK or JRE usually lives."""
+    home = os.path.expanduser("~")
+    homes = [(_env_path(name), name) for name in ("JAVA_HOME", "JDK_HOME", "JRE_HOME")]
+    roots = [(os.path.join(home, ".jdks"), "IntelliJ"), (os.path.join(home, "scoop", "apps"), "Scoop")]
+    for program_files in _program_files():
+        for vendor in ("Eclipse Adoptium", "Java", "Zulu", "Microsoft", "Amazon Corretto", "BellSoft", "Semeru",
+                       "OpenJDK", "AdoptOpenJDK"):
+            roots.append((os.path.join(program_files, vendor), vendor))
+        # Android Studio ships its own runtime: jbr since Electric Eel, jre before.
+        homes.append((os.path.join(program_files, "Android", "Android Studio", "jbr"), "Android Studio"))
+        homes.append((os.path.join(program_files, "Android", "Android Studio", "jre"), "Android Studio"))
+    homes.append((_env_path("LOCALAPPDATA", "Programs", "Android Studio", "jbr"), "Android Studio"))
+    if os.name != "nt":
+        roots += [("/usr/lib/jvm", "system"), ("/Library/Java/JavaVirtualMachines", "system"),
+                  (os.path.join(home, ".sdkman", "candidates", "java"), "SDKMAN")]
+    return [(path, source, False) for path, source in homes if path] + [(path, source, True) for path, source in roots]
+
+def node_locations():
+    home = os.path.expanduser("~")
+    homes = [(_env_path("NVM_SYMLINK"), "NVM_SYMLINK")]
+    roots = [
+        (_env_path("NVM_HOME"), "nvm"),
+        (_env_path("APPDATA", "nvm"), "nvm"),
+        (_env_path("NVM_DIR", "versions", "node") or os.path.join(home, ".nvm", "versions", "node"), "nvm"),
+        (_env_path("FNM_DIR", "node-versions") or _env_path("APPDATA", "fnm", "node-versions"), "fnm"),
+        (_env_path("VOLTA_HOME", "tools", "image", "node") or _env_path("LOCALAPPDATA", "Volta", "tools", "image", "node"), "Volta"),
+        (os.path.join(home, "scoop", "apps"), "Scoop"),
+    ]
+    for program_files in _program_files():
+        homes.append((os.path.join(program_files, "nodejs"), "Program Files"))
+    if os.name != "nt":
+        homes.append(("/usr/local", "system"))
+    return [(path, source, False) for path, source in homes if path] + [(path, source, True) for path, source in roots if path]
+
+class Runtime:
+    def __init__(self, kind, home, version, source, vendor=None, is_jdk=None, npm_version=None, marker=None):
+        self.kind = kind
+        self.home = home
+        self.version = version
+        self.source = source
+        self.vendor = vendor
+        self.is_jdk = is_jdk
+        self.npm_version = npm_version
+        # The file whose mtime says whether this runtime changed in place.
+        self.marker = marker
+
+    @property
+    def bin_dir(self):
+        if self.kind == NODE and os.name == "nt":
+            return self.home
+        return os.path.join(self.home, "bin")
+
+    @property
+    def executable(self):
+        return _executable(self.bin_dir, self.kind)
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def describe(self):
+        name = self.vendor or self.source
+        return f"{name} {self.kind} {self.version} at {self.home}"
+
+def read_java_release(home):
+    """Parse ``<home>/release`` (KEY="value" lines); {} when there is none."""
+    values = {}
+    try:
+        with open(os.path.join(home, "release"), "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                key, sep, value = line.partition("=")
+                if sep:
+                    values[key.strip()] = value.strip().strip('"')
+    except OSError:
+        pass
+    return values
+
+def inspect_java(home, source):
+    release = read_java_release(home)
+    if not release.get("JAVA_VERSION") or not os.path.isfile(_executable(os.path.join(home, "bin"), "java")):
+        return None
+    return Runtime(JAVA, home, release["JAVA_VERSION"], source,
+                   vendor=release.get("IMPLEMENTOR"),
+                   is_jdk=os.path.isfile(_executable(os.path.join(home, "bin"), "javac")),
+                   marker=os.path.join(home, "release"))
+
+def _windows_file_version(path):
+    # The version resource node.exe carries, read without starting it.
+    import ctypes
+
+    version = ctypes.WinDLL("version")
+    size = version.GetFileVersionInfoSizeW(path, None)
+    if not size:
+        return None
+    buffer = ctypes.create_string_buffer(size)
+    if not version.GetFileVersionInfoW(path, 0, size, buffer):
+        return None
+    info = ctypes.c_void_p()
+    length = ctypes.c_uint()
+    if not version.VerQueryValueW(buffer, "\\", ctypes.byref(info), ctypes.byref(length)):
+        return None
+    # VS_FIXEDFILEINFO: dwFileVersionMS and dwFileVersionLS follow the signature, version and flags.
+    words = (ctypes.c_uint32 * 4).from_address(info.value)
+    major_minor, patch_build = words[2], words[3]
+    return f"{major_minor >> 16}.{major_minor & 0xFFFF}.{patch_build >> 16}"
+
+def _node_version(home, executable):
+    for directory in (home, os.path.dirname(home)):
+        match = VERSION_DIR.match(os.path.basename(directory))
+        if match:
+            return match.group(1)
+    try:
+        with open(os.path.join(home, "include", "node", "node_version.h"), "r", encoding="utf-8") as f:
+            parts = dict(NODE_VERSION_DEFINE.findall(f.read()))
+        return f"{parts['MAJOR']}.{parts['MINOR']}.{parts['PATCH']}"
+    except (OSError, KeyError):
+        pass
+    if os.name == "nt":
+        try:
+            return _windows_file_version(executable)
+        except (OSError, AttributeError):
+            return None
+    return None
+
+def inspect_node(home, source):
+    runtime = Runtime(NODE, home, None, source)
+    if not os.path.isfile(runtime.executable):
+        return None
+    runtime.version = _node_version(home, runtime.executable)
+    if runtime.version is None:
+        return None
+    runtime.marker = runtime.executable
+    for npm_dir in (os.path.join(home, "node_modules", "npm"), os.path.join(home, "lib", "node_modules", "npm")):
+        try:
+            with open(os.path.join(npm_dir, "package.json"), "r", encoding="utf-8") as f:
+                runtime.npm_version = json.load(f).get("version")
+            break
+        except (OSError, ValueError):
+            continue
+    return runtime
+
+INSPECTORS = {JAVA: inspect_java, NODE: inspect_node}
+LOCATIONS = {JAVA: java_locations, NODE: node_locations}
+# Layouts below a version directory: Scoop's "current", fnm's "installation", macOS bundles.
+NESTED_HOMES = ("current", "installation", os.path.join("Contents", "Home"))
+
+class RuntimeDiscovery:
+    """Find JDKs and Node.js installs that are not on PATH, without running them.
+
+    Every well-known install root and ``*_HOME`` variable is scanned at the
+    same time; versions come from the ``release`` file, version-named
+    directories, ``node_version.h`` or the executable's version resource.
+    What each location held is cached with its directory mtime, and a
+    location is only listed again when that (or a runtime's own marker
+    file) has changed.
+    """
+
+    def __init__(self, cache_path=None, max_workers=DEFAULT_MAX_WORKERS):
+        self.cache_path = cache_path or default_runtime_cache_path()
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+            if cache.get("format") == CACHE_FORMAT:
+                return cache
+        except (OSError, ValueError):
+            pass
+        return {"format": CACHE_FORMAT, "locations": {}}
+
+    def _save_cache(self, cache):
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=1)
+        os.replace(tmp_path, self.cache_path)
+
+    def _scan_location(self, kind, path, source, has_children):
+        inspect = INSPECTORS[kind]
+        if not has_children:
+            candidates = [path]
+        else:
+            try:
+                candidates = [entry.path for entry in os.scandir(path) if entry.is_dir()]
+            except OSError:
+                return []
+        runtimes = []
+        for candidate in candidates:
+            for home in (candidate, *(os.path.join(candidate, nested) for nested in NESTED_HOMES)):
+                runtime = inspect(home, source)
+                if runtime is not None:
+                    runtimes.append(runtime)
+                    break
+        return runtimes
+
+    def _cached(self, entry, mtime_ns):
+        if entry is None or entry["mtime_ns"] != mtime_ns:
+            return None
+        runtimes = [Runtime.from_dict(data) for data in entry["runtimes"]]
+        if any(_mtime_ns(runtime.marker) != marker_mtime
+               for runtime, marker_mtime in zip(runtimes, entry["marker_mtimes"])):
+            return None
+        return runtimes
+
+    def scan(self, kind):
+        """Every runtime of ``kind`` found, deduplicated by home directory."""
+        locations = LOCATIONS[kind]()
+        with self._lock:
+            cache = self._load_cache()
+            stored = cache["locations"]
+
+            def scan_one(location):
+                path, source, has_children = location
+                key = f"{kind}|{os.path.normcase(os.path.abspath(path))}"
+                mtime_ns = _mtime_ns(path)
+                if mtime_ns is None:
+                    stored.pop(key, None)
+                    return []
+                runtimes = self._cached(stored.get(key), mtime_ns)
+                if runtimes is None:
+                    runtimes = self._scan_location(kind, path, source, has_children)
+                    stored[key] = {
+                        "mtime_ns": mtime_ns,
+                        "runtimes": [runtime.to_dict() for runtime in runtimes],
+                        "marker_mtimes": [_mtime_ns(runtime.marker) for runtime in runtimes],
+                    }
+                return runtimes
+
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="runtime-scan") as pool:
+                found = [runtime for runtimes in pool.map(scan_one, locations) for runtime in runtimes]
+            try:
+                self._save_cache(cache)
+            except OSError:
+                pass
+
+        unique = {}
+        for runtime in found:
+            unique.setdefault(os.path.normcase(os.path.realpath(runtime.home)), runtime)
+        return list(unique.values())
+
+    def best(self, kind, minimum, preferred_major=None):
+        """The runtime to wire up: the preferred major version if there is one,
+        then JDKs before JREs, then the newest. None if nothing is new enough."""
+        compatible = [runtime for runtime in self.scan(kind) if version_tuple(runtime.version) >= tuple(minimum)]
+        if not compatible:
+            return None
+        return max(compatible, key=lambda runtime: (
+            version_tuple(runtime.version)[:1] == (preferred_major,),
+            runtime.is_jdk is not False,
+            version_tuple(runtime.version),
+        ))
+
+runtime_discovery = RuntimeDiscovery()
@@ -0,0 +1,150 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from cmd.tracing import tracer
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+class Step:
+    def __init__(self, name, label, action, requires=(), branch=None):
+        self.name = name
+        self.label = label
+        self.action = action
+        self.requires = tuple(requires)
+        self.branch = branch or name
+
+class InstallScheduler:
+    def __init__(self, steps, log_function, progress_function=None, max_workers=3, cancel_event=None,
+                 start_function=None):
+        self.steps = {}
+        for step in steps:
+            if step.name in self.steps:
+                raise ValueError(f"Duplicate step: {step.name}")
+            self.steps[step.name] = step
+        for step in steps:
+            for dep in step.requires:
+                if dep not in self.steps:
+                    raise ValueError(f"Step {step.name} requires unknown step {dep}")
+        self._check_cycles()
+
+        self.write_log = log_function
+        self.update_progress = progress_function
+        self.step_started = start_function
+        self.max_workers = max_workers
+        self.cancel_event = cancel_event
+        self.status = {name: PENDING for name in self.steps}
+        self.errors = {}
+        self._lock = threading.Lock()
+        self._finished = 0
+
+    def _check_cycles(self):
+        visiting, visited = set(), set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle at step {name}")
+            visiting.add(name)
+            for dep in self.steps[name].requires:
+                visit(dep)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.steps:
+            visit(name)
+
+    def _ready(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            return []
+        ready = []
+        for name, step in self.steps.items():
+            if self.status[name] != PENDING:
+                continue
+            if all(self.status[dep] == DONE for dep in step.requires):
+                ready.append(step)
+        return ready
+
+    def _skip_blocked(self):
+        # Anything depending (directly or not) on a failed step will never run.
+        changed = True
+        while changed:
+            changed = False
+            for name, step in self.steps.items():
+                if self.status[name] != PENDING:
+                    continue
+                if any(self.status[dep] in (FAILED, SKIPPED) for dep in step.requires):
+                    self.status[name] = SKIPPED
+                    self._report(step, SKIPPED)
+                    changed = True
+
+    def _report(self, step, status):
+        with self._lock:
+            self._finished += 1
+            finished = self._finished
+        if self.update_progress:
+            self.update_progress(finished, len(self.steps), step.label, status)
+
+    def _run_step(self, step):
+        with tracer.span(step.label, "step", step=step.name, branch=step.branch) as span:
+            try:
+                succeeded = bool(step.action())
+            except Exception as e:
+                self.errors[step.name] = str(e)
+                self.write_log(f"Error in step '{step.label}': {str(e)}", "red")
+                succeeded = False
+            span.set(status=DONE if succeeded else FAILED)
+            return succeeded
+
+    def run(self):
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="install") as pool:
+            while True:
+                for step in self._ready():
+                    self.status[step.name] = RUNNING
+                    if self.step_started:
+                        self.step_started(step)
+                    running[pool.submit(self._run_step, step)] = step
+
+                if not running:
+                    break
+
+                completed, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    step = running.pop(future)
+                    status = DONE if future.result() else FAILED
+                    self.status[step.name] = status
+                    self._report(step, status)
+                self._skip_blocked()
+
+        for name, step in self.steps.items():
+            if self.status[name] == PENDING:
+                self.status[name] = SKIPPED
+                self._report(step, SKIPPED)
+        return self.succeeded()
+
+    def succeeded(self):
+        return all(status == DONE for status in self.status.values())
+
+    def branch_results(self):
+        branches = {}
+        for name, step in self.steps.items():
+            branches.setdefault(step.branch, []).append((step, self.status[name]))
+        return branches
+
+    def report_branches(self):
+        for branch, results in self.branch_results().items():
+            failed = [step.label for step, status in results if status == FAILED]
+            skipped = [step.label for step, status in results if status == SKIPPED]
+
+            if not failed and not skipped:
+                self.write_log(f"{branch}: ✅ Completed", "green")
+                continue
+
+            self.write_log(f"{branch}: ❌ Failed at {', '.join(failed) or 'unknown step'}", "red")
+            if skipped:
+                self.write_log(f"    Skipped: {', '.join(skipped)}", "yellow")
@@ -0,0 +1,185 @@
+import json
+import os
+import threading
+import time
+
+from cmd.scheduler import Step
+from cmd.tracing import tracer
+
+FORMAT_VERSION = 1
+
+RUN = "run"
+UP_TO_DATE = "up-to-date"
+
+def default_state_path():
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "appium-auto-installer", "state.json")
+
+class StateFile:
+    """What each install step last applied: its inputs, the files it left, and when."""
+
+    def __init__(self, path=None):
+        self.path = path or default_state_path()
+        self._lock = threading.Lock()
+        self._steps = None
+
+    def _load(self):
+        if self._steps is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self._steps = data.get("steps", {}) if data.get("format") == FORMAT_VERSION else {}
+            except (OSError, ValueError):
+                self._steps = {}
+        return self._steps
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"format": FORMAT_VERSION, "steps": self._steps}, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def get(self, name):
+        with self._lock:
+            return self._load().get(name)
+
+    def put(self, name, entry):
+        with self._lock:
+            self._load()[name] = entry
+            self._save()
+
+    def remove(self, name):
+        with self._lock:
+            if self._load().pop(name, None) is not None:
+                self._save()
+
+    def entries(self):
+        with self._lock:
+            return dict(self._load())
+
+class DesiredState:
+    """Desired state of one install step.
+
+    ``inputs`` returns what the step is asked to install (versions, URLs,
+    target directories); ``actual`` returns a cheap snapshot of what is on
+    the machine, normally a ``file_fingerprint``. Neither may touch the
+    network or start a process. A step whose inputs and snapshot both
+    match the state file, and whose record is younger than ``max_age``,
+    does not run.
+
+    ``satisfied_by`` returns what stood in for the inputs when the step
+    skipped its install (a runtime that was already there, with its own
+    version), or None when the inputs themselves were applied.
+
+    ``keeps_recorded`` is called with the recorded inputs when they differ
+    from ``inputs``; returning True means ``inputs`` are only a fallback
+    (say, a pinned release because upstream metadata was unreachable) and
+    the recorded ones still stand.
+    """
+
+    def __init__(self, inputs, actual, max_age=None, details=None, satisfied_by=None, keeps_recorded=None):
+        self.inputs = inputs
+        self.actual = actual
+        self.max_age = max_age
+        self.details = details
+        self.satisfied_by = satisfied_by
+        self.keeps_recorded = keeps_recorded
+
+def _json_round_trip(value):
+    # Compare in the form the state file stores (tuples become lists, and so on).
+    return json.loads(json.dumps(value, default=str))
+
+class Reconciler:
+    def __init__(self, desired, log_function, state=None, force=False):
+        self.desired = desired
+        self.write_log = log_function
+        self.state = state or StateFile()
+        self.force = force
+
+    def check(self, name):
+        """Return why step ``name`` has to run, or None when it is up to date."""
+        spec = self.desired.get(name)
+        if spec is None:
+            return "not tracked"
+        if self.force:
+            return "forced"
+        entry = self.state.get(name)
+        if entry is None:
+            return "never applied"
+        if entry["inputs"] != _json_round_trip(spec.inputs()) and not (
+                spec.keeps_recorded and spec.keeps_recorded(entry["inputs"])):
+            if entry.get("satisfied_by"):
+                return f"inputs changed (was satisfied by existing {entry['satisfied_by'].get('version')})"
+            return "inputs changed"
+        if entry["actual"] != _json_round_trip(spec.actual()):
+            return "installed files changed"
+        if spec.max_age is not None and time.time() - entry["applied"] > spec.max_age:
+            return "due for refresh"
+        return None
+
+    def plan(self, steps):
+        plan = []
+        for step in steps:
+            reason = self.check(step.name)
+            entry = {
+                "step": step.name,
+                "label": step.label,
+                "action": RUN if reason else UP_TO_DATE,
+                "reason": reason,
+            }
+            recorded = self.state.get(step.name)
+            if recorded and recorded.get("satisfied_by"):
+                entry["satisfied_by"] = recorded["satisfied_by"]
+            plan.append(entry)
+        return plan
+
+    def log_plan(self, plan):
+        pending = [entry for entry in plan if entry["action"] == RUN]
+        if not pending:
+            self.write_log("Everything is up to date; nothing to install.", "green")
+            return
+        self.write_log(f"Plan: {len(pending)} of {len(plan)} steps need to run.", "darkblue")
+        for entry in pending:
+            self.write_log(f"    {entry['label']}: {entry['reason']}", "black")
+
+    def _record(self, name):
+        spec = self.desired[name]
+        entry = {
+            "inputs": _json_round_trip(spec.inputs()),
+            "actual": _json_round_trip(spec.actual()),
+            "applied": time.time(),
+        }
+        if spec.details is not None:
+            entry["details"] = _json_round_trip(spec.details())
+        satisfied_by = spec.satisfied_by() if spec.satisfied_by is not None else None
+        if satisfied_by:
+            # The inputs were not installed; record the version that is actually in use.
+            entry["satisfied_by"] = _json_round_trip(satisfied_by)
+        self.state.put(name, entry)
+
+    def wrap(self, step):
+        # Checked again when the step starts rather than trusting the plan: an
+        # earlier step may have changed what this one depends on.
+        def run():
+            reason = self.check(step.name)
+            # What actually happened, next to the plan's action, for the step history.
+            span = tracer.current("step")
+            if reason is None:
+                if span is not None:
+                    span.set(observed=UP_TO_DATE)
+                self.write_log(f"{step.label}: up to date", "green")
+                return True
+            if span is not None:
+                span.set(observed=RUN)
+            succeeded = step.action()
+            if step.name in self.desired:
+                if succeeded:
+                    self._record(step.name)
+                else:
+                    self.state.remove(step.name)
+            return succeeded
+        return Step(step.name, step.label, run, step.requires, step.branch)
+
+    def wrap_all(self, steps):
+        return [self.wrap(step) for step in steps]
@@ -0,0 +1,174 @@
+import contextlib
+import itertools
+import json
+import os
+import platform
+import socket
+import threading
+import time
+
+MAX_KEPT_RUNS = 20
+
+def default_trace_dir():
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "appium-auto-installer", "traces")
+
+class Span:
+    __slots__ = ("id", "parent", "name", "category", "attrs", "thread", "thread_id", "start_ns", "duration_ns")
+
+    def __init__(self, span_id, parent, name, category, attrs):
+        self.id = span_id
+        self.parent = parent
+        self.name = name
+        self.category = category
+        self.attrs = attrs
+        current = threading.current_thread()
+        self.thread = current.name
+        self.thread_id = current.ident
+        self.start_ns = None
+        self.duration_ns = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+class Tracer:
+    """Collects timed spans from every thread of an install or verify run.
+
+    Spans nest per thread: one opened while another is active on the same
+    thread becomes its child. A run is exported both as a JSON summary and
+    in the Chrome trace-event format (chrome://tracing, Perfetto).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+        self.reset()
+
+    def reset(self, name="run"):
+        with self._lock:
+            self.name = name
+            self.spans = []
+            self.started = time.time()
+            self.epoch_ns = time.perf_counter_ns()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextlib.contextmanager
+    def span(self, name, category="step", **attrs):
+        stack = self._stack()
+        span = Span(next(self._ids), stack[-1].id if stack else None, name, category, attrs)
+        stack.append(span)
+        span.start_ns = time.perf_counter_ns()
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs.setdefault("error", f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            span.duration_ns = time.perf_counter_ns() - span.start_ns
+            stack.pop()
+            with self._lock:
+                self.spans.append(span)
+
+    def current(self, category=None):
+        """The innermost span open on this thread, optionally of one category."""
+        for span in reversed(self._stack()):
+            if category is None or span.category == category:
+                return span
+        return None
+
+    def _finished_spans(self):
+        with self._lock:
+            return sorted(self.spans, key=lambda span: span.start_ns), self.epoch_ns
+
+    def summary(self):
+        spans, epoch_ns = self._finished_spans()
+        totals = {}
+        for span in spans:
+            total = totals.setdefault(span.category, {"count": 0, "wall_s": 0.0, "bytes": 0, "cpu_s": 0.0})
+            total["count"] += 1
+            total["wall_s"] += span.duration_ns / 1e9
+            total["bytes"] += span.attrs.get("bytes") or 0
+            total["cpu_s"] += span.attrs.get("cpu_s") or 0.0
+        for total in totals.values():
+            total["wall_s"] = round(total["wall_s"], 3)
+            total["cpu_s"] = round(total["cpu_s"], 3)
+
+        end_ns = max((span.start_ns + span.duration_ns for span in spans), default=epoch_ns)
+        return {
+            "name": self.name,
+            "host": socket.gethostname(),
+            "platform": platform.platform(),
+            "started": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.started)),
+            "wall_s": round((end_ns - epoch_ns) / 1e9, 3),
+            "totals": totals,
+            "spans": [
+                {
+                    "id": span.id,
+                    "parent": span.parent,
+                    "name": span.name,
+                    "category": span.category,
+                    "thread": span.thread,
+                    "start_ms": round((span.start_ns - epoch_ns) / 1e6, 3),
+                    "duration_ms": round(span.duration_ns / 1e6, 3),
+                    "attrs": span.attrs,
+                }
+                for span in spans
+            ],
+        }
+
+    def chrome_trace(self):
+        spans, epoch_ns = self._finished_spans()
+        pid = os.getpid()
+        events = [{"ph": "M", "name": "process_name", "pid": pid, "tid": 0,
+                   "args": {"name": f"{self.name} on {socket.gethostname()}"}}]
+        threads = {}
+        for span in spans:
+            threads.setdefault(span.thread_id, span.thread)
+            events.append({
+                "ph": "X",
+                "name": span.name,
+                "cat": span.category,
+                "pid": pid,
+                "tid": span.thread_id,
+                "ts": (span.start_ns - epoch_ns) / 1000,
+                "dur": span.duration_ns / 1000,
+                "args": span.attrs,
+            })
+        for thread_id, thread_name in threads.items():
+            events.append({"ph": "M", "name": "thread_name", "pid": pid, "tid": thread_id, "args": {"name": thread_name}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, directory=None):
+        """Write ``<stamp>-<name>.summary.json`` and ``.trace.json``; return both paths."""
+        directory = directory or default_trace_dir()
+        os.makedirs(directory, exist_ok=True)
+        stem = os.path.join(directory, time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started)) + f"-{self.name}")
+        paths = []
+        for suffix, payload in ((".summary.json", self.summary()), (".trace.json", self.chrome_trace())):
+            path = stem + suffix
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, indent=1, default=str)
+            paths.append(path)
+        prune_traces(directory)
+        return tuple(paths)
+
+def prune_traces(directory, keep=MAX_KEPT_RUNS):
+    try:
+        names = sorted(name for name in os.listdir(directory) if name.endswith(".summary.json"))
+    except OSError:
+        return
+    for name in names[:-keep]:
+        stem = name[:-len(".summary.json")]
+        for suffix in (".summary.json", ".trace.json"):
+            try:
+                os.remove(os.path.join(directory, stem + suffix))
+            except OSError:
+                pass
+
+tracer = Tracer()
@@ -0,0 +1,147 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cmd.tracing import tracer
+
+OK = "ok"
+FAILED = "failed"
+TIMEOUT = "timeout"
+ERROR = "error"
+
+class ProbeResult:
+    def __init__(self, name, status, summary, version=None, elapsed_ms=None, cached=False):
+        self.name = name
+        self.status = status
+        self.summary = summary
+        self.version = version
+        self.elapsed_ms = elapsed_ms
+        self.cached = cached
+
+    @property
+    def ok(self):
+        return self.status == OK
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "status": self.status,
+            "version": self.version,
+            "elapsed_ms": self.elapsed_ms,
+            "summary": self.summary,
+            "cached": self.cached,
+        }
+
+def file_fingerprint(*paths):
+    """Identity of the files a probe depends on: path, size and mtime of each."""
+    fingerprint = []
+    for path in paths:
+        if not path:
+            fingerprint.append([None, None, None])
+            continue
+        try:
+            stat = os.stat(path)
+            fingerprint.append([os.path.normcase(os.path.abspath(path)), stat.st_size, stat.st_mtime_ns])
+        except OSError:
+            fingerprint.append([os.path.normcase(os.path.abspath(path)), None, None])
+    return fingerprint
+
+def default_verify_cache_path():
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "appium-auto-installer", "verify-cache.json")
+
+class VerifyCache:
+    """Successful probe results keyed on the fingerprint of what they ran.
+
+    A probe is only served from the cache while every file in its
+    fingerprint still has the same size and mtime; the primary executable
+    must exist for a result to be stored at all.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_verify_cache_path()
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def get(self, name, fingerprint):
+        with self._lock:
+            entry = self._load().get(name)
+            if entry is None:
+                return None
+            if entry["fingerprint"] != fingerprint:
+                del self._entries[name]
+                self._save()
+                return None
+            result = entry["result"]
+            return ProbeResult(name, result["status"], result["summary"], result["version"], cached=True)
+
+    def put(self, name, fingerprint, result):
+        if not result.ok or fingerprint[0][2] is None:
+            return
+        with self._lock:
+            self._load()[name] = {"fingerprint": fingerprint, "result": result.to_dict()}
+            self._save()
+
+class Probe:
+    def __init__(self, name, function, timeout, fingerprint=None):
+        self.name = name
+        self.function = function
+        self.timeout = timeout
+        self.fingerprint = fingerprint
+
+def _run_probe(probe, cache):
+    started = time.perf_counter()
+    fingerprint = None
+    if cache is not None and probe.fingerprint is not None:
+        try:
+            fingerprint = probe.fingerprint()
+            cached = cache.get(probe.name, fingerprint)
+        except Exception:
+            fingerprint = cached = None
+        if cached is not None:
+            cached.elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+            return cached
+
+    try:
+        result = probe.function(timeout=probe.timeout)
+    except Exception as e:
+        result = ProbeResult(probe.name, ERROR, f"{probe.name}: ❌ Error during check: {str(e)}")
+    result.elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    if fingerprint is not None:
+        cache.put(probe.name, fingerprint, result)
+    return result
+
+def _traced_probe(probe, cache):
+    with tracer.span(probe.name, "probe", timeout_s=probe.timeout) as span:
+        result = _run_probe(probe, cache)
+        span.set(status=result.status, cached=result.cached, version=result.version)
+        return result
+
+def run_probes(probes, max_workers=None, cache=None):
+    """Run all probes at once; results come back in the order the probes were given.
+
+    By default every probe gets its own worker, so none waits for another to finish.
+    """
+    probes = list(probes)
+    max_workers = max_workers or max(len(probes), 1)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="verify") as pool:
+        return list(pool.map(lambda probe: _traced_probe(probe, cache), probes))
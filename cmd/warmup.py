@@ -0,0 +1,264 @@
+import json
+import math
+import os
+import subprocess
+import time
+
+from cmd.process import kill_process_tree, new_process_group
+from cmd.tracing import tracer
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 4723
+READY_TIMEOUT = 120
+POLL_INTERVAL = 0.1
+SESSION_TIMEOUT = 300
+
+DEFAULT_CAPABILITIES = {
+    "platformName": "Android",
+    "appium:automationName": "UiAutomator2",
+}
+
+def default_server_log():
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "appium-auto-installer", "appium-server.log")
+
+def percentile(values, p):
+    """Nearest-rank percentile; None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+def latency_summary(seconds):
+    milliseconds = [value * 1000 for value in seconds]
+    if not milliseconds:
+        return None
+    return {
+        "p50_ms": round(percentile(milliseconds, 50), 2),
+        "p95_ms": round(percentile(milliseconds, 95), 2),
+        "min_ms": round(min(milliseconds), 2),
+        "max_ms": round(max(milliseconds), 2),
+    }
+
+class WarmupError(Exception):
+    pass
+
+class WarmupReport:
+    def __init__(self, url):
+        self.url = url
+        self.reused = False
+        self.pid = None
+        self.log_path = None
+        self.time_to_ready = None
+        self.polls = 0
+        self.version = None
+        self.left_running = False
+        self.create_seconds = []
+        self.delete_seconds = []
+        self.session_failures = []
+        self.connections = None
+
+    @property
+    def ready(self):
+        return self.time_to_ready is not None
+
+    def summary(self):
+        if not self.ready:
+            return f"Appium server at {self.url} did not become ready"
+        how = "already running" if self.reused else f"ready in {self.time_to_ready:.2f}s"
+        text = f"Appium {self.version or '?'} at {self.url}: {how}"
+        created = latency_summary(self.create_seconds)
+        if created:
+            text += f"; new session p50 {created['p50_ms']:.0f} ms, p95 {created['p95_ms']:.0f} ms"
+        return text
+
+    def to_dict(self):
+        return {
+            "url": self.url,
+            "reused": self.reused,
+            "pid": self.pid,
+            "log": self.log_path,
+            "version": self.version,
+            "time_to_ready_s": round(self.time_to_ready, 3) if self.time_to_ready is not None else None,
+            "status_polls": self.polls,
+            "left_running": self.left_running,
+            "sessions": {
+                "count": len(self.create_seconds),
+                "failures": self.session_failures,
+                "create": latency_summary(self.create_seconds),
+                "delete": latency_summary(self.delete_seconds),
+            },
+            "connections": self.connections,
+        }
+
+class AppiumServer:
+    """A local Appium server, started detached and talked to over one keep-alive connection.
+
+    ``command`` is the Appium command line without arguments; ``--address``
+    and ``--port`` are appended. The server is started in its own process
+    group with its output in ``log_path``, so it outlives the installer and
+    the first real test run finds it warm. If something already answers on
+    the port it is reused instead.
+    """
+
+    def __init__(self, command, write_log, host=DEFAULT_HOST, port=DEFAULT_PORT, log_path=None):
+        import urllib3
+
+        self.command = list(command)
+        self.write_log = write_log
+        self.host = host
+        self.port = port
+        self.log_path = log_path or default_server_log()
+        self.process = None
+        # maxsize=1 and block=True: every request goes over the same socket.
+        self.pool = urllib3.HTTPConnectionPool(host, port, maxsize=1, block=True, retries=False,
+                                               timeout=urllib3.Timeout(connect=2.0, read=SESSION_TIMEOUT),
+                                               headers={"Content-Type": "application/json; charset=utf-8"})
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def request(self, method, path, payload=None, timeout=None):
+        """Send a WebDriver request and return (HTTP status, decoded JSON body or None)."""
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        response = self.pool.request(method, path, body=body, timeout=timeout)
+        try:
+            return response.status, json.loads(response.data.decode("utf-8"))
+        except ValueError:
+            return response.status, None
+
+    def status(self):
+        """Return the /status value when the server is ready, else None."""
+        import urllib3
+        from urllib3.exceptions import HTTPError
+
+        try:
+            code, body = self.request("GET", "/status", timeout=urllib3.Timeout(connect=0.5, read=2.0))
+        except HTTPError:
+            return None
+        value = (body or {}).get("value") or {}
+        if code != 200 or value.get("ready") is False:
+            return None
+        return value
+
+    def start(self):
+        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+        options = new_process_group()
+        if os.name == "nt":
+            # No console of its own, and not killed when this one closes.
+            options["creationflags"] |= subprocess.DETACHED_PROCESS
+        with open(self.log_path, "ab") as log:
+            self.process = subprocess.Popen(
+                self.command + ["--address", self.host, "--port", str(self.port)],
+                stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, **options)
+        return self.process
+
+    def _log_tail(self, lines=10):
+        try:
+            with open(self.log_path, "r", encoding="utf-8", errors="replace") as f:
+                return "".join(f.readlines()[-lines:]).strip()
+        except OSError:
+            return ""
+
+    def wait_ready(self, report, timeout=READY_TIMEOUT, cancel_event=None, started=None):
+        started = started or time.perf_counter()
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            if cancel_event is not None and cancel_event.is_set():
+                raise WarmupError("cancelled")
+            report.polls += 1
+            value = self.status()
+            if value is not None:
+                report.time_to_ready = time.perf_counter() - started
+                report.version = (value.get("build") or {}).get("version")
+                return value
+            if self.process is not None and self.process.poll() is not None:
+                raise WarmupError(f"appium exited with code {self.process.returncode}: {self._log_tail()}")
+            time.sleep(POLL_INTERVAL)
+        raise WarmupError(f"no ready /status from {self.url} within {timeout}s")
+
+    def create_session(self, capabilities):
+        code, body = self.request("POST", "/session", {
+            "capabilities": {"alwaysMatch": capabilities, "firstMatch": [{}]},
+        })
+        value = (body or {}).get("value") or {}
+        session_id = value.get("sessionId") or (body or {}).get("sessionId")
+        if code != 200 or not session_id:
+            raise WarmupError(value.get("message") or f"HTTP {code}")
+        return session_id
+
+    def delete_session(self, session_id):
+        code, body = self.request("DELETE", f"/session/{session_id}")
+        if code != 200:
+            raise WarmupError(((body or {}).get("value") or {}).get("message") or f"HTTP {code}")
+
+    def stop(self):
+        if self.process is not None:
+            kill_process_tree(self.process)
+            self.process.wait()
+            self.process = None
+
+class WarmupStage:
+    """Start Appium (or find it running), time it to ready, and optionally
+    benchmark create/delete session round trips against it."""
+
+    def __init__(self, server, write_log, cancel_event=None, ready_timeout=READY_TIMEOUT):
+        self.server = server
+        self.write_log = write_log
+        self.cancel_event = cancel_event
+        self.ready_timeout = ready_timeout
+        self._connections_before_ready = 0
+
+    def start(self, report):
+        with tracer.span("appium server ready", "warmup") as span:
+            started = time.perf_counter()
+            if self.server.status() is not None:
+                report.reused = True
+                self.write_log(f"Appium is already running at {self.server.url}.", "green")
+            else:
+                self.write_log(f"Starting Appium at {self.server.url}...", "yellow")
+                report.pid = self.server.start().pid
+                report.log_path = self.server.log_path
+            self.server.wait_ready(report, self.ready_timeout, self.cancel_event, started)
+            # Polls refused before the server listened don't count; the one that answered does.
+            self._connections_before_ready = self.server.pool.num_connections - 1
+            span.set(reused=report.reused, polls=report.polls, version=report.version)
+
+    def benchmark(self, report, capabilities, sessions):
+        for index in range(sessions):
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                break
+            with tracer.span(f"session {index + 1}", "warmup") as span:
+                try:
+                    started = time.perf_counter()
+                    session_id = self.server.create_session(capabilities)
+                    report.create_seconds.append(time.perf_counter() - started)
+                    started = time.perf_counter()
+                    self.server.delete_session(session_id)
+                    report.delete_seconds.append(time.perf_counter() - started)
+                except Exception as e:
+                    span.set(error=str(e))
+                    report.session_failures.append(str(e))
+                    self.write_log(f"Session {index + 1} failed: {str(e)}", "red")
+                    # A driver that cannot start sessions will not start the next one either.
+                    break
+
+    def run(self, capabilities=None, sessions=0, keep_running=True):
+        report = WarmupReport(self.server.url)
+        try:
+            self.start(report)
+            if sessions:
+                self.write_log(f"Timing {sessions} create/delete session round trip(s)...", "darkblue")
+                self.benchmark(report, dict(capabilities or DEFAULT_CAPABILITIES), sessions)
+        except Exception as e:
+            self.write_log(f"Appium warm-up failed: {str(e)}", "red")
+            keep_running = False
+        finally:
+            report.connections = self.server.pool.num_connections - self._connections_before_ready
+            if keep_running and report.ready:
+                report.left_running = True
+            elif not report.reused:
+                self.server.stop()
+        self.write_log(report.summary(), "green" if report.ready else "red")
+        return report
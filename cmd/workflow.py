@@ -0,0 +1,119 @@
+from cmd.installers import NodeInstaller, JavaInstaller, PlatformToolsInstaller, AppiumInstaller, windows_arch
+from cmd.releases import release_resolver
+from cmd.scheduler import Step
+from cmd.state import DesiredState
+from cmd.verify import Probe
+
+INSTALL_STEPS = [
+    "Checking administrator rights",
+    "Installing Node.js",
+    "Installing Appium",
+    "Downloading Android Platform Tools",
+    "Setting up Android environment variables",
+    "Installing Java JDK",
+    "Setting up Appium drivers and plugins"
+]
+
+def is_admin():
+    try:
+        import ctypes
+        return ctypes.windll.shell32.IsUserAnAdmin() != 0
+    except:
+        return False
+
+class Installers:
+    def __init__(self, log_function, extensions=None, **options):
+        self.node = NodeInstaller(log_function, **options)
+        self.java = JavaInstaller(log_function, **options)
+        self.platform_tools = PlatformToolsInstaller(log_function, **options)
+        self.appium = AppiumInstaller(log_function, extensions=extensions, **options)
+        self.write_log = log_function
+    
+    def resolve_releases(self, arch=None):
+        """Look up the Node.js and JDK releases to install, both at once; returns them by component."""
+        arch = arch or windows_arch()
+        versioned = [self.node, self.java]
+        release_resolver.resolve_all([
+            (installer.release_component, installer.release_line, arch)
+            for installer in versioned if installer.bundle is None
+        ])
+        releases = {}
+        for installer in versioned:
+            release = installer.release(arch)
+            if release.source == "pinned":
+                error = release_resolver.errors.get((installer.release_component, str(installer.release_line), arch))
+                self.write_log(f"Could not look up the latest {installer.release_component} release "
+                               f"({error or 'not in the bundle'}); using {release.version}.", "yellow")
+            releases[installer.release_component] = release.to_dict()
+        return releases
+
+WARMUP_LABEL = "Warming up the Appium server"
+
+def build_install_steps(installers, log_function, labels=INSTALL_STEPS, warm_up=False):
+    def announce(message, action):
+        def run():
+            log_function(message, "darkblue")
+            return action()
+        return run
+
+    # Only Node.js -> Appium / extensions is a real chain; the extensions go
+    # into APPIUM_HOME with npm alone, so they install alongside Appium, and
+    # the platform tools and the JDK are independent of both.
+    steps = [
+        Step("node", labels[1],
+             announce("\nChecking for Node.js...", installers.node.install),
+             branch="Node.js / Appium"),
+        Step("appium", labels[2],
+             announce("\nChecking for Appium...", installers.appium.install),
+             requires=["node"], branch="Node.js / Appium"),
+        Step("driver", labels[6],
+             announce("\nSetting up Appium drivers and plugins...", installers.appium.install_driver),
+             requires=["node"], branch="Node.js / Appium"),
+        Step("platform_tools", labels[3],
+             announce("\nDownloading Android Platform Tools...", installers.platform_tools.install),
+             branch="Android Platform Tools"),
+        Step("android_env", labels[4],
+             announce("\nSetting up Android environment variables...", installers.platform_tools.setup_environment_variables),
+             requires=["platform_tools"], branch="Android Platform Tools"),
+        Step("java", labels[5],
+             announce("\nChecking for Java...", installers.java.install),
+             branch="Java"),
+    ]
+    if warm_up:
+        # Opt-in and never recorded in the state file: its point is the running server.
+        steps.append(Step("warmup", WARMUP_LABEL,
+                          announce("\nWarming up the Appium server...", lambda: installers.appium.warm_up().ready),
+                          requires=["appium", "driver"], branch="Node.js / Appium"))
+    return steps
+
+def build_desired_state(installers):
+    # Keyed by step name. Only cheap, local reads: a rerun on an up-to-date
+    # machine decides everything from these without downloads or installers.
+    node, java, tools, appium = installers.node, installers.java, installers.platform_tools, installers.appium
+    return {
+        "node": DesiredState(node.desired_inputs, node.verify_fingerprint,
+                             details=lambda: node.installed_details("node"), satisfied_by=node.satisfied_by,
+                             keeps_recorded=node.keeps_recorded_inputs),
+        "appium": DesiredState(appium.desired_inputs, appium.verify_fingerprint,
+                               details=lambda: appium.installed_details("appium")),
+        "driver": DesiredState(appium.extension_inputs, appium.extensions_fingerprint,
+                               details=appium.extension_details),
+        "platform_tools": DesiredState(tools.desired_inputs, tools.verify_fingerprint, tools.LATEST_MAX_AGE,
+                                       details=tools.installed_details),
+        "android_env": DesiredState(tools.desired_inputs, tools.environment_snapshot),
+        "java": DesiredState(java.desired_inputs, java.verify_fingerprint,
+                             details=lambda: java.installed_details("java"), satisfied_by=java.satisfied_by,
+                             keeps_recorded=java.keeps_recorded_inputs),
+    }
+
+def build_verify_probes(installers):
+    # Each probe is a cold Node/JVM start; run them together, each with its own deadline.
+    return [
+        Probe("Node.js", installers.node.verify, 30, installers.node.verify_fingerprint),
+        Probe("Appium", installers.appium.verify, 60, installers.appium.verify_fingerprint),
+        Probe("Java", installers.java.verify, 30, installers.java.verify_fingerprint),
+        Probe("Android Platform Tools", installers.platform_tools.verify, 30, installers.platform_tools.verify_fingerprint),
+        Probe("Appium Extensions", installers.appium.verify_driver, 90, installers.appium.driver_fingerprint),
+        # Devices come and go, so this one is never served from the cache.
+        Probe("Android Devices", installers.platform_tools.verify_devices, 30),
+    ]
@@ -0,0 +1,201 @@
+import json
+import os
+import shutil
+import threading
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+COPY_BUFFER = 1024 * 1024
+MANIFEST_NAME = ".manifest.json"
+# zlib releases the GIL while inflating, so entries extract in parallel.
+DEFAULT_EXTRACT_WORKERS = min(8, os.cpu_count() or 1)
+
+def file_crc32(path):
+    crc = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(COPY_BUFFER), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+def _extract_entry(zip_ref, info, path):
+    # Reading a ZipExtFile to the end checks the entry's CRC-32 and raises
+    # BadZipFile on a mismatch; the size check catches truncated entries.
+    with zip_ref.open(info) as source, open(path, "wb", buffering=COPY_BUFFER) as target:
+        written = 0
+        for chunk in iter(lambda: source.read(COPY_BUFFER), b""):
+            target.write(chunk)
+            written += len(chunk)
+    if written != info.file_size:
+        raise zipfile.BadZipFile(f"{info.filename}: expected {info.file_size} bytes, got {written}")
+
+def unsafe_entry_name(name):
+    """True for names that could land outside the extraction root: absolute, with a drive, or with '..'."""
+    if name.startswith(("/", "\\")) or name[1:2] == ":":
+        return True
+    return ".." in name.replace("\\", "/").split("/")
+
+def contained_path(root, relpath):
+    """``root/relpath``, or ValueError when it resolves (through links too) outside ``root``."""
+    path = os.path.join(root, relpath)
+    real_root = os.path.realpath(root)
+    if os.path.commonpath([real_root, os.path.realpath(path)]) != real_root:
+        raise ValueError(f"{relpath} resolves outside {root}")
+    return path
+
+class ZipTreeSync:
+    """Keep a directory in sync with one top-level folder of a zip archive.
+
+    The archive's central directory (CRC32 and size per entry) is compared
+    with a manifest written next to the installed tree. Only entries that
+    differ are inflated; unchanged files are hard-linked into a staging
+    directory, which then replaces the live tree with two renames.
+    """
+
+    def __init__(self, zip_path, prefix, target_dir, max_workers=DEFAULT_EXTRACT_WORKERS):
+        self.zip_path = zip_path
+        self.max_workers = max_workers
+        self.prefix = prefix.rstrip("/") + "/"
+        self.target_dir = target_dir
+        parent = os.path.dirname(os.path.abspath(target_dir))
+        name = os.path.basename(os.path.abspath(target_dir))
+        self.manifest_path = os.path.join(parent, f".{name}{MANIFEST_NAME}")
+        self.staging_dir = os.path.join(parent, f".{name}.staging")
+        self.old_dir = os.path.join(parent, f".{name}.old")
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_manifest(self, manifest):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+    def entries(self, zip_ref):
+        entries = {}
+        for info in zip_ref.infolist():
+            if info.is_dir() or not info.filename.startswith(self.prefix):
+                continue
+            relpath = info.filename[len(self.prefix):]
+            if unsafe_entry_name(info.filename) or unsafe_entry_name(relpath):
+                raise ValueError(f"{self.zip_path}: refusing unsafe entry name {info.filename!r}")
+            entries[relpath] = info
+        return entries
+
+    def _unchanged(self, relpath, info, manifest):
+        path = os.path.join(self.target_dir, relpath)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if stat.st_size != info.file_size:
+            return False
+
+        recorded = manifest.get(relpath)
+        if recorded and recorded["mtime_ns"] == stat.st_mtime_ns and recorded["size"] == stat.st_size:
+            return recorded["crc"] == info.CRC
+        # No trustworthy record (first run after an older install): read it once.
+        return file_crc32(path) == info.CRC
+
+    def plan(self, entries, manifest):
+        changed = []
+        unchanged = []
+        for relpath, info in entries.items():
+            if self._unchanged(relpath, info, manifest):
+                unchanged.append(relpath)
+            else:
+                changed.append(relpath)
+        removed = [relpath for relpath in manifest if relpath not in entries]
+        return changed, unchanged, removed
+
+    def extract_entries(self, zip_ref, entries, relpaths, destination):
+        paths = {relpath: contained_path(destination, relpath) for relpath in relpaths}
+        for directory in {os.path.dirname(path) for path in paths.values()}:
+            os.makedirs(directory, exist_ok=True)
+        # Largest first, so one big entry does not start last and run alone.
+        relpaths = sorted(relpaths, key=lambda relpath: entries[relpath].compress_size, reverse=True)
+        workers = max(1, min(self.max_workers, len(relpaths)))
+        if workers == 1:
+            for relpath in relpaths:
+                _extract_entry(zip_ref, entries[relpath], paths[relpath])
+            return
+
+        # One ZipFile per thread: a shared one funnels every read through a single file lock.
+        local = threading.local()
+        handles = []
+        handles_lock = threading.Lock()
+
+        def extract(relpath):
+            if not hasattr(local, "zip_ref"):
+                local.zip_ref = zipfile.ZipFile(self.zip_path, "r")
+                with handles_lock:
+                    handles.append(local.zip_ref)
+            _extract_entry(local.zip_ref, entries[relpath], paths[relpath])
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="unzip") as pool:
+                list(pool.map(extract, relpaths))
+        finally:
+            for handle in handles:
+                handle.close()
+
+    def _link_unchanged(self, relpaths):
+        for relpath in relpaths:
+            source = contained_path(self.target_dir, relpath)
+            path = contained_path(self.staging_dir, relpath)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                os.link(source, path)
+            except OSError:
+                shutil.copy2(source, path)
+
+    def _swap(self):
+        if os.path.exists(self.old_dir):
+            shutil.rmtree(self.old_dir)
+        moved_aside = os.path.exists(self.target_dir)
+        if moved_aside:
+            os.rename(self.target_dir, self.old_dir)
+        try:
+            os.rename(self.staging_dir, self.target_dir)
+        except OSError:
+            # Put the previous tree back rather than leave nothing installed.
+            if moved_aside:
+                os.rename(self.old_dir, self.target_dir)
+            raise
+        shutil.rmtree(self.old_dir, ignore_errors=True)
+
+    def _record(self, entries):
+        manifest = {}
+        for relpath, info in entries.items():
+            stat = os.stat(os.path.join(self.target_dir, relpath))
+            manifest[relpath] = {"crc": info.CRC, "size": info.file_size, "mtime_ns": stat.st_mtime_ns}
+        self.save_manifest(manifest)
+
+    def sync(self):
+        """Bring the target up to date; return the number of files written."""
+        with zipfile.ZipFile(self.zip_path, "r") as zip_ref:
+            entries = self.entries(zip_ref)
+            if not entries:
+                raise ValueError(f"{self.zip_path} has no entries under {self.prefix}")
+
+            manifest = self.load_manifest()
+            changed, unchanged, removed = self.plan(entries, manifest)
+            if not changed and not removed:
+                if not manifest:
+                    self._record(entries)
+                return 0
+
+            if os.path.exists(self.staging_dir):
+                shutil.rmtree(self.staging_dir)
+            os.makedirs(self.staging_dir)
+            self._link_unchanged(unchanged)
+            self.extract_entries(zip_ref, entries, changed, self.staging_dir)
+
+        self._swap()
+        self._record(entries)
+        return len(changed)
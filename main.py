@@ -1,7 +1,30 @@
-import tkinter as tk
-from cmd.app import AppiumSetupApp
+import argparse
+import sys
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Appium Windows auto installer")
+    parser.add_argument("--no-cache", action="store_true", help="Always run fresh verification probes")
+    parser.add_argument("--bundle", metavar="DIR", help="Install only from an offline bundle")
+    parser.add_argument("--mirror", metavar="URL", help="Download from a LAN peer started with 'serve' first")
+    subparsers = parser.add_subparsers(dest="command")
+
+    # Only the lightweight CLI module is imported here; the GUI stack loads on demand.
+    from cmd import cli
+    cli.add_arguments(subparsers)
+    return parser.parse_args(argv)
+
+def run_gui(args):
+    import tkinter as tk
+    from cmd.app import AppiumSetupApp
 
-if __name__ == "__main__":
     root = tk.Tk()
-    app = AppiumSetupApp(root)
-    root.mainloop()
\ No newline at end of file
+    app = AppiumSetupApp(root, use_verify_cache=not args.no_cache, bundle_dir=args.bundle, mirror=args.mirror)
+    root.mainloop()
+    return 0
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command:
+        from cmd import cli
+        sys.exit(cli.run(args))
+    sys.exit(run_gui(args))